@@ -24,17 +24,82 @@ class AOVs_Creator_Window(QMainWindow):
         self.setWindowTitle('{0} v{1}'.format(__title__, __version__))
         self.resize(305,56)
         self.activateWindow
+        self.load_templates()
+        self.build = None
+        # Shows the progress of the background builds
+        self.build_timer = QTimer(self)
+        self.build_timer.setInterval(100)
+        self.build_timer.timeout.connect(self.show_build_progress)
         self.widget.btn_create.clicked.connect(self.create_template)
+        self.widget.btn_cancel.clicked.connect(self.cancel_build)
         self.show()
 
+    def load_templates(self):
+        """
+         Fill the templates combobox with the built-in templates and the ones of the user
+        """
+        from .utilities.templates import get_registry
+        from .utilities.nuke_helper import error_messages
+        registry = get_registry()
+        self.widget.cBox_template.clear()
+        self.widget.cBox_template.addItems(registry.names())
+        if registry.error:
+            error_messages(registry.error, 'warning')
+
     def create_template(self):
         """
          Build a template for the selected read nodes
         """
         from .utilities.btn_actions import run_create
+        from .utilities.template_plan import PlanOptions
         template_type = self.widget.cBox_template.currentText()
         new_group = self.widget.chBox_new_group.checkState()
-        run_create(template_type, new_group)
+        paste = self.widget.chBox_paste.isChecked()
+        parallel = self.widget.chBox_parallel.isChecked()
+        full_sequence = self.widget.chBox_sequence.isChecked()
+        update = self.widget.chBox_update.isChecked()
+        options = PlanOptions(beauty='tree' if self.widget.chBox_tree.isChecked() else 'chain',
+                              lean=self.widget.chBox_lean.isChecked(), prune=self.widget.chBox_prune.isChecked(),
+                              display=self.widget.cBox_display.currentText())
+        if self.widget.chBox_background.isChecked():
+            self.start_build(template_type, new_group, paste, parallel, full_sequence, update, options)
+            return
+        run_create(template_type, new_group, paste, parallel, full_sequence, update, options)
+
+    def start_build(self, template_type, new_group, paste, parallel, full_sequence, update, options):
+        """
+         Build the template in the background showing its progress in the window
+        """
+        from .utilities.async_build import BackgroundBuild
+        if self.build is not None and not self.build.finished:
+            return
+        self.build = BackgroundBuild(template_type, new_group, paste, full_sequence, update, options, parallel)
+        self.widget.btn_create.setEnabled(False)
+        self.widget.btn_cancel.setEnabled(True)
+        self.widget.widget_progress.setVisible(True)
+        self.build.start()
+        self.build_timer.start()
+        self.show_build_progress()
+
+    def show_build_progress(self):
+        """
+         Show the message and progress of the background build
+        """
+        state, message, progress = self.build.poll()
+        self.widget.lbl_status.setText(message)
+        self.widget.progressBar.setValue(progress)
+        if self.build.finished:
+            self.build_timer.stop()
+            self.widget.btn_create.setEnabled(True)
+            self.widget.btn_cancel.setEnabled(False)
+
+    def cancel_build(self):
+        """
+         Stop the background build after the read node being built
+        """
+        if self.build is not None:
+            self.build.cancel()
+            self.widget.lbl_status.setText('Cancelling')
 
     def close_window(self):
         self.close()
@@ -0,0 +1,16 @@
+"""
+ Builds Arnold AOV's templates in many Nuke scripts without the window, run it with a terminal Nuke:
+
+ nuke -t ~/.nuke/arnold_aovs_comp/aovs_batch.py shot_010.nk shot_020.nk --template Complex --reads "*beauty*"
+"""
+from __future__ import annotations
+import importlib
+import os
+import sys
+
+if __name__ == '__main__':
+    package_dir = os.path.dirname(os.path.realpath(__file__))
+    # The tool is imported as a package so it works from any folder
+    sys.path.insert(0, os.path.dirname(package_dir))
+    batch = importlib.import_module('{}.utilities.batch'.format(os.path.basename(package_dir)))
+    sys.exit(batch.main(sys.argv[1:]))
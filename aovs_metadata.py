@@ -0,0 +1,17 @@
+"""
+ Fills and cleans the database with the AOV's of the renders used by the sanity check, run it with any Python:
+
+ python ~/.nuke/arnold_aovs_comp/aovs_metadata.py prefetch /renders/shot_010 --recursive
+ python ~/.nuke/arnold_aovs_comp/aovs_metadata.py prune --days 30
+"""
+from __future__ import annotations
+import importlib
+import os
+import sys
+
+if __name__ == '__main__':
+    package_dir = os.path.dirname(os.path.realpath(__file__))
+    # The tool is imported as a package so it works from any folder
+    sys.path.insert(0, os.path.dirname(package_dir))
+    metadata_cache = importlib.import_module('{}.utilities.metadata_cache'.format(os.path.basename(package_dir)))
+    sys.exit(metadata_cache.main(sys.argv[1:]))
@@ -0,0 +1,16 @@
+"""
+ Checks that the AOV's of a template rebuild the beauty of a rendered sequence, run it with any Python with NumPy:
+
+ python ~/.nuke/arnold_aovs_comp/aovs_verify.py render.%04d.exr --template Complex --frames 1001 1100
+"""
+from __future__ import annotations
+import importlib
+import os
+import sys
+
+if __name__ == '__main__':
+    package_dir = os.path.dirname(os.path.realpath(__file__))
+    # The tool is imported as a package so it works from any folder
+    sys.path.insert(0, os.path.dirname(package_dir))
+    beauty_verify = importlib.import_module('{}.utilities.beauty_verify'.format(os.path.basename(package_dir)))
+    sys.exit(beauty_verify.main(sys.argv[1:]))
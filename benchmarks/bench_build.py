@@ -0,0 +1,195 @@
+"""
+ Benchmarks of the sanity check and the build of the templates with a simulated nuke module, run it with any Python:
+
+ python benchmarks/bench_build.py
+ python benchmarks/bench_build.py --reads 1 10 --templates Simple --call-cost 5
+ python benchmarks/bench_build.py --update-budgets
+
+ Every case reports the time, the nodes in the script and the knobs set, it fails when a case goes over its budget.
+"""
+from __future__ import annotations
+import argparse
+import atexit
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCHMARK_DIR)
+BUDGETS_FILE = os.path.join(BENCHMARK_DIR, 'budgets.json')
+READ_COUNTS = (1, 10, 100, 500)
+TEMPLATES = ('Simple', 'Intermediate', 'Complex', 'Light Groups')
+OPERATIONS = ('AOV_check', 'run_create')
+# Light groups of the renders, each lighting AOV is also split by light group like the RGBA
+LIGHT_GROUPS = ('default', 'fill', 'key', 'rim')
+# The layers rendered in every read node, all the templates find their AOV's
+LAYERS = ('direct', 'indirect', 'albedo', 'emission', 'shadow_matte') + tuple(
+    prefix + suffix for prefix in ('diffuse', 'specular', 'sss', 'transmission', 'coat', 'sheen')
+    for suffix in ('', '_direct', '_indirect', '_albedo')) + tuple(
+    '{0}_{1}'.format(prefix, light_group) for light_group in LIGHT_GROUPS
+    for prefix in ('RGBA',) + tuple(aov + suffix for aov in ('diffuse', 'specular', 'sss', 'transmission', 'coat', 'sheen')
+                                   for suffix in ('_direct', '_indirect')))
+# Time allowed over the budget before a case fails, the counts must not grow at all
+TIME_TOLERANCE = 1.5
+# Time written in the budgets over the one measured, machines are slower than the one that wrote them
+BUDGET_HEADROOM = 2.0
+# Shortest time written in the budgets, the smallest cases are only noise below it
+MIN_BUDGET_SECONDS = 0.01
+
+
+def load_package():
+    """
+     Imports the tool with the simulated nuke module, the toolsets and templates of the user are not used.
+
+     @return Tuple with the btn_actions, sanity_check and toolset_cache modules and the nuke module.
+    """
+    # The cache and the user templates are read from the home folder when the modules are imported
+    os.environ['HOME'] = tempfile.mkdtemp(prefix='arnold_aovs_bench_')
+    atexit.register(shutil.rmtree, os.environ['HOME'], True)
+    os.environ.pop('ARNOLD_AOVS_TRACE', None)
+    sys.path.insert(0, os.path.join(BENCHMARK_DIR, 'fake_nuke'))
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    package = os.path.basename(PACKAGE_DIR)
+    modules = [importlib.import_module('{0}.utilities.{1}'.format(package, module))
+               for module in ('btn_actions', 'sanity_check', 'toolset_cache')]
+    return tuple(modules) + (importlib.import_module('nuke'),)
+
+
+def make_reads(nuke, count: int) -> list:
+    """
+     Creates selected read nodes side by side in an empty script.
+
+     @nuke: module - The simulated nuke module.
+     @count: int - The number of read nodes.
+
+     @return List with the read nodes.
+    """
+    nuke.reset()
+    read_nodes = list()
+    for index in range(count):
+        read_node = nuke.make_read('Read{}'.format(index + 1), LAYERS, index * 2000, 0)
+        read_node['selected']._value = True
+        read_nodes.append(read_node)
+    return read_nodes
+
+
+def run_case(modules: tuple, operation: str, template_type: str, reads: int, repeat: int) -> dict:
+    """
+     Runs a case several times and keeps the fastest run.
+
+     @modules: tuple - The modules from load_package.
+     @operation: str - AOV_check or run_create.
+     @template_type: str - Name of the template.
+     @reads: int - The number of read nodes.
+     @repeat: int - The number of runs.
+
+     @return Dictionary with the seconds, nodes and knobs of the case.
+    """
+    btn_actions, sanity_check, toolset_cache, nuke = modules
+    best = None
+    for _ in range(repeat):
+        make_reads(nuke, reads)
+        # Every run starts without the toolsets written by the previous one
+        toolset_cache.clear_toolsets()
+        start = time.perf_counter()
+        if operation == 'AOV_check':
+            sanity_check.AOV_check(btn_actions.template_selection(template_type))
+        else:
+            btn_actions.run_create(template_type, True)
+        seconds = time.perf_counter() - start
+        if nuke.messages:
+            raise RuntimeError(nuke.messages[-1])
+        if best is None or seconds < best['seconds']:
+            best = {'seconds': seconds, 'nodes': nuke.count_nodes() - reads, 'knobs': nuke.stats['knob']}
+    return best
+
+
+def check_budget(result: dict, budget: dict|None, tolerance: float) -> list:
+    """
+     Compares a case with its budget.
+
+     @result: dict - The seconds, nodes and knobs of the case.
+     @budget: dict|None - The budget of the case, None always passes.
+     @tolerance: float - The time allowed over the budget.
+
+     @return List with the problems found.
+    """
+    if budget is None:
+        return list()
+    problems = list()
+    if result['seconds'] > budget['seconds'] * tolerance:
+        problems.append('{0:.3f}s over {1:.3f}s'.format(result['seconds'], budget['seconds'] * tolerance))
+    for key in ('nodes', 'knobs'):
+        if result[key] > budget[key]:
+            problems.append('{0} {1} over {2}'.format(result[key], key, budget[key]))
+    return problems
+
+
+def parse_args(argv: list):
+    """
+     Reads the arguments of the command line.
+
+     @argv: list - The arguments without the name of the program.
+
+     @return Namespace with the arguments.
+    """
+    parser = argparse.ArgumentParser(prog='bench_build', description="Benchmarks the Arnold AOV's templates.")
+    parser.add_argument('--reads', type=int, nargs='+', default=READ_COUNTS, help='Numbers of read nodes.')
+    parser.add_argument('--templates', nargs='+', default=TEMPLATES, help='Names of the templates.')
+    parser.add_argument('--operations', nargs='+', default=OPERATIONS, choices=OPERATIONS, help='What is measured.')
+    parser.add_argument('--call-cost', type=float, default=0.0, help='Microseconds spent by each call to Nuke.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each case, the fastest is kept.')
+    parser.add_argument('--tolerance', type=float, default=TIME_TOLERANCE, help='Time allowed over the budgets.')
+    parser.add_argument('--budgets', default=BUDGETS_FILE, help='Path of the budgets file.')
+    parser.add_argument('--update-budgets', action='store_true', help='Write the results as the new budgets.')
+    return parser.parse_args(argv)
+
+
+def main(argv: list) -> int:
+    """
+     Entry point of the benchmarks.
+
+     @argv: list - The arguments without the name of the program.
+
+     @return Integer with the exit code, 1 if a case went over its budget.
+    """
+    args = parse_args(argv)
+    modules = load_package()
+    modules[-1].set_call_cost(args.call_cost / 1e6)
+    try:
+        with open(args.budgets) as budgets_file:
+            budgets = json.load(budgets_file)
+    except (OSError, ValueError):
+        budgets = dict()
+    # The budgets are measured without cost per call
+    check = not args.update_budgets and not args.call_cost
+    failed = 0
+    print('{0:<36}{1:>10}{2:>10}{3:>10}'.format('case', 'ms', 'nodes', 'knobs'))
+    for operation in args.operations:
+        for template_type in args.templates:
+            for reads in args.reads:
+                case = '{0}/{1}/{2}'.format(operation, template_type, reads)
+                result = run_case(modules, operation, template_type, reads, args.repeat)
+                problems = check_budget(result, budgets.get(case), args.tolerance) if check else list()
+                failed += bool(problems)
+                print('{0:<36}{1:>10.2f}{2:>10}{3:>10}  {4}'.format(case, result['seconds'] * 1e3, result['nodes'],
+                                                                    result['knobs'], ', '.join(problems)))
+                if args.update_budgets:
+                    budgets[case] = {'seconds': max(round(result['seconds'] * BUDGET_HEADROOM, 4), MIN_BUDGET_SECONDS),
+                                     'nodes': result['nodes'], 'knobs': result['knobs']}
+    if args.update_budgets:
+        with open(args.budgets, 'w') as budgets_file:
+            json.dump(budgets, budgets_file, indent=2, sort_keys=True)
+            budgets_file.write('\n')
+        print('Budgets written in {}'.format(args.budgets))
+    elif failed:
+        print('{} cases over their budget'.format(failed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,131 @@
+"""
+ Compares the size and the render cost of the templates planned with each option, it doesn't need Nuke:
+
+ python benchmarks/compare_plans.py
+ python benchmarks/compare_plans.py --templates Complex
+
+ The ops are the nodes Nuke evaluates for every row, the dots and backdrops cost nothing. The depth is the longest
+ chain of ops a row is pulled through from the read node to the end of the template. The channels are the ones
+ carried by the rows of all the ops, for a read node with EXTRA_CHANNELS besides the AOV's of the template. The
+ stamps are the thumbnails Nuke renders while the node graph is drawn.
+"""
+from __future__ import annotations
+import argparse
+import importlib
+import os
+import sys
+
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCHMARK_DIR)
+TEMPLATES = ('Simple', 'Intermediate', 'Complex')
+# Nodes that don't process the image
+FREE_CLASSES = ('Dot',)
+# Nodes that add the rgba of their A input to the channels of their B input
+MERGE_CLASSES = ('Merge2', 'MergeExpression', 'Copy')
+# Nodes that write their result in the rgba
+EXPRESSION_CLASSES = ('Expression',)
+# Channels of the read node that the templates don't use, like the cryptomattes and the utility AOV's
+EXTRA_CHANNELS = 48
+RGBA = frozenset(('rgba.red', 'rgba.green', 'rgba.blue', 'rgba.alpha'))
+# Names of the channel sets used by the remove nodes
+CHANNEL_SETS = {'rgb': frozenset(('rgba.red', 'rgba.green', 'rgba.blue')), 'rgba': RGBA}
+
+
+def load_package():
+    """
+     Imports the modules that plan the templates, none of them imports nuke.
+
+     @return Tuple with the template_plan and templates modules.
+    """
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    package = os.path.basename(PACKAGE_DIR)
+    return tuple(importlib.import_module('{0}.utilities.{1}'.format(package, module))
+                 for module in ('template_plan', 'templates'))
+
+
+def plan_cost(plan, input_id: str, layers_dict: dict) -> dict:
+    """
+     Measures a planned template.
+
+     @plan: GraphPlan - The template planned.
+     @input_id: str - The id of the input of the template.
+     @layers_dict: dict - The groups and AOV's of the template.
+
+     @return Dictionary with the nodes, ops, depth, channels, stamps and backdrops of the plan.
+    """
+    nodes = {plan_node.id: plan_node for plan_node in plan.nodes}
+    depths = dict()
+
+    def depth(node_id: str) -> int:
+        if node_id == input_id:
+            return 0
+        if node_id not in depths:
+            plan_node = nodes[node_id]
+            own = 0 if plan_node.node_class in FREE_CLASSES else 1
+            depths[node_id] = own + max((depth(source_id) for _, source_id in plan_node.inputs), default=0)
+        return depths[node_id]
+
+    ops = sum(1 for plan_node in plan.nodes if plan_node.node_class not in FREE_CLASSES)
+    read_channels = RGBA | frozenset('{0}.{1}'.format(layer, channel) for layers in layers_dict.values()
+                                     for layer in layers for channel in ('red', 'green', 'blue')) | frozenset(
+        'other.{}'.format(index) for index in range(EXTRA_CHANNELS))
+    carried = {input_id: read_channels}
+
+    def channels(node_id: str) -> frozenset:
+        if node_id not in carried:
+            plan_node = nodes[node_id]
+            inputs = dict(plan_node.inputs)
+            result = channels(inputs[0]) if 0 in inputs else frozenset()
+            knobs = dict(plan_node.knobs)
+            if plan_node.node_class == 'Remove':
+                kept = CHANNEL_SETS.get(knobs['channels']) or frozenset(knobs['channels'].split())
+                result = result & kept if knobs['operation'] == 'keep' else result - kept
+            elif (plan_node.node_class in MERGE_CLASSES and 1 in inputs) or plan_node.node_class in EXPRESSION_CLASSES:
+                result = result | RGBA
+            carried[node_id] = result
+        return carried[node_id]
+
+    row_channels = sum(len(channels(plan_node.id)) for plan_node in plan.nodes
+                       if plan_node.node_class not in FREE_CLASSES)
+    stamps = sum(1 for plan_node in plan.nodes if dict(plan_node.knobs).get('postage_stamp'))
+    return {'nodes': len(plan.nodes), 'ops': ops, 'depth': depth(plan.output), 'channels': row_channels,
+            'stamps': stamps, 'backdrops': len(plan.backdrops)}
+
+
+def main(argv: list) -> int:
+    """
+     Entry point of the comparison.
+
+     @argv: list - The arguments without the name of the program.
+
+     @return Integer with the exit code.
+    """
+    parser = argparse.ArgumentParser(prog='compare_plans', description="Compares the Arnold AOV's templates.")
+    parser.add_argument('--templates', nargs='+', default=TEMPLATES, help='Names of the templates.')
+    args = parser.parse_args(argv)
+    template_plan, templates = load_package()
+    registry = templates.get_registry()
+    variants = [('full', template_plan.PlanOptions()),
+                ('full tree', template_plan.PlanOptions(beauty='tree')),
+                ('full pruned', template_plan.PlanOptions(prune=True)),
+                ('full light', template_plan.PlanOptions(display='light')),
+                ('full none', template_plan.PlanOptions(display='none')),
+                ('lean', template_plan.PlanOptions(lean=True)),
+                ('lean tree', template_plan.PlanOptions(beauty='tree', lean=True)),
+                ('lean pruned', template_plan.PlanOptions(lean=True, prune=True))]
+    print('{0:<28}{1:>8}{2:>8}{3:>8}{4:>10}{5:>8}{6:>11}'.format('template', 'nodes', 'ops', 'depth', 'channels', 'stamps',
+                                                                'backdrops'))
+    for template_type in args.templates:
+        layers_dict = registry.get(template_type).layers_dict
+        base = None
+        for name, options in variants:
+            cost = plan_cost(template_plan.plan_template(layers_dict, 'Read1', options), template_plan.INPUT, layers_dict)
+            base = base or cost
+            print('{0:<28}{1:>8}{2:>8}{3:>8}{4:>10}{5:>8}{6:>11}  {7:>+5.0%} ops {8:>+5.0%} channels'.format(
+                '{0} {1}'.format(template_type, name), cost['nodes'], cost['ops'], cost['depth'], cost['channels'],
+                cost['stamps'], cost['backdrops'], cost['ops'] / base['ops'] - 1, cost['channels'] / base['channels'] - 1))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
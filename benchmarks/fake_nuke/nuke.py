@@ -0,0 +1,448 @@
+"""
+ Simulated nuke module for the benchmarks, it models the nodes, knobs, inputs, selection and groups used by the tool
+ and counts every call that changes the script. Each call can cost a fixed time to simulate a real session. Like
+ Nuke, every node returned is a new Python object, so the nodes must be compared with == and not with is.
+"""
+from __future__ import annotations
+import time
+from collections import Counter
+
+GUI = False
+INVISIBLE = 0x400
+# Calls that change the script, counted in stats
+CALLS = ('create', 'knob', 'input', 'select', 'delete', 'paste')
+# Minimum inputs of the classes with a mask input
+MIN_INPUTS = {'Merge2': 2, 'MergeExpression': 2, 'Copy': 2, 'Grade': 1}
+# Classes that hold other nodes
+GROUP_CLASSES = ('Root', 'Group', 'LiveGroup')
+POSITION_KNOBS = ('xpos', 'ypos', 'bdwidth', 'bdheight')
+
+stats = Counter()
+messages = list()
+undo_log = list()
+call_cost = 0.0
+
+
+def set_call_cost(seconds: float) -> None:
+    """
+     Sets the time spent by every call that changes the script.
+
+     @seconds: float - The time of each call.
+
+     @return None.
+    """
+    global call_cost
+    call_cost = seconds
+
+
+def _call(kind: str, amount: int = 1) -> None:
+    """
+     Counts a call and spends its cost.
+
+     @kind: str - The kind of call from CALLS.
+     @amount: int - The number of calls.
+
+     @return None.
+    """
+    stats[kind] += amount
+    if call_cost:
+        end = time.perf_counter() + call_cost * amount
+        while time.perf_counter() < end:
+            pass
+
+
+class Knob(object):
+    def __init__(self, name: str, value = ''):
+        self._name = name
+        self._value = value
+        self._flags = 0
+
+    def name(self) -> str:
+        return self._name
+
+    def value(self):
+        return self._value
+
+    getValue = value
+
+    def evaluate(self, frame: int|None = None):
+        return self._value
+
+    def setValue(self, value, *args) -> bool:
+        _call('select' if self._name == 'selected' else 'knob')
+        self._value = value
+        return True
+
+    def setFlag(self, flag: int) -> None:
+        self._flags |= flag
+
+
+class String_Knob(Knob):
+    def __init__(self, name: str, label: str|None = None, value: str = ''):
+        Knob.__init__(self, name, value)
+
+
+class Node(object):
+    def __init__(self, node_class: str, parent = None):
+        self._class = node_class
+        self._knobs = dict()
+        self._inputs = dict()
+        self._parent = parent
+        self._channels = list()
+        self._children = list() if node_class in GROUP_CLASSES else None
+        if parent is not None:
+            parent._children.append(self)
+            self['name']._value = _unique_name(parent, node_class)
+        self['selected']._value = False
+
+    def __getitem__(self, name: str) -> Knob:
+        if name not in self._knobs:
+            self._knobs[name] = Knob(name, 0 if name in POSITION_KNOBS else '')
+        return self._knobs[name]
+
+    def __enter__(self):
+        _context.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _context.pop()
+
+    def __repr__(self) -> str:
+        return '<{0} {1}>'.format(self._class, self.name())
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Node) and other.__dict__ is self.__dict__
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    def __hash__(self) -> int:
+        return id(self.__dict__)
+
+    def Class(self) -> str:
+        return self._class
+
+    def knob(self, name: str) -> Knob:
+        return self[name]
+
+    def knobs(self) -> dict:
+        return dict(self._knobs)
+
+    def addKnob(self, knob: Knob) -> None:
+        _call('knob')
+        self._knobs[knob.name()] = knob
+
+    def name(self) -> str:
+        return self['name'].value()
+
+    def fullName(self) -> str:
+        if self._parent is None or self._parent._parent is None:
+            return self.name()
+        return '{0}.{1}'.format(self._parent.fullName(), self.name())
+
+    def setName(self, name: str) -> None:
+        self['name'].setValue(name)
+
+    def setInput(self, index: int, node) -> bool:
+        _call('input')
+        self._inputs[index] = node
+        return True
+
+    def input(self, index: int):
+        return _wrap(self._inputs.get(index))
+
+    def inputs(self) -> int:
+        return max(self._inputs) + 1 if self._inputs else 0
+
+    def minInputs(self) -> int:
+        return MIN_INPUTS.get(self._class, 1)
+
+    def xpos(self) -> int:
+        return self['xpos'].value()
+
+    def ypos(self) -> int:
+        return self['ypos'].value()
+
+    def screenWidth(self) -> int:
+        return 80
+
+    def screenHeight(self) -> int:
+        return 18
+
+    def setXYpos(self, x: int, y: int) -> None:
+        self['xpos'].setValue(x)
+        self['ypos'].setValue(y)
+
+    def channels(self) -> list:
+        return list(self._channels)
+
+    def nodes(self) -> list:
+        return [_wrap(node) for node in self._children]
+
+    def begin(self):
+        return self.__enter__()
+
+    def end(self) -> None:
+        self.__exit__()
+
+
+class _Nodes(object):
+    def __getattr__(self, node_class: str):
+        return lambda **knobs: _create(node_class, knobs)
+
+
+class ProgressTask(object):
+    def __init__(self, title: str):
+        self.title = title
+        self.progress = 0
+
+    def setMessage(self, message: str) -> None:
+        return
+
+    def setProgress(self, progress: int) -> None:
+        self.progress = progress
+
+    def isCancelled(self) -> bool:
+        return False
+
+
+class Undo(object):
+    def begin(self, name: str|None = None) -> None:
+        undo_log.append(('begin', name))
+
+    def end(self) -> None:
+        undo_log.append(('end',))
+
+    def cancel(self) -> None:
+        undo_log.append(('cancel',))
+
+
+_root = Node('Root')
+_context = [_root]
+_names = dict()
+nodes = _Nodes()
+
+
+def _wrap(node):
+    """
+     Gets a new Python object for a node, Nuke returns a new one every time a node is found.
+
+     @node: Node|None - The node.
+
+     @return Node sharing the state of the node given or None.
+    """
+    if node is None:
+        return None
+    wrapper = object.__new__(type(node))
+    wrapper.__dict__ = node.__dict__
+    return wrapper
+
+
+def _unique_name(parent, node_class: str) -> str:
+    """
+     Gets the next free default name of a class inside a group, like Nuke does.
+
+     @parent: Node - The group of the node.
+     @node_class: str - The class of the node.
+
+     @return String with the name.
+    """
+    key = (id(parent.__dict__), node_class)
+    _names[key] = _names.get(key, 0) + 1
+    return '{0}{1}'.format(node_class.rstrip('0123456789'), _names[key])
+
+
+def _create(node_class: str, knobs: dict) -> Node:
+    """
+     Creates a node in the current group with its knobs.
+
+     @node_class: str - The class of the node.
+     @knobs: dict - The names of the knobs and their values.
+
+     @return Node.
+    """
+    _call('create')
+    node = Node(node_class, _context[-1])
+    for name, value in knobs.items():
+        node[name].setValue(value)
+    return node
+
+
+def reset() -> None:
+    """
+     Starts an empty script and clears the stats.
+
+     @return None.
+    """
+    global _root, _context
+    _root = Node('Root')
+    _context = [_root]
+    _names.clear()
+    stats.clear()
+    messages.clear()
+    undo_log.clear()
+
+
+def make_read(name: str, layers: list, xpos: int = 0, ypos: int = 0, file_path: str = '', frames: tuple = (1001, 1001)):
+    """
+     Creates a read node with the channels of the layers given, it is not counted in the stats.
+
+     @name: str - The name of the read node.
+     @layers: list - The layers of the file.
+     @xpos: int - The X position.
+     @ypos: int - The Y position.
+     @file_path: str - The path of the file.
+     @frames: tuple - The first and last frame.
+
+     @return Node.
+    """
+    node = Node('Read', _context[-1])
+    values = {'name': name, 'tile_color': 0, 'xpos': xpos, 'ypos': ypos, 'file': file_path, 'first': frames[0], 'last': frames[1],
+              'frame_mode': 'expression', 'frame': ''}
+    for knob_name, value in values.items():
+        node[knob_name]._value = value
+    channels = ['rgba.red', 'rgba.green', 'rgba.blue', 'rgba.alpha']
+    for layer in layers:
+        channels.extend('{0}.{1}'.format(layer, channel) for channel in ('red', 'green', 'blue'))
+    node._channels = channels
+    return node
+
+
+def count_nodes(group = None) -> int:
+    """
+     Counts the nodes of a group and the groups inside it.
+
+     @group: Node|None - The group, None counts the whole script.
+
+     @return Integer with the number of nodes.
+    """
+    total = 0
+    for node in (group or _root)._children:
+        total += 1
+        if node._children is not None:
+            total += count_nodes(node)
+    return total
+
+
+def root() -> Node:
+    return _wrap(_root)
+
+
+def thisGroup() -> Node:
+    return _wrap(_context[-1])
+
+
+def allNodes(filter: str|None = None, group = None, recurseGroups: bool = False) -> list:
+    found = list()
+    for node in (group or _context[-1])._children:
+        if filter is None or node.Class() == filter:
+            found.append(_wrap(node))
+        if recurseGroups and node._children is not None:
+            found.extend(allNodes(filter, node, True))
+    return found
+
+
+def selectedNodes(filter: str|None = None) -> list:
+    return [node for node in allNodes(filter) if node['selected'].value()]
+
+
+def toNode(name: str):
+    for node in allNodes():
+        if node.name() == name:
+            return node
+    return None
+
+
+def delete(node) -> None:
+    _call('delete')
+    node._parent._children.remove(node)
+
+
+def frame() -> int:
+    return 1001
+
+
+def message(text: str) -> None:
+    messages.append(text)
+
+
+def _knob_value(value: str):
+    """
+     Reads the value of a knob as the tool writes it, quoted strings or numbers and booleans.
+
+     @value: str - The value written in the script.
+
+     @return The value of the knob.
+    """
+    if value.startswith('"'):
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    if value in ('true', 'false'):
+        return value == 'true'
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            continue
+    return value
+
+
+def scriptReadText(text: str) -> None:
+    """
+     Pastes a Nuke script written by the tool, with the stack, variables, groups and masks it uses. Nuke creates
+     every node, sets every knob and connects every input of the script, so they are counted like the calls.
+
+     @text: str - The Nuke script.
+
+     @return None.
+    """
+    _call('paste')
+    stack = list()
+    variables = dict()
+    lines = iter(text.splitlines())
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('set '):
+            variables[line.split()[1]] = stack[-1]
+            continue
+        if line.startswith('push '):
+            source = line.split()[1]
+            stack.append(None if source == '0' else variables[source[1:]])
+            continue
+        if line == 'end_group':
+            stack.append(_context.pop())
+            continue
+        node_class = line.split()[0]
+        knobs = dict()
+        user_knobs = 0
+        for knob_line in lines:
+            knob_line = knob_line.strip()
+            if knob_line == '}':
+                break
+            if knob_line.startswith('addUserKnob'):
+                user_knobs += 1
+                continue
+            name, _, value = knob_line.partition(' ')
+            knobs[name] = _knob_value(value)
+        inputs, _, masks = str(knobs.pop('inputs', 1)).partition('+')
+        sources = [stack.pop() if stack else None for _ in range(int(inputs))]
+        mask_sources = [stack.pop() if stack else None for _ in range(int(masks or 0))]
+        _call('create')
+        node = Node(node_class, _context[-1])
+        _call('knob', len(knobs) + user_knobs)
+        for name, value in knobs.items():
+            node[name]._value = value
+        for index, source in enumerate(sources):
+            if source is not None:
+                _call('input')
+                node._inputs[index] = source
+        for source in mask_sources:
+            if source is not None:
+                # The same index apply_plan uses for the masks
+                _call('input')
+                node._inputs[node.minInputs() - 1] = source
+        if node_class in ('Group', 'LiveGroup'):
+            _context.append(node)
+        else:
+            stack.append(node)
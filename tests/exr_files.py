@@ -0,0 +1,155 @@
+"""
+ Writes small OpenEXR files for the tests, scanline images with float channels without compression or with ZIP.
+"""
+from __future__ import annotations
+import struct
+import zlib
+
+EXR_MAGIC = 20000630
+MULTIPART_FLAG = 0x1000
+COMPRESSION_CODES = {'none': 0, 'zip': 3}
+LINES_PER_CHUNK = {'none': 1, 'zip': 16}
+
+
+def attribute(name: str, attribute_type: str, value: bytes) -> bytes:
+    """
+     Encodes an attribute of a header.
+
+     @name: str - The name of the attribute.
+     @attribute_type: str - The type of the attribute.
+     @value: bytes - The value encoded.
+
+     @return Bytes of the attribute.
+    """
+    return name.encode() + b'\0' + attribute_type.encode() + b'\0' + struct.pack('<i', len(value)) + value
+
+
+def part_header(channels: dict, width: int, height: int, compression: str = 'none', extra: bytes = b'') -> bytes:
+    """
+     Encodes the header of a part, the channels are sorted by name as OpenEXR stores them.
+
+     @channels: dict - The names of the channels with their rows of pixels.
+     @width: int - The pixels of each scanline.
+     @height: int - The number of scanlines.
+     @compression: str - none or zip.
+     @extra: bytes - More attributes, like the name of the part.
+
+     @return Bytes of the header without the null that ends it.
+    """
+    chlist = b''.join(name.encode() + b'\0' + struct.pack('<iB3xii', 2, 0, 1, 1) for name in sorted(channels)) + b'\0'
+    window = struct.pack('<iiii', 0, 0, width - 1, height - 1)
+    return (attribute('channels', 'chlist', chlist) +
+            attribute('compression', 'compression', bytes([COMPRESSION_CODES[compression]])) +
+            attribute('dataWindow', 'box2i', window) + attribute('displayWindow', 'box2i', window) +
+            attribute('lineOrder', 'lineOrder', b'\0') + attribute('pixelAspectRatio', 'float', struct.pack('<f', 1)) +
+            attribute('screenWindowCenter', 'v2f', struct.pack('<ff', 0, 0)) +
+            attribute('screenWindowWidth', 'float', struct.pack('<f', 1)) + extra)
+
+
+def part_chunks(channels: dict, width: int, height: int, compression: str = 'none') -> list:
+    """
+     Encodes the pixels of a part in chunks of scanlines.
+
+     @channels: dict - The names of the channels with their rows of pixels.
+     @width: int - The pixels of each scanline.
+     @height: int - The number of scanlines.
+     @compression: str - none or zip.
+
+     @return List of tuples with the first scanline and the data of each chunk.
+    """
+    lines = LINES_PER_CHUNK[compression]
+    chunks = list()
+    for y_start in range(0, height, lines):
+        data = b''.join(struct.pack('<{}f'.format(width), *channels[name][y])
+                        for y in range(y_start, min(y_start + lines, height)) for name in sorted(channels))
+        if compression == 'zip':
+            data = zip_encode(data)
+        chunks.append((y_start, data))
+    return chunks
+
+
+def zip_encode(data: bytes) -> bytes:
+    """
+     Compresses the data of a chunk as OpenEXR ZIP, the bytes are split in even and odd and stored as differences.
+
+     @data: bytes - The scanlines of the chunk.
+
+     @return Bytes compressed.
+    """
+    split = data[0::2] + data[1::2]
+    encoded = bytearray(split[:1])
+    for index in range(1, len(split)):
+        encoded.append((split[index] - split[index - 1] + 128) & 0xff)
+    return zlib.compress(bytes(encoded))
+
+
+def write_exr(path: str, channels: dict, width: int, height: int, compression: str = 'none') -> None:
+    """
+     Writes a single part OpenEXR.
+
+     @path: str - The path of the file.
+     @channels: dict - The names of the channels with their rows of pixels.
+     @width: int - The pixels of each scanline.
+     @height: int - The number of scanlines.
+     @compression: str - none or zip.
+
+     @return None.
+    """
+    header = struct.pack('<ii', EXR_MAGIC, 2) + part_header(channels, width, height, compression) + b'\0'
+    chunks = part_chunks(channels, width, height, compression)
+    offset = len(header) + 8 * len(chunks)
+    offsets = list()
+    body = b''
+    for y_start, data in chunks:
+        offsets.append(offset + len(body))
+        body += struct.pack('<ii', y_start, len(data)) + data
+    with open(path, 'wb') as exr_file:
+        exr_file.write(header + struct.pack('<{}Q'.format(len(offsets)), *offsets) + body)
+
+
+def write_multipart_exr(path: str, parts: list, width: int, height: int) -> None:
+    """
+     Writes a multipart OpenEXR without compression.
+
+     @path: str - The path of the file.
+     @parts: list - Tuples with the name of each part and its channels with their rows of pixels.
+     @width: int - The pixels of each scanline.
+     @height: int - The number of scanlines.
+
+     @return None.
+    """
+    headers = b''
+    for name, channels in parts:
+        extra = (attribute('name', 'string', name.encode()) + attribute('type', 'string', b'scanlineimage') +
+                 attribute('chunkCount', 'int', struct.pack('<i', height)))
+        headers += part_header(channels, width, height, extra=extra) + b'\0'
+    header = struct.pack('<ii', EXR_MAGIC, 2 | MULTIPART_FLAG) + headers + b'\0'
+    offset = len(header) + 8 * height * len(parts)
+    tables = list()
+    body = b''
+    for index, (_, channels) in enumerate(parts):
+        table = list()
+        for y_start, data in part_chunks(channels, width, height):
+            table.append(offset + len(body))
+            body += struct.pack('<iii', index, y_start, len(data)) + data
+        tables.append(struct.pack('<{}Q'.format(len(table)), *table))
+    with open(path, 'wb') as exr_file:
+        exr_file.write(header + b''.join(tables) + body)
+
+
+def flat_channels(layers: dict, width: int, height: int) -> dict:
+    """
+     Gets the channels of some layers filled with a constant color, the beauty is named R, G, B and A.
+
+     @layers: dict - The names of the layers with their red, green, blue and alpha values, rgba for the beauty.
+     @width: int - The pixels of each scanline.
+     @height: int - The number of scanlines.
+
+     @return Dictionary with the names of the channels and their rows of pixels.
+    """
+    channels = dict()
+    for layer, values in layers.items():
+        for channel, value in zip('RGBA', values):
+            name = channel if layer == 'rgba' else '{0}.{1}'.format(layer, channel)
+            channels[name] = [[value] * width for _ in range(height)]
+    return channels
@@ -0,0 +1,12 @@
+"""
+ Imports the simulated nuke module of the benchmarks, so the modules that use Nuke are tested without it.
+"""
+from __future__ import annotations
+import os
+import sys
+
+FAKE_NUKE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fake_nuke')
+if FAKE_NUKE_DIR not in sys.path:
+    sys.path.insert(0, FAKE_NUKE_DIR)
+
+import nuke
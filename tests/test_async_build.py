@@ -0,0 +1,44 @@
+from __future__ import annotations
+import os
+import tempfile
+import unittest
+
+from .nuke_session import (nuke)
+from ..utilities.async_build import (BackgroundBuild)
+from ..utilities.tracer import (TRACE_ENV)
+
+
+class BackgroundBuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.trace_path = os.path.join(self.folder.name, 'trace.json')
+        os.environ[TRACE_ENV] = self.trace_path
+        self.addCleanup(os.environ.pop, TRACE_ENV)
+        nuke.reset()
+
+    def test_nothing_selected(self):
+        build = BackgroundBuild('Complex', True)
+        build.start()
+        self.assertEqual(build.poll()[0], 'cancelled')
+        self.assertTrue(build.finished)
+
+    def test_error_before_the_check(self):
+        read_node = nuke.make_read('Read1', ['diffuse_direct'])
+        read_node['selected']._value = True
+        # The frame range can't be read
+        read_node['first']._value = 'first'
+        build = BackgroundBuild('Complex', True)
+        build.start()
+        state, message, _ = build.poll()
+        self.assertEqual(state, 'failed')
+        self.assertTrue(build.finished)
+        self.assertTrue(message.startswith('ValueError'))
+        self.assertTrue(any('The template was not built' in text for text in nuke.messages))
+        # The trace is ended and written
+        self.assertTrue(os.path.isfile(self.trace_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
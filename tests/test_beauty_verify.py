@@ -0,0 +1,111 @@
+from __future__ import annotations
+import os
+import tempfile
+import unittest
+
+try:
+    from ..utilities.beauty_verify import (VerifyError, beauty_terms, match_frame_template, verify_sequence)
+except ImportError:
+    # The verifier needs numpy, it is not installed with Nuke
+    verify_sequence = None
+from .exr_files import (write_exr)
+
+TEMPLATE = {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect'],
+            'Specular': ['specular_direct', 'specular_albedo', 'specular_indirect'],
+            'Emission': ['emission'],
+            'Shadow': ['shadow_matte']}
+WIDTH = 8
+HEIGHT = 40
+
+
+def render_channels(beauty_offset: tuple = (0, 0, 0.0)) -> dict:
+    """
+     Gets the channels of a render whose beauty is the sum of its diffuse and emission, the first column is
+     transparent so the albedo is 0 there.
+
+     @beauty_offset: tuple - The X and Y of a pixel and the value added to the red of its beauty.
+
+     @return Dictionary with the names of the channels and their rows of pixels.
+    """
+    channels = dict()
+
+    def layer(name: str, value) -> None:
+        for index, channel in enumerate('RGB'):
+            key = channel if name == 'rgba' else '{0}.{1}'.format(name, channel)
+            channels[key] = [[value(x, y, index) for x in range(WIDTH)] for y in range(HEIGHT)]
+
+    def alpha(x: int, y: int) -> float:
+        return 0.0 if x == 0 else 0.5 + 0.5 * (y % 2)
+
+    layer('diffuse_direct', lambda x, y, c: (x + c) * 0.125 * alpha(x, y))
+    layer('diffuse_indirect', lambda x, y, c: (y % 5) * 0.0625 * alpha(x, y))
+    layer('diffuse_albedo', lambda x, y, c: (0.25 + 0.125 * c) * alpha(x, y))
+    layer('emission', lambda x, y, c: 0.25 * c * alpha(x, y))
+    layer('rgba', lambda x, y, c: sum(channels['{0}.{1}'.format(name, 'RGB'[c])][y][x]
+                                      for name in ('diffuse_direct', 'diffuse_indirect', 'emission'))
+          + (beauty_offset[2] if (x, y, c) == (beauty_offset[0], beauty_offset[1], 0) else 0.0))
+    channels['A'] = [[alpha(x, y) for x in range(WIDTH)] for y in range(HEIGHT)]
+    return channels
+
+
+@unittest.skipIf(verify_sequence is None, 'numpy is not installed')
+class BeautyVerifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.layers_dict = {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect'],
+                            'Emission': ['emission']}
+
+    def write(self, name: str, compression: str = 'none', beauty_offset: tuple = (0, 0, 0.0)) -> str:
+        path = os.path.join(self.folder.name, name)
+        write_exr(path, render_channels(beauty_offset), WIDTH, HEIGHT, compression)
+        return path
+
+    def verify(self, paths: list) -> list:
+        return list(verify_sequence(enumerate(paths, 1001), self.layers_dict, workers=2, block_lines=16))
+
+    def test_terms(self):
+        self.assertEqual(beauty_terms(TEMPLATE), (('diffuse_direct', 'diffuse_albedo'),
+                                                  ('diffuse_indirect', 'diffuse_albedo'),
+                                                  ('specular_direct', 'specular_albedo'),
+                                                  ('specular_indirect', 'specular_albedo'), ('emission', None)))
+
+    def test_terms_of_a_group_without_albedo(self):
+        layers_dict = {'Diffuse': ['diffuse_direct', 'diffuse_albedo'], 'Lights': ['RGBA_key']}
+        self.assertEqual(beauty_terms(layers_dict), (('diffuse_direct', 'diffuse_albedo'), ('RGBA_key', None)))
+
+    def test_rebuilt_beauty(self):
+        reports = self.verify([self.write('none.1001.exr'), self.write('zip.1002.exr', 'zip')])
+        self.assertEqual([report.frame for report in reports], [1001, 1002])
+        for report in reports:
+            self.assertTrue(report.ok, report)
+            self.assertEqual(report.stats.pixels, WIDTH * HEIGHT)
+            self.assertLess(report.stats.maximum, 1e-5)
+
+    def test_wrong_beauty(self):
+        good = self.write('good.1001.exr')
+        wrong = self.write('wrong.1002.exr', 'zip', (5, 33, 0.5))
+        reports = self.verify([good, wrong])
+        self.assertTrue(reports[0].ok)
+        self.assertFalse(reports[1].ok)
+        self.assertEqual(reports[1].stats.bad_pixels, 1)
+        self.assertEqual(reports[1].stats.worst, (5, 33))
+        self.assertAlmostEqual(reports[1].stats.maximum, 0.5, 5)
+
+    def test_missing_file(self):
+        reports = self.verify([os.path.join(self.folder.name, 'missing.1001.exr')])
+        self.assertFalse(reports[0].ok)
+        self.assertTrue(reports[0].error)
+
+    def test_template_groups_in_the_frame(self):
+        path = self.write('render.1001.exr')
+        self.assertEqual(match_frame_template(path, TEMPLATE), self.layers_dict)
+        with self.assertRaises(VerifyError):
+            match_frame_template(path, {'Specular': TEMPLATE['Specular']})
+        with self.assertRaises(VerifyError):
+            match_frame_template(os.path.join(self.folder.name, 'missing.1001.exr'), TEMPLATE)
+
+
+if __name__ == '__main__':
+    unittest.main()
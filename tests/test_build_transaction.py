@@ -0,0 +1,33 @@
+from __future__ import annotations
+import unittest
+
+from .nuke_session import (nuke)
+from ..utilities.nuke_helper import (BuildCancelled, build_transaction)
+
+
+class BuildTransactionTest(unittest.TestCase):
+
+    def setUp(self):
+        nuke.reset()
+
+    def test_single_undo(self):
+        with build_transaction('Build Complex Template'):
+            nuke.nodes.Grade()
+            nuke.nodes.Grade()
+        self.assertEqual(nuke.undo_log, [('begin', 'Build Complex Template'), ('end',)])
+
+    def test_cancelled(self):
+        with build_transaction('Build Complex Template'):
+            nuke.nodes.Grade()
+            raise BuildCancelled()
+        self.assertEqual(nuke.undo_log, [('begin', 'Build Complex Template'), ('cancel',)])
+
+    def test_failed(self):
+        with self.assertRaises(KeyError):
+            with build_transaction('Build Complex Template'):
+                raise KeyError('diffuse_albedo')
+        self.assertEqual(nuke.undo_log, [('begin', 'Build Complex Template'), ('cancel',)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+import os
+import tempfile
+import unittest
+
+from ..utilities.exr_header import (ExrHeaderError, exr_layers, is_truncated, parse_exr_header, read_exr_header)
+from .exr_files import (flat_channels, write_exr, write_multipart_exr)
+
+
+class ExrHeaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'render.exr')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def read_bytes(self) -> bytes:
+        with open(self.path, 'rb') as exr_file:
+            return exr_file.read()
+
+    def test_layers_are_named_as_nuke(self):
+        channels = flat_channels({'rgba': (1, 1, 1, 1), 'diffuse_direct': (1, 1, 1), 'crypto.00': (0, 0, 0)}, 4, 2)
+        channels['Z'] = [[0.0] * 4] * 2
+        write_exr(self.path, channels, 4, 2)
+        header = read_exr_header(self.path)
+        self.assertEqual(header.parts[0].compression, 'none')
+        self.assertEqual(header.parts[0].data_window, (0, 0, 3, 1))
+        self.assertEqual(exr_layers(header), frozenset({'rgba', 'depth', 'diffuse_direct', 'crypto_00'}))
+
+    def test_multipart_parts_are_layers(self):
+        beauty = flat_channels({'rgba': (1, 1, 1, 1)}, 4, 2)
+        diffuse = {channel: [[0.5] * 4] * 2 for channel in 'RGB'}
+        write_multipart_exr(self.path, [('rgba', beauty), ('diffuse', diffuse)], 4, 2)
+        header = read_exr_header(self.path)
+        self.assertTrue(header.multipart)
+        self.assertEqual(header.part_names, ['rgba', 'diffuse'])
+        self.assertEqual(header.parts[1].chunk_count, 2)
+        self.assertEqual(exr_layers(header), frozenset({'rgba', 'diffuse'}))
+        self.assertFalse(is_truncated(self.read_bytes(), header))
+
+    def test_truncated_header(self):
+        write_exr(self.path, flat_channels({'rgba': (1, 1, 1, 1)}, 4, 2), 4, 2)
+        data = self.read_bytes()
+        header_end = parse_exr_header(data).header_end
+        for size in (0, 4, 12, header_end // 2, header_end - 1):
+            with self.assertRaises(ExrHeaderError):
+                parse_exr_header(data[:size], self.path)
+
+    def test_truncated_multipart_header(self):
+        parts = [('rgba', flat_channels({'rgba': (1, 1, 1, 1)}, 4, 2)), ('emission', flat_channels({'rgba': (1, 1, 1, 1)}, 4, 2))]
+        write_multipart_exr(self.path, parts, 4, 2)
+        data = self.read_bytes()
+        # Without the empty header that ends the list of parts
+        with self.assertRaises(ExrHeaderError):
+            parse_exr_header(data[:parse_exr_header(data).header_end - 1])
+
+    def test_truncated_pixels(self):
+        write_exr(self.path, flat_channels({'rgba': (1, 1, 1, 1)}, 4, 4), 4, 4, 'zip')
+        data = self.read_bytes()
+        header = parse_exr_header(data)
+        self.assertFalse(is_truncated(data, header))
+        # The last chunk, then the offset table
+        self.assertTrue(is_truncated(data[:-2], header))
+        self.assertTrue(is_truncated(data[:header.header_end + 4], header))
+
+    def test_not_exr(self):
+        with open(self.path, 'wb') as exr_file:
+            exr_file.write(b'\x89PNG\r\n\x1a\n' + b'\0' * 32)
+        with self.assertRaises(ExrHeaderError):
+            read_exr_header(self.path)
+
+    def test_empty_file(self):
+        open(self.path, 'wb').close()
+        with self.assertRaises(ExrHeaderError):
+            read_exr_header(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
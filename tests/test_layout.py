@@ -0,0 +1,94 @@
+from __future__ import annotations
+import unittest
+
+from ..utilities.layout import (Rect, layer_kind, pack_templates, solve_layout)
+from ..utilities.template_plan import (PlanOptions)
+from ..utilities.templates import (BUILTIN_TEMPLATES)
+
+COMPLEX = BUILTIN_TEMPLATES['Complex']
+
+
+def column_layers(layers_dict: dict) -> list:
+    return [layer for group, layers in layers_dict.items() if 'Shadow' not in group for layer in layers]
+
+
+class SolveLayoutTest(unittest.TestCase):
+
+    def test_columns_inside_their_backdrops(self):
+        layout = solve_layout(COMPLEX)
+        for layer in column_layers(COMPLEX):
+            rect = layout.backdrops['{}/backdrop'.format(layer)]
+            for node_id, (x, y) in layout.positions.items():
+                # The dots are outside the backdrops, they take the layers from the read node
+                if node_id.startswith(layer + '/') and '/dot' not in node_id:
+                    self.assertTrue(rect.x <= x < rect.right and rect.y <= y <= rect.bottom, node_id)
+
+    def test_columns_do_not_overlap(self):
+        layout = solve_layout(COMPLEX)
+        rects = [layout.backdrops['{}/backdrop'.format(layer)] for layer in column_layers(COMPLEX)]
+        for left, right in zip(rects, rects[1:]):
+            self.assertLess(left.right, right.x)
+
+    def test_groups_enclose_their_columns(self):
+        layout = solve_layout(COMPLEX)
+        for group, layers in COMPLEX.items():
+            if 'Shadow' in group:
+                continue
+            outer = layout.backdrops['group/{}'.format(group)]
+            for layer in layers:
+                inner = layout.backdrops['{}/backdrop'.format(layer)]
+                self.assertTrue(outer.x <= inner.x and inner.right <= outer.right and outer.y <= inner.y, layer)
+                self.assertLess(outer.z_order, inner.z_order)
+
+    def test_passes_and_emission(self):
+        layout = solve_layout(COMPLEX)
+        self.assertEqual(layout.passes, tuple(layer for layer in column_layers(COMPLEX) if layer_kind(layer) == 'aov'))
+        self.assertEqual(layout.emission, 'emission')
+
+    def test_prune_moves_the_columns_down(self):
+        layout = solve_layout(COMPLEX)
+        pruned = solve_layout(COMPLEX, PlanOptions(prune=True))
+        self.assertNotIn('prune', layout.positions)
+        self.assertEqual(pruned.positions['prune'][1] - pruned.positions['unpremult'][1], 90)
+        self.assertEqual(pruned.positions['diffuse_direct/dot'][1] - layout.positions['diffuse_direct/dot'][1], 90)
+
+    def test_lean_albedo_has_no_column(self):
+        layout = solve_layout(COMPLEX, PlanOptions(lean=True))
+        self.assertNotIn('diffuse_albedo/backdrop', layout.backdrops)
+        self.assertLess(layout.positions['diffuse_direct/remove'][1], layout.positions['diffuse_direct/raw'][1])
+        self.assertNotIn('diffuse_direct/shuffle', layout.positions)
+
+    def test_tree_is_shorter_than_chain(self):
+        chain = solve_layout(COMPLEX)
+        tree = solve_layout(COMPLEX, PlanOptions(beauty='tree'))
+        self.assertEqual(chain.passes, tree.passes)
+        self.assertLess(tree.positions['premult'][1], chain.positions['premult'][1])
+
+    def test_bounds_enclose_everything(self):
+        layout = solve_layout(COMPLEX)
+        bounds = layout.bounds()
+        for x, y in layout.positions.values():
+            self.assertTrue(bounds.x <= x <= bounds.right and bounds.y <= y <= bounds.bottom)
+
+
+class PackTemplatesTest(unittest.TestCase):
+
+    def test_side_by_side(self):
+        bounds = [Rect(-50, 0, 500, 300)] * 3
+        origins = [(0, 0), (100, 50), (2000, 0)]
+        packed = pack_templates(origins, bounds, spacing=100)
+        self.assertEqual(packed[0], (0, 0))
+        self.assertEqual(packed[1], (600, 50))
+        # The template far away doesn't move
+        self.assertEqual(packed[2], (2000, 0))
+
+    def test_no_overlap(self):
+        bounds = [Rect(0, 0, 400, 400)] * 5
+        packed = pack_templates([(0, 0)] * 5, bounds, spacing=10)
+        xs = sorted(x for x, _ in packed)
+        for left, right in zip(xs, xs[1:]):
+            self.assertGreaterEqual(right - left, 410)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+from __future__ import annotations
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+
+from .exr_files import (flat_channels, write_exr)
+from .nuke_session import (nuke)
+from ..utilities.metadata_cache import (HEADER_SOURCE, METADATA_ENV, NUKE_SOURCE, FileMetadata, lookup_files,
+                                        prune_files, stat_files, store_files)
+from ..utilities.sanity_check import (AOV_check)
+
+LAYERS_DICT = {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect'], 'Emission': ['emission']}
+
+
+class MetadataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.db_path = os.path.join(self.folder.name, 'metadata.db')
+        self.path = os.path.join(self.folder.name, 'render.1001.exr')
+        write_exr(self.path, flat_channels({'rgba': (1, 1, 1, 1), 'diffuse_direct': (1, 1, 1)}, 2, 2), 2, 2)
+        self.stats = stat_files([self.path])
+
+    def store(self, layers: set, source: str) -> None:
+        size, mtime = self.stats[self.path]
+        self.assertTrue(store_files([FileMetadata(self.path, size, mtime, frozenset(layers), None, (1001, 1001),
+                                                  source)], self.db_path))
+
+    def test_each_source_has_its_entry(self):
+        self.store({'rgba', 'diffuse_direct'}, HEADER_SOURCE)
+        self.store({'rgba'}, NUKE_SOURCE)
+        header = lookup_files(self.stats, self.db_path)[self.path]
+        self.assertEqual((header.layers, header.source), (frozenset({'rgba', 'diffuse_direct'}), HEADER_SOURCE))
+        nuke_entry = lookup_files(self.stats, self.db_path, source=NUKE_SOURCE)[self.path]
+        self.assertEqual((nuke_entry.layers, nuke_entry.frame_range), (frozenset({'rgba'}), (1001, 1001)))
+
+    def test_changed_file_not_found(self):
+        self.store({'rgba'}, HEADER_SOURCE)
+        os.utime(self.path, ns=(0, 0))
+        self.assertEqual(lookup_files(stat_files([self.path]), self.db_path), dict())
+        self.assertEqual(prune_files(db_path=self.db_path), 1)
+
+    def test_old_format_dropped(self):
+        with closing(sqlite3.connect(self.db_path)) as connection:
+            connection.execute('CREATE TABLE files (path TEXT PRIMARY KEY)')
+            connection.execute('PRAGMA user_version = 1')
+        self.store({'rgba'}, HEADER_SOURCE)
+        self.assertIn(self.path, lookup_files(self.stats, self.db_path))
+
+
+class SanityCheckCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        os.environ[METADATA_ENV] = os.path.join(self.folder.name, 'metadata.db')
+        self.addCleanup(os.environ.pop, METADATA_ENV)
+        path = os.path.join(self.folder.name, 'render.1001.exr')
+        layers = {'rgba': (1, 1, 1, 1)}
+        layers.update((layer, (0.5, 0.5, 0.5)) for layers_list in LAYERS_DICT.values() for layer in layers_list)
+        write_exr(path, flat_channels(layers, 2, 2), 2, 2)
+        nuke.reset()
+        # Nuke finds fewer layers than the header, like a layer named differently
+        read_node = nuke.make_read('Read1', LAYERS_DICT['Diffuse'], file_path=path)
+        read_node['selected']._value = True
+
+    def check(self, parallel: bool) -> list:
+        read_data = AOV_check(LAYERS_DICT, parallel)
+        return [sorted(layers_found) for layers_found in read_data.values()]
+
+    def test_result_does_not_depend_on_the_first_check(self):
+        self.assertEqual(self.check(False), [['Diffuse']])
+        self.assertEqual(self.check(True), [['Diffuse', 'Emission']])
+        self.assertEqual(self.check(False), [['Diffuse']])
+        self.assertEqual(self.check(True), [['Diffuse', 'Emission']])
+
+
+if __name__ == '__main__':
+    unittest.main()
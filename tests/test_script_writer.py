@@ -0,0 +1,75 @@
+from __future__ import annotations
+import re
+import unittest
+
+from ..utilities.script_writer import (group_contents_script, plan_to_script, sort_plan_nodes)
+from ..utilities.template_plan import (GraphPlan, PlanNode, TAG_KNOB, plan_template)
+from ..utilities.templates import (BUILTIN_TEMPLATES)
+
+COMPLEX = BUILTIN_TEMPLATES['Complex']
+TAG_PATTERN = re.compile(r'^ {} "(.*)"$'.format(TAG_KNOB), re.MULTILINE)
+
+
+def script_ids(script: str) -> list:
+    return TAG_PATTERN.findall(script)
+
+
+def positions(script: str) -> list:
+    return [(int(x), int(y)) for x, y in re.findall(r'^ xpos (-?\d+)\n ypos (-?\d+)$', script, re.MULTILINE)]
+
+
+class PlanToScriptTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = plan_template(COMPLEX, 'Read1')
+
+    def test_a_block_for_each_node(self):
+        script = plan_to_script(self.plan)
+        ids = script_ids(script)
+        self.assertEqual(ids[:len(self.plan.backdrops)], [backdrop.id for backdrop in self.plan.backdrops])
+        self.assertEqual(sorted(ids[len(self.plan.backdrops):]), sorted(node.id for node in self.plan.nodes))
+        self.assertEqual(script.count('{'), script.count('}'))
+
+    def test_inputs_written_before_they_are_used(self):
+        script = plan_to_script(self.plan, input_variable='N_input')
+        defined = {'N_input'}
+        for line in script.splitlines():
+            if line.startswith('push $'):
+                self.assertIn(line[6:], defined)
+            elif line.startswith('set '):
+                defined.add(line.split()[1])
+        self.assertEqual(len(defined), len(self.plan.nodes) + 1)
+
+    def test_disconnected_input(self):
+        script = plan_to_script(self.plan)
+        self.assertNotIn('push $N_input', script)
+        self.assertEqual(script.splitlines()[0], 'BackdropNode {')
+
+    def test_offsets(self):
+        moved = positions(plan_to_script(self.plan, 100, -50))
+        self.assertEqual(moved, [(x + 100, y - 50) for x, y in positions(plan_to_script(self.plan))])
+
+    def test_group_contents(self):
+        script = group_contents_script(self.plan)
+        self.assertTrue(script.startswith('Input {'))
+        self.assertTrue(script.endswith('end_group\n'))
+        self.assertIn('push $N_{}\nOutput {{'.format(self.plan.output), script)
+        self.assertIs(script, group_contents_script(self.plan))
+
+
+class SortPlanNodesTest(unittest.TestCase):
+
+    def test_inputs_first(self):
+        nodes = (PlanNode('merge', 'Merge2', inputs=((0, 'a'), (1, 'b'))), PlanNode('b', 'Dot', inputs=((0, 'a'),)),
+                 PlanNode('a', 'Dot', inputs=((0, 'input'),)))
+        plan = GraphPlan('Read1', nodes, (), 'merge', None)
+        self.assertEqual([node.id for node in sort_plan_nodes(plan)], ['a', 'b', 'merge'])
+
+    def test_cycle(self):
+        nodes = (PlanNode('a', 'Dot', inputs=((0, 'b'),)), PlanNode('b', 'Dot', inputs=((0, 'a'),)))
+        with self.assertRaises(ValueError):
+            sort_plan_nodes(GraphPlan('Read1', nodes, (), 'b', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
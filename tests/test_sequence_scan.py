@@ -0,0 +1,70 @@
+from __future__ import annotations
+import os
+import tempfile
+import unittest
+
+from ..utilities.sequence_scan import (FrameIssue, frame_path, frame_ranges, scan_sequence, summarize_issues)
+from .exr_files import (flat_channels, write_exr)
+
+
+class FramePathTest(unittest.TestCase):
+
+    def test_printf(self):
+        self.assertEqual(frame_path('/renders/beauty.%04d.exr', 7), '/renders/beauty.0007.exr')
+        self.assertEqual(frame_path('/renders/beauty.%d.exr', 1001), '/renders/beauty.1001.exr')
+
+    def test_hashes(self):
+        self.assertEqual(frame_path('/renders/beauty.####.exr', 12), '/renders/beauty.0012.exr')
+        self.assertEqual(frame_path('/renders/beauty.#.exr', 1001), '/renders/beauty.1001.exr')
+
+    def test_without_frame(self):
+        self.assertEqual(frame_path('/renders/still.exr', 1001), '/renders/still.exr')
+
+
+class FrameRangesTest(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(frame_ranges([1001, 1002, 1003, 1005, 1007, 1008]), '1001-1003, 1005, 1007-1008')
+        self.assertEqual(frame_ranges([1001]), '1001')
+        self.assertEqual(frame_ranges([]), '')
+
+    def test_summarize_issues(self):
+        issues = [FrameIssue(1001, 'a', 'missing'), FrameIssue(1002, 'b', 'missing'),
+                  FrameIssue(1004, 'c', 'layers', ('coat',))]
+        self.assertEqual(summarize_issues(issues), ['missing: 1001-1002', 'without coat: 1004'])
+
+
+class ScanSequenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.pattern = os.path.join(self.folder.name, 'render.%04d.exr')
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_issues_in_frame_order(self):
+        write_exr(frame_path(self.pattern, 1), flat_channels({'rgba': (1, 1, 1, 1), 'diffuse': (1, 1, 1)}, 2, 2), 2, 2)
+        write_exr(frame_path(self.pattern, 2), flat_channels({'rgba': (1, 1, 1, 1)}, 2, 2), 2, 2)
+        open(frame_path(self.pattern, 4), 'wb').close()
+        frames = [(frame, frame_path(self.pattern, frame)) for frame in range(1, 5)]
+        issues = list(scan_sequence(frames, frozenset({'diffuse'}), workers=2))
+        self.assertEqual([(issue.frame, issue.problem) for issue in issues], [(2, 'layers'), (3, 'missing'), (4, 'empty')])
+        self.assertEqual(issues[0].layers, ('diffuse',))
+
+    def test_cancel_between_frames(self):
+        checks = list()
+
+        def cancelled():
+            checks.append(True)
+            return len(checks) >= 3
+
+        frames = ((frame, frame_path(self.pattern, frame)) for frame in range(1000))
+        issues = list(scan_sequence(frames, frozenset(), workers=2, cancelled=cancelled))
+        # Every frame is missing, the scan stops at the third one without reading the rest
+        self.assertEqual(len(checks), 3)
+        self.assertEqual(len(issues), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
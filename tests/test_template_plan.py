@@ -0,0 +1,56 @@
+from __future__ import annotations
+import unittest
+
+from ..utilities.template_plan import (PlanOptions, plan_template)
+from ..utilities.templates import (BUILTIN_TEMPLATES)
+
+COMPLEX = BUILTIN_TEMPLATES['Complex']
+LIGHTS_AFTER_DIFFUSE = {'Diffuse': ['diffuse_direct', 'diffuse_albedo'], 'Lights': ['RGBA_key']}
+
+
+def plan_nodes(layers_dict: dict, options = None) -> dict:
+    return {plan_node.id: plan_node for plan_node in plan_template(layers_dict, 'Read1', options).nodes}
+
+
+class LeanColumnsTest(unittest.TestCase):
+
+    def test_remove_keeps_the_aov_and_its_albedo(self):
+        nodes = plan_nodes(COMPLEX, PlanOptions(lean=True))
+        remove = nodes['specular_indirect/remove']
+        self.assertEqual(remove.node_class, 'Remove')
+        self.assertEqual(dict(remove.inputs), {0: 'specular_indirect/dot'})
+        knobs = dict(remove.knobs)
+        self.assertEqual(knobs['operation'], 'keep')
+        self.assertEqual(knobs['channels'].split(), ['specular_indirect.red', 'specular_indirect.green',
+                                                     'specular_indirect.blue', 'specular_albedo.red',
+                                                     'specular_albedo.green', 'specular_albedo.blue'])
+        self.assertEqual(dict(nodes['specular_indirect/raw'].inputs), {0: 'specular_indirect/remove'})
+
+    def test_fewer_nodes_than_full(self):
+        full = plan_nodes(COMPLEX)
+        lean = plan_nodes(COMPLEX, PlanOptions(lean=True))
+        self.assertLess(len(lean), len(full))
+        self.assertNotIn('diffuse_albedo/shuffle', lean)
+        self.assertNotIn('diffuse_direct/shuffle', lean)
+
+
+
+class GroupAlbedoTest(unittest.TestCase):
+
+    def test_group_without_albedo_keeps_its_lighting(self):
+        nodes = plan_nodes(LIGHTS_AFTER_DIFFUSE)
+        self.assertEqual(dict(nodes['diffuse_direct/raw'].inputs)[1], 'diffuse_albedo/dot_raw')
+        self.assertEqual(dict(nodes['RGBA_key/raw'].inputs), {0: 'RGBA_key/remove'})
+        self.assertEqual(dict(nodes['RGBA_key/pass'].inputs), {0: 'RGBA_key/raw'})
+
+    def test_lean_group_without_albedo_keeps_its_lighting(self):
+        nodes = plan_nodes(LIGHTS_AFTER_DIFFUSE, PlanOptions(lean=True))
+        self.assertEqual(dict(nodes['RGBA_key/remove'].knobs)['channels'].split(),
+                         ['RGBA_key.red', 'RGBA_key.green', 'RGBA_key.blue'])
+        raw_knobs = dict(nodes['RGBA_key/raw'].knobs)
+        self.assertEqual([raw_knobs['expr0'], raw_knobs['expr1'], raw_knobs['expr2']],
+                         ['RGBA_key.red', 'RGBA_key.green', 'RGBA_key.blue'])
+
+
+if __name__ == '__main__':
+    unittest.main()
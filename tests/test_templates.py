@@ -0,0 +1,102 @@
+from __future__ import annotations
+import unittest
+
+from ..utilities.templates import (BUILTIN_TEMPLATES, compile_template, expand_light_groups, find_template,
+                                   layer_bit, layers_mask, light_group_layers, match_template)
+
+COMPLEX = BUILTIN_TEMPLATES['Complex']
+LIGHT_GROUPS = BUILTIN_TEMPLATES['Light Groups']
+
+
+def match(layers_dict: dict, layers: set) -> tuple:
+    groups = compile_template('', layers_dict).groups
+    layers = frozenset(layers)
+    return match_template(groups, layers_mask(layers), light_group_layers(groups, layers))
+
+
+class MatchTemplateTest(unittest.TestCase):
+
+    def test_only_the_groups_found(self):
+        layers = {'rgba', 'crypto_object', 'diffuse_direct', 'diffuse_albedo', 'diffuse_indirect', 'shadow_matte'}
+        found, missing = match(COMPLEX, layers)
+        self.assertEqual(found, {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect'],
+                                 'Shadow': ['shadow_matte']})
+        self.assertEqual(missing, [])
+
+    def test_missing_layers_of_a_group(self):
+        found, missing = match(COMPLEX, {'diffuse_direct', 'diffuse_albedo', 'specular_albedo'})
+        self.assertEqual(found, dict())
+        self.assertEqual(missing, ['diffuse_indirect', 'specular_direct', 'specular_indirect'])
+
+    def test_nothing_found(self):
+        self.assertEqual(match(COMPLEX, {'rgba', 'depth'}), (dict(), []))
+
+    def test_new_layer_bit_clears_the_masks(self):
+        layers = frozenset({'test_new_layer'})
+        self.assertEqual(layers_mask(layers), 0)
+        bit = layer_bit('test_new_layer')
+        self.assertEqual(layers_mask(layers), bit)
+        # The bit is kept, so compiling again doesn't change it
+        self.assertEqual(layer_bit('test_new_layer'), bit)
+
+
+class FindTemplateTest(unittest.TestCase):
+
+    def test_compiled_once(self):
+        layers_dict = {'Test': ['test_direct', 'test_albedo']}
+        self.assertIs(find_template(layers_dict), find_template(dict(layers_dict)))
+
+    def test_group_order_is_kept(self):
+        first = find_template({'A': ['test_a'], 'B': ['test_b']})
+        second = find_template({'B': ['test_b'], 'A': ['test_a']})
+        self.assertEqual([group.name for group in second.groups], ['B', 'A'])
+        self.assertIsNot(first, second)
+
+class LightGroupsTest(unittest.TestCase):
+
+    def test_a_column_for_each_light_group(self):
+        layers = {'diffuse_direct_key', 'diffuse_direct_rim', 'diffuse_indirect_key', 'diffuse_albedo',
+                  'emission', 'RGBA_key'}
+        found, missing = match(LIGHT_GROUPS, layers)
+        self.assertEqual(missing, [])
+        self.assertEqual(found, {'Diffuse': ['diffuse_direct_key', 'diffuse_direct_rim', 'diffuse_albedo',
+                                             'diffuse_indirect_key'],
+                                 'Emission': ['emission']})
+
+    def test_light_groups_without_albedo(self):
+        found, missing = match(LIGHT_GROUPS, {'specular_direct_key', 'specular_indirect_key', 'emission'})
+        self.assertEqual(missing, ['specular_albedo'])
+
+    def test_longest_name_wins(self):
+        layers_dict = {'Lights': ['diffuse_*', 'diffuse_direct_*', 'diffuse_albedo']}
+        found = expand_light_groups(layers_dict, frozenset({'diffuse_direct_key', 'diffuse_fill', 'diffuse_albedo'}))
+        self.assertEqual(found, {'Lights': ['diffuse_fill', 'diffuse_direct_key', 'diffuse_albedo']})
+
+    def test_layers_of_the_templates_are_not_light_groups(self):
+        layers_dict = {'Diffuse': ['diffuse_*', 'diffuse_albedo']}
+        compile_template('', COMPLEX)
+        found = expand_light_groups(layers_dict, frozenset({'diffuse_direct', 'diffuse_albedo', 'diffuse_key'}))
+        self.assertEqual(found, {'Diffuse': ['diffuse_key', 'diffuse_albedo']})
+
+    def test_group_without_light_groups(self):
+        layers_dict = {'Lights': ['RGBA_*'], 'Emission': ['emission']}
+        self.assertEqual(expand_light_groups(layers_dict, frozenset({'emission'})), {'Emission': ['emission']})
+        self.assertEqual(expand_light_groups(layers_dict, frozenset({'RGBA_key', 'RGBA_rim'})),
+                         {'Lights': ['RGBA_key', 'RGBA_rim']})
+
+
+class FindTemplateTest(unittest.TestCase):
+
+    def test_compiled_once(self):
+        layers_dict = {'Test': ['test_direct', 'test_albedo']}
+        self.assertIs(find_template(layers_dict), find_template(dict(layers_dict)))
+
+    def test_group_order_is_kept(self):
+        first = find_template({'A': ['test_a'], 'B': ['test_b']})
+        second = find_template({'B': ['test_b'], 'A': ['test_a']})
+        self.assertEqual([group.name for group in second.groups], ['B', 'A'])
+        self.assertIsNot(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
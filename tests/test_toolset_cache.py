@@ -0,0 +1,71 @@
+from __future__ import annotations
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..utilities.template_plan import (PlanOptions, layers_signature)
+from ..utilities.templates import (BUILTIN_TEMPLATES)
+from ..utilities.toolset_cache import (evict_toolsets, has_toolset, load_toolset, remove_old_versions, save_toolset,
+                                       tool_version, toolset_dir, toolset_key)
+
+COMPLEX = BUILTIN_TEMPLATES['Complex']
+FOUND = {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect']}
+
+
+class ToolsetKeyTest(unittest.TestCase):
+
+    def test_same_key(self):
+        self.assertEqual(toolset_key('Complex', COMPLEX, layers_signature(FOUND), PlanOptions()),
+                         toolset_key('Complex', dict(COMPLEX), layers_signature(dict(FOUND)), PlanOptions()))
+
+    def test_key_changes(self):
+        signature = layers_signature(FOUND)
+        keys = {toolset_key('Complex', COMPLEX, signature, PlanOptions()),
+                toolset_key('Complex', COMPLEX, signature, None),
+                toolset_key('Complex', COMPLEX, signature, PlanOptions(lean=True)),
+                toolset_key('Complex', COMPLEX, signature, PlanOptions(beauty='tree')),
+                toolset_key('Custom', COMPLEX, signature, PlanOptions()),
+                toolset_key('Complex', BUILTIN_TEMPLATES['Simple'], signature, PlanOptions()),
+                toolset_key('Complex', COMPLEX, layers_signature({'Diffuse': ['diffuse_direct']}), PlanOptions())}
+        self.assertEqual(len(keys), 7)
+
+
+class ToolsetFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp(prefix='arnold_aovs_test_')
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+
+    def test_save_and_load(self):
+        self.assertFalse(has_toolset('key', self.cache_dir))
+        self.assertIsNone(load_toolset('key', self.cache_dir))
+        save_toolset('key', 'Dot {\n}\n', self.cache_dir)
+        self.assertTrue(has_toolset('key', self.cache_dir))
+        self.assertEqual(load_toolset('key', self.cache_dir), 'Dot {\n}\n')
+        self.assertEqual(os.listdir(toolset_dir(self.cache_dir)), ['key.nk'])
+
+    def test_least_recently_used_evicted(self):
+        for index, key in enumerate(('first', 'second', 'third')):
+            save_toolset(key, 'x' * 100, self.cache_dir)
+            os.utime(os.path.join(toolset_dir(self.cache_dir), key + '.nk'), (index, index))
+        # Loading a toolset marks it as the most recent one
+        load_toolset('first', self.cache_dir)
+        evict_toolsets(toolset_dir(self.cache_dir), 250)
+        self.assertEqual(sorted(os.listdir(toolset_dir(self.cache_dir))), ['first.nk', 'third.nk'])
+        save_toolset('fourth', 'x' * 100, self.cache_dir, max_bytes=250)
+        self.assertEqual(sorted(os.listdir(toolset_dir(self.cache_dir))), ['first.nk', 'fourth.nk'])
+
+    def test_old_versions_removed(self):
+        old_dir = os.path.join(self.cache_dir, 'old_version')
+        os.makedirs(old_dir)
+        save_toolset('key', 'Dot {\n}\n', self.cache_dir)
+        self.assertEqual(os.listdir(self.cache_dir), [tool_version()])
+        os.makedirs(old_dir)
+        remove_old_versions(self.cache_dir)
+        self.assertEqual(os.listdir(self.cache_dir), [tool_version()])
+        self.assertTrue(has_toolset('key', self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
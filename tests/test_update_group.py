@@ -0,0 +1,79 @@
+from __future__ import annotations
+import unittest
+
+from .nuke_session import (nuke)
+from ..utilities.btn_actions import (build_group, find_template_group, update_group)
+from ..utilities.nuke_helper import (get_tagged_nodes)
+from ..utilities.template_plan import (OUTPUT, PlanOptions, plan_template)
+
+LAYERS_DICT = {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect'], 'Emission': ['emission']}
+
+
+class UpdateGroupTest(unittest.TestCase):
+
+    def setUp(self):
+        nuke.reset()
+        self.read_node = nuke.make_read('Read1', [layer for layers in LAYERS_DICT.values() for layer in layers])
+        self.progress_bar = nuke.ProgressTask('Test')
+        build_group(LAYERS_DICT, self.read_node, self.progress_bar)
+
+    def group_nodes(self) -> dict:
+        return get_tagged_nodes(find_template_group(self.read_node))
+
+    def insert_grade(self, node_id: str, index: int = 0):
+        """
+         Adds a Grade of an artist in an input of a node of the template.
+        """
+        group_node = find_template_group(self.read_node)
+        node = self.group_nodes()[node_id]
+        with group_node:
+            grade = nuke.nodes.Grade()
+            grade.setInput(0, node.input(index))
+            node.setInput(index, grade)
+        return grade
+
+    def update(self, options = None) -> None:
+        self.assertTrue(update_group(LAYERS_DICT, nuke.toNode('Read1'), self.progress_bar, options))
+        self.assertEqual(len(nuke.allNodes('Group')), 1)
+
+    def test_group_found(self):
+        self.assertEqual(find_template_group(nuke.toNode('Read1')).name(), 'Read1 Group 1')
+
+    def test_nothing_connected_again(self):
+        inputs = nuke.stats['input']
+        self.update()
+        self.assertEqual(nuke.stats['input'], inputs)
+
+    def test_grade_kept_in_a_column(self):
+        grade = self.insert_grade('diffuse_direct/pass')
+        self.update()
+        nodes = self.group_nodes()
+        self.assertEqual(nodes['diffuse_direct/pass'].input(0), grade)
+        self.assertEqual(grade.input(0), nodes['diffuse_direct/raw'])
+
+    def test_grade_kept_before_the_output(self):
+        grade = self.insert_grade(OUTPUT)
+        self.update()
+        nodes = self.group_nodes()
+        self.assertEqual(nodes[OUTPUT].input(0), grade)
+        self.assertEqual(grade.input(0), nodes['premult'])
+
+    def test_grade_connected_to_the_new_node(self):
+        grade = self.insert_grade('alpha/copy')
+        self.update(PlanOptions(beauty='tree'))
+        plan = plan_template(LAYERS_DICT, 'Read1', PlanOptions(beauty='tree'))
+        source_id = dict(plan.node('alpha/copy').inputs)[0]
+        nodes = self.group_nodes()
+        self.assertEqual(nodes['alpha/copy'].input(0), grade)
+        self.assertEqual(grade.input(0), nodes[source_id])
+
+    def test_wrong_input_connected_again(self):
+        nodes = self.group_nodes()
+        nodes['diffuse_direct/pass'].setInput(0, nodes['diffuse_direct/remove'])
+        self.update()
+        nodes = self.group_nodes()
+        self.assertEqual(nodes['diffuse_direct/pass'].input(0), nodes['diffuse_direct/raw'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# States of a background build that has ended, it starts checking and then building
+FINISHED_STATES = ('built', 'cancelled', 'failed')
+
+
+class BackgroundBuild(object):
+    """
+     A build that doesn't block Nuke. The sanity check and the plans of the templates run in a worker thread, then the
+     templates are built in the main thread one read node at a time and Nuke draws the DAG and the viewers between them.
+     It has the methods of a progress bar so the build functions report to it, the window reads its state with poll.
+    """
+
+    def __init__(self, template_type: str, new_group: bool, paste: bool = False, full_sequence: bool = False,
+                 update: bool = False, options = None, parallel: bool = False):
+        """
+         @template_type: str - Name of the template selected.
+         @new_group: bool - True to create a new group node, False builds the template next to the read node.
+         @paste: bool - True to write all the templates as a Nuke script and paste them with a single call.
+         @full_sequence: bool - True to check the header of every frame of the read nodes.
+         @update: bool - True to update the groups already built for the read nodes instead of creating new ones.
+         @options: PlanOptions|None - The options of the plan, None uses the default ones.
+         @parallel: bool - True to read the files and frames of the read nodes in a pool of threads, False one by one.
+        """
+        self.template_type = template_type
+        self.new_group = new_group
+        self.paste = paste
+        self.full_sequence = full_sequence
+        self.update = update
+        self.options = options
+        self.parallel = parallel
+        self.state = 'checking'
+        self.error = ''
+        self._message = ''
+        self._progress = 0
+        self._built = 0
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._steps = None
+        self._trace_path = None
+
+    # Methods of the progress bar, they are used from both threads
+    def setMessage(self, message: str) -> None:
+        with self._lock:
+            self._message = message
+
+    def setProgress(self, progress: int) -> None:
+        with self._lock:
+            self._progress = progress
+
+    def isCancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """
+         Asks the build to stop, the read nodes already built keep their templates.
+
+         @return None.
+        """
+        self._cancelled.set()
+
+    def poll(self) -> tuple:
+        """
+         Gets the state of the build to show it.
+
+         @return Tuple with the state, the message and the progress from 0 to 100.
+        """
+        with self._lock:
+            return self.state, self._message, self._progress
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def start(self) -> None:
+        """
+         Starts the build, it must be called from the main thread. The read nodes selected and their files are read
+         here, the rest of the check runs in the worker thread.
+
+         @return None.
+        """
+        from .btn_actions import (begin_trace, template_selection)
+        from .nuke_helper import (error_messages, get_file_path, get_frame_paths, get_type_nodes)
+        from .sanity_check import (read_frame_ranges)
+        read_nodes = get_type_nodes('Read')
+        if not read_nodes:
+            error_messages('Select the read nodes to build the template', 'warning')
+            self._finish('cancelled')
+            return
+        # The trace covers the check in the worker thread and every step built in the main one
+        self._trace_path = begin_trace(self.template_type)
+        # An error before the worker starts ends the trace and the build, the window stops waiting for it
+        try:
+            layers_dict = template_selection(self.template_type)
+            inputs = {'read_nodes': read_nodes,
+                      'names': {read_node: read_node['name'].value() for read_node in read_nodes},
+                      'file_paths': {read_node: get_file_path(read_node) for read_node in read_nodes},
+                      'frame_ranges': read_frame_ranges(read_nodes),
+                      'frame_paths': {read_node: get_frame_paths(read_node) for read_node in read_nodes}
+                      if self.full_sequence else dict()}
+            self.setMessage('Searching for correct AOVs in the read nodes selected')
+            worker = threading.Thread(target=self._check_and_plan, args=(layers_dict, inputs), name='AOVs check')
+            worker.daemon = True
+            worker.start()
+        except Exception as error:
+            self._fail(error)
+
+    def _check_and_plan(self, layers_dict: dict, inputs: dict) -> None:
+        """
+         Checks the read nodes and plans their templates in the worker thread, then the build continues in the main one.
+
+         @layers_dict: dict - Dictionary with the AOV's needed for the template.
+         @inputs: dict - The read nodes with their names, files and frames read in the main thread.
+
+         @return None.
+        """
+        from .nuke_helper import (run_in_main_thread)
+        from .tracer import (span)
+        try:
+            with span('AOV_check', 'check', reads=len(inputs['read_nodes'])):
+                read_data = self._check(layers_dict, inputs)
+            if read_data:
+                self._plan(read_data, inputs['names'])
+        except Exception as error:
+            run_in_main_thread(self._fail, error)
+            return
+        if read_data and not self.isCancelled():
+            run_in_main_thread(self._start_build, read_data)
+        else:
+            run_in_main_thread(self._finish, 'failed' if self.error else 'cancelled')
+
+    def _check(self, layers_dict: dict, inputs: dict) -> dict|None:
+        """
+         Checks the AOV's of the read nodes, and every frame when full_sequence is set, without blocking Nuke. The files
+         are found in the metadata database or their headers are read, in a pool of threads when parallel is set, only
+         the files that are not OpenEXR ask Nuke for their channels.
+
+         @layers_dict: dict - Dictionary with the AOV's needed for the template.
+         @inputs: dict - The read nodes with their names, files and frames read in the main thread.
+
+         @return Dictionary with the read nodes and AOV's found, if something went wrong None.
+        """
+        from .metadata_cache import (HEADER_SOURCE, NUKE_SOURCE)
+        from .nuke_helper import (call_in_main_thread, get_layer_set, run_in_main_thread)
+        from .sanity_check import (PARALLEL_WORKERS, cached_file_layers, check_file, compare_layers,
+                                   report_missing_aovs, report_wrong_frames, store_read_layers, template_sets)
+        from .sequence_scan import (scan_sequence, summarize_issues)
+        read_nodes = inputs['read_nodes']
+        workers = PARALLEL_WORKERS if self.parallel else 1
+        template_groups = template_sets(layers_dict)
+        found_layers, file_stats = cached_file_layers(inputs['file_paths'], HEADER_SOURCE)
+        new_reads = [read_node for read_node in read_nodes if read_node not in found_layers]
+        header_layers = dict()
+        nuke_layers = dict()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(read_node, executor.submit(check_file, inputs['file_paths'][read_node]))
+                       for read_node in new_reads]
+            for index, (read_node, future) in enumerate(futures):
+                self.setMessage('Reviewing {}'.format(inputs['names'][read_node]))
+                layers = future.result()
+                # The files that can't be read as OpenEXR are checked by Nuke
+                if layers is None:
+                    nuke_layers[read_node] = call_in_main_thread(get_layer_set, read_node)
+                else:
+                    header_layers[read_node] = layers
+                self.setProgress(int(40.0 * (index + 1) / len(new_reads)))
+                if self.isCancelled():
+                    for _, pending in futures:
+                        pending.cancel()
+                    return None
+        store_read_layers(header_layers, file_stats, inputs['frame_ranges'], HEADER_SOURCE)
+        store_read_layers(nuke_layers, file_stats, inputs['frame_ranges'], NUKE_SOURCE)
+        found_layers.update(header_layers)
+        found_layers.update(nuke_layers)
+        read_data = dict()
+        wrong_data = dict()
+        for read_node in read_nodes:
+            layers_found, missing_layers = compare_layers(template_groups, found_layers[read_node])
+            if missing_layers:
+                wrong_data[read_node] = missing_layers
+            else:
+                read_data[read_node] = layers_found
+        run_in_main_thread(report_missing_aovs, read_nodes, wrong_data)
+        if wrong_data:
+            self.error = 'There are some missing AOVs'
+            return None
+        if not self.full_sequence:
+            return read_data
+        # Checks the rest of the frames of the Read nodes
+        wrong_frames = dict()
+        for index, (read_node, layers_found) in enumerate(read_data.items()):
+            self.setMessage('Reviewing frames of {}'.format(inputs['names'][read_node]))
+            required_layers = frozenset(layer for layers in layers_found.values() for layer in layers)
+            issues = list(scan_sequence(inputs['frame_paths'][read_node], required_layers, workers, self.isCancelled))
+            if self.isCancelled():
+                return None
+            if issues:
+                wrong_frames[read_node] = summarize_issues(issues)
+            self.setProgress(40 + int(40.0 * (index + 1) / len(read_data)))
+        if wrong_frames:
+            run_in_main_thread(report_wrong_frames, wrong_frames)
+            self.error = 'There are some wrong frames'
+            return None
+        return read_data
+
+    def _plan(self, read_data: dict, names: dict) -> None:
+        """
+         Plans the templates in the worker thread, the plans are cached so the main thread only creates the nodes.
+
+         @read_data: dict - The read nodes with the dictionary of the AOV's found in groups.
+         @names: dict - The read nodes with their names.
+
+         @return None.
+        """
+        from .template_plan import (READ_PLACEHOLDER, plan_template)
+        from .tracer import (span)
+        self.setMessage('Planning the templates')
+        with span('plan', 'build', reads=len(read_data)):
+            for read_node, layers_found in read_data.items():
+                # The groups use the same plan for every read node, the rest are planned with the name of the read node
+                plan_template(layers_found, READ_PLACEHOLDER if self.paste and self.new_group and not self.update else names[read_node],
+                              self.options)
+                if self.isCancelled():
+                    return
+
+    def _start_build(self, read_data: dict) -> None:
+        """
+         Starts building the templates in the main thread.
+
+         @read_data: dict - The read nodes with the dictionary of the AOV's found in groups.
+
+         @return None.
+        """
+        from .btn_actions import (build_steps)
+        if self.isCancelled():
+            self._finish('cancelled')
+            return
+        with self._lock:
+            self.state = 'building'
+        self._steps = build_steps(read_data, self.template_type, self.new_group, self.paste, self.update, self,
+                                  self.options)
+        self._build_next()
+
+    def _build_next(self) -> None:
+        """
+         Builds the template of the next read node in its own undo and leaves the next one for when Nuke is idle.
+
+         @return None.
+        """
+        from .nuke_helper import (build_transaction, run_in_main_thread)
+        if self.isCancelled():
+            self._steps.close()
+            self._finish('cancelled')
+            return
+        try:
+            with build_transaction('Build {} Template'.format(self.template_type)):
+                read_name = next(self._steps, None)
+        except Exception as error:
+            self._fail(error)
+            return
+        if read_name is None:
+            self._finish('built')
+            return
+        self._built += 1
+        run_in_main_thread(self._build_next)
+
+    def _fail(self, error: Exception) -> None:
+        """
+         Ends the build showing the error, it runs in the main thread.
+
+         @error: Exception - The error raised.
+
+         @return None.
+        """
+        from .nuke_helper import (error_messages)
+        self.error = '{0}: {1}'.format(type(error).__name__, error)
+        self._finish('failed')
+        error_messages('The template was not built\n{}'.format(self.error))
+
+    def _finish(self, state: str) -> None:
+        """
+         Ends the build.
+
+         @state: str - built, cancelled or failed.
+
+         @return None.
+        """
+        from .btn_actions import (end_trace)
+        end_trace(self._trace_path)
+        self._trace_path = None
+        with self._lock:
+            self.state = state
+            if state == 'built':
+                self._progress = 100
+                self._message = 'Built {} Template'.format(self.template_type)
+            elif state == 'cancelled':
+                self._message = 'Cancelled, {} read nodes were built'.format(self._built)
+            else:
+                self._message = self.error
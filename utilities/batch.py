@@ -0,0 +1,229 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from fnmatch import fnmatchcase
+
+# Line printed by the Nuke session of a script with its result as JSON
+RESULT_PREFIX = 'AOV_BATCH_RESULT '
+# Number of Nuke sessions running at the same time
+BATCH_WORKERS = 4
+# Characters of the output of a failed session kept in the summary
+OUTPUT_TAIL = 2000
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """
+     The result of building the templates in a script.
+
+     @script: str - The path of the script.
+     @ok: bool - True if the templates were built and the script saved.
+     @seconds: float - The time used by the script.
+     @reads: tuple - The names of the read nodes with a template.
+     @error: str - The reason the script failed.
+    """
+    script: str
+    ok: bool
+    seconds: float
+    reads: tuple = ()
+    error: str = ''
+
+
+def build_script(script_path: str, template_type: str, read_filter: str = '*', new_group: bool = True,
+                 paste: bool = False, output_path: str|None = None, update: bool = False, options = None) -> BatchResult:
+    """
+     Builds the template for the read nodes of a script and saves it, it runs inside a terminal Nuke session.
+
+     @script_path: str - The path of the script.
+     @template_type: str - Name of the template.
+     @read_filter: str - Pattern with wildcards for the names of the read nodes used.
+     @new_group: bool - True to create a new group node, False builds the template next to the read node.
+     @paste: bool - True to write all the templates as a Nuke script and paste them with a single call.
+     @output_path: str|None - Path where the script is saved, None overwrites the script.
+     @update: bool - True to update the groups already built instead of creating new ones.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return BatchResult.
+    """
+    from .btn_actions import (build_templates, template_selection)
+    from .nuke_helper import (deselect_nodes, get_all_type_nodes, open_script, save_script, select_nodes)
+    from .sanity_check import (AOV_check)
+    start = time.perf_counter()
+    open_script(script_path)
+    read_nodes = [read_node for read_node in get_all_type_nodes('Read') if fnmatchcase(read_node.name(), read_filter)]
+    if not read_nodes:
+        return BatchResult(script_path, False, time.perf_counter() - start, error='No read nodes match {}'.format(read_filter))
+    # The sanity check works with the read nodes selected as in the window
+    deselect_nodes()
+    select_nodes(read_nodes)
+    read_data = AOV_check(template_selection(template_type))
+    if not read_data:
+        return BatchResult(script_path, False, time.perf_counter() - start, error='There are some missing AOVs')
+    build_templates(read_data, template_type, new_group, paste, update, options=options)
+    deselect_nodes()
+    save_script(output_path or script_path)
+    reads = tuple(read_node.name() for read_node in read_data)
+    return BatchResult(script_path, True, time.perf_counter() - start, reads)
+
+
+def session_command(nuke_executable: str, script_path: str, args) -> list:
+    """
+     Gets the command that starts a terminal Nuke session to build a single script.
+
+     @nuke_executable: str - The path of the Nuke executable.
+     @script_path: str - The path of the script.
+     @args: Namespace - The arguments of the batch.
+
+     @return List with the command.
+    """
+    entry_point = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'aovs_batch.py')
+    command = [nuke_executable, '-t', entry_point, script_path, '--single', '--template', args.template,
+               '--reads', args.reads]
+    if not args.group:
+        command.append('--comp')
+    if args.paste:
+        command.append('--paste')
+    if args.update:
+        command.append('--update')
+    if args.beauty != 'chain':
+        command.extend(['--beauty', args.beauty])
+    if args.lean:
+        command.append('--lean')
+    if args.prune:
+        command.append('--prune')
+    if args.display != 'full':
+        command.extend(['--display', args.display])
+    if args.output_dir:
+        command.extend(['--output-dir', args.output_dir])
+    return command
+
+
+def run_session(command: list, script_path: str) -> BatchResult:
+    """
+     Runs a terminal Nuke session and reads its result.
+
+     @command: list - The command of the session.
+     @script_path: str - The path of the script built by the session.
+
+     @return BatchResult.
+    """
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    except OSError as error:
+        return BatchResult(script_path, False, time.perf_counter() - start, error=str(error))
+    seconds = time.perf_counter() - start
+    for line in reversed(process.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            # The messages of Nuke explain why the script failed
+            error = result['error']
+            if not result['ok']:
+                error += '\n' + process.stdout[:process.stdout.rfind(RESULT_PREFIX)][-OUTPUT_TAIL:].strip()
+            # The time includes starting Nuke and loading the script
+            return BatchResult(script_path, result['ok'], round(seconds, 3), tuple(result['reads']), error.strip())
+    return BatchResult(script_path, False, round(seconds, 3), error='Nuke exited with code {0}\n{1}'.format(
+        process.returncode, process.stdout[-OUTPUT_TAIL:]))
+
+
+def run_batch(script_paths: list, args, nuke_executable: str, workers: int = BATCH_WORKERS) -> list:
+    """
+     Builds the templates of many scripts with a terminal Nuke session for each one, several sessions run at the same time.
+
+     @script_paths: list - The paths of the scripts.
+     @args: Namespace - The arguments of the batch.
+     @nuke_executable: str - The path of the Nuke executable.
+     @workers: int - The number of Nuke sessions at the same time.
+
+     @return List of BatchResult in the same order of the scripts.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_session, session_command(nuke_executable, script_path, args), script_path)
+                   for script_path in script_paths]
+        results = list()
+        for future in futures:
+            result = future.result()
+            print('{0} {1} ({2:.1f}s)'.format('OK  ' if result.ok else 'FAIL', result.script, result.seconds))
+            results.append(result)
+    return results
+
+
+def write_summary(results: list, summary_path: str, seconds: float) -> None:
+    """
+     Writes the results of a batch as JSON.
+
+     @results: list - The BatchResult of each script.
+     @summary_path: str - The path of the summary file.
+     @seconds: float - The time used by all the batch.
+
+     @return None.
+    """
+    summary = {'scripts': len(results),
+               'failed': sum(1 for result in results if not result.ok),
+               'seconds': round(seconds, 3),
+               'results': [asdict(result) for result in results]}
+    with open(summary_path, 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+
+
+def parse_args(argv: list):
+    """
+     Reads the arguments of the command line.
+
+     @argv: list - The arguments without the name of the program.
+
+     @return Namespace with the arguments.
+    """
+    from .template_plan import (BEAUTY_MODES, DISPLAY_PROFILES)
+    parser = argparse.ArgumentParser(prog='aovs_batch', description="Builds Arnold AOV's templates in many Nuke scripts.")
+    parser.add_argument('scripts', nargs='+', help='The Nuke scripts to build.')
+    parser.add_argument('--template', default='Complex', help='Name of the template.')
+    parser.add_argument('--reads', default='*', help='Pattern with wildcards for the names of the read nodes.')
+    parser.add_argument('--comp', dest='group', action='store_false', help='Build next to the read nodes instead of in a group.')
+    parser.add_argument('--paste', action='store_true', help='Paste the templates as a Nuke script.')
+    parser.add_argument('--update', action='store_true', help='Update the groups already built instead of creating new ones.')
+    parser.add_argument('--beauty', default='chain', choices=BEAUTY_MODES, help='How the passes are merged to recreate the beauty.')
+    parser.add_argument('--lean', action='store_true', help='Build the lean templates with fewer nodes per column.')
+    parser.add_argument('--prune', action='store_true', help='Keep only the channels of the template after the unpremult.')
+    parser.add_argument('--display', default='full', choices=DISPLAY_PROFILES, help='How much of the template is drawn in the node graph.')
+    parser.add_argument('--output-dir', help='Folder where the scripts are saved, by default they are overwritten.')
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help='Number of Nuke sessions at the same time.')
+    parser.add_argument('--nuke', default=os.environ.get('NUKE_EXECUTABLE', sys.executable), help='The Nuke executable.')
+    parser.add_argument('--summary', default='aovs_batch_summary.json', help='Path of the summary file.')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list) -> int:
+    """
+     Entry point of the command line, with --single it builds one script inside the current Nuke session.
+
+     @argv: list - The arguments without the name of the program.
+
+     @return Integer with the exit code.
+    """
+    from .template_plan import (PlanOptions)
+    args = parse_args(argv)
+    if args.single:
+        script_path = args.scripts[0]
+        output_path = os.path.join(args.output_dir, os.path.basename(script_path)) if args.output_dir else None
+        try:
+            options = PlanOptions(beauty=args.beauty, lean=args.lean, prune=args.prune, display=args.display)
+            result = build_script(script_path, args.template, args.reads, args.group, args.paste, output_path,
+                                  args.update, options)
+        except Exception as error:
+            result = BatchResult(script_path, False, 0.0, error='{0}: {1}'.format(type(error).__name__, error))
+        print(RESULT_PREFIX + json.dumps(asdict(result)))
+        return 0 if result.ok else 1
+    start = time.perf_counter()
+    results = run_batch(args.scripts, args, args.nuke, args.workers)
+    write_summary(results, args.summary, time.perf_counter() - start)
+    failed = sum(1 for result in results if not result.ok)
+    print('{0} scripts, {1} failed, summary in {2}'.format(len(results), failed, args.summary))
+    return 1 if failed else 0
@@ -0,0 +1,521 @@
+from __future__ import annotations
+import argparse
+import mmap
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy
+
+# Scanlines verified by each task, a 4K frame is split in about 35 tasks
+BLOCK_LINES = 64
+# Number of processes that verify the blocks
+VERIFY_WORKERS = os.cpu_count() or 4
+# Error allowed in each channel, relative to the beauty when it is over 1
+ERROR_TOLERANCE = 1e-3
+# Compressions decoded here, the rest are read with the OpenEXR module
+ZLIB_COMPRESSIONS = ('zips', 'zip')
+PIXEL_DTYPES = {'uint': numpy.dtype('<u4'), 'half': numpy.dtype('<f2'), 'float': numpy.dtype('<f4')}
+# Names of the channels of a layer in the files and in Nuke
+CHANNEL_NAMES = (('r', 'red'), ('g', 'green'), ('b', 'blue'), ('a', 'alpha'))
+
+
+class VerifyError(Exception):
+    """Raised when the pixels of a frame can't be read to verify it."""
+
+
+@dataclass(frozen=True)
+class ErrorStats:
+    """
+     The error of the beauty rebuilt against the rgba of a block or a whole frame.
+
+     @pixels: int - The pixels compared.
+     @total: float - The sum of the absolute error of every channel.
+     @squared: float - The sum of the squared error of every channel.
+     @maximum: float - The largest error of a channel.
+     @worst: tuple - The X and Y of the pixel with the largest error.
+     @bad_pixels: int - The pixels with a channel over the tolerance.
+    """
+    pixels: int = 0
+    total: float = 0.0
+    squared: float = 0.0
+    maximum: float = 0.0
+    worst: tuple = (0, 0)
+    bad_pixels: int = 0
+
+    @property
+    def mean(self) -> float:
+        return self.total / (self.pixels * 3) if self.pixels else 0.0
+
+    @property
+    def rms(self) -> float:
+        return (self.squared / (self.pixels * 3)) ** 0.5 if self.pixels else 0.0
+
+
+@dataclass(frozen=True)
+class FrameReport:
+    """
+     The result of verifying a frame.
+
+     @frame: int - The frame number.
+     @path: str - The path of the file.
+     @stats: ErrorStats - The error of the whole frame.
+     @error: str - The reason the frame could not be verified.
+    """
+    frame: int
+    path: str
+    stats: ErrorStats = ErrorStats()
+    error: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return not self.error and not self.stats.bad_pixels
+
+
+def beauty_terms(layers_dict: dict) -> tuple:
+    """
+     Gets the AOV's that rebuild the beauty paired with the albedo that divides them, like the columns of the template.
+     The shadow matte only masks a grade that changes nothing until it is tweaked, it is not needed.
+
+     @layers_dict: dict - All the AOV's of the template separated in groups.
+
+     @return Tuple with the layer and its albedo or None for the emission and the AOV's without albedo.
+    """
+    from .layout import (layer_kind)
+    terms = list()
+    for group, layers in layers_dict.items():
+        if 'Shadow' in group:
+            continue
+        # The last albedo of the group is used, a group without albedo keeps its lighting
+        albedo = None
+        for layer in layers:
+            if layer_kind(layer) == 'albedo':
+                albedo = layer
+        for layer in layers:
+            kind = layer_kind(layer)
+            if kind == 'emission':
+                terms.append((layer, None))
+            elif kind == 'aov':
+                terms.append((layer, albedo))
+    return tuple(terms)
+
+
+def term_layers(terms: tuple) -> tuple:
+    """
+     Gets the layers read to rebuild the beauty.
+
+     @terms: tuple - The layers and their albedo from beauty_terms.
+
+     @return Tuple with rgba and the layers sorted.
+    """
+    return ('rgba',) + tuple(sorted({layer for term in terms for layer in term if layer}))
+
+
+def layer_channels(part, layer: str) -> tuple|None:
+    """
+     Finds the channels of a layer in a part of the file, named as Nuke names the layers.
+
+     @part: ExrPart - The part of the file.
+     @layer: str - The name of the layer, rgba for the beauty.
+
+     @return Tuple with the red, green and blue channels, and alpha for rgba, or None if one is missing.
+    """
+    from .exr_header import (DEFAULT_LAYERS)
+    found = dict()
+    for channel in part.channels:
+        if '.' in channel.name:
+            channel_layer, suffix = channel.name.rsplit('.', 1)
+            channel_layer = channel_layer.replace('.', '_')
+        else:
+            channel_layer, suffix = DEFAULT_LAYERS.get(channel.name), channel.name
+        if channel_layer == layer:
+            found[suffix.lower()] = channel
+    names = CHANNEL_NAMES if layer == 'rgba' else CHANNEL_NAMES[:3]
+    channels = tuple(found.get(short, found.get(name)) for short, name in names)
+    return None if None in channels else channels
+
+
+def find_channels(header, layers: tuple) -> tuple:
+    """
+     Finds the part that has all the layers needed and their channels.
+
+     @header: ExrHeader - The header of the file.
+     @layers: tuple - The layers needed, rgba included.
+
+     @return Tuple with the index of the part and a dictionary with the channels of each layer.
+    """
+    missing = layers
+    for index, part in enumerate(header.parts):
+        channels = {layer: layer_channels(part, layer) for layer in layers}
+        missing = tuple(layer for layer in layers if channels[layer] is None)
+        if not missing:
+            return index, channels
+    raise VerifyError('{0} has no {1}'.format(header.path, ', '.join(missing)))
+
+
+def read_block(data, header, part_index: int, channels: dict, y_start: int, y_end: int) -> dict:
+    """
+     Reads the pixels of some scanlines decoding only the chunks that hold them.
+
+     @data: mmap - The bytes of the file.
+     @header: ExrHeader - The header of the file.
+     @part_index: int - The part that has the channels.
+     @channels: dict - The layers with their ExrChannel.
+     @y_start: int - The first scanline.
+     @y_end: int - The last scanline.
+
+     @return Dictionary with an array of float32 of each layer with the shape channels, lines, width.
+    """
+    from .exr_header import (LINES_PER_BLOCK, read_chunk_offsets)
+    part = header.parts[part_index]
+    offsets = read_chunk_offsets(data, header)[part_index]
+    x_min, y_min, x_max, y_max = part.data_window
+    width = x_max - x_min + 1
+    lines_per_chunk = LINES_PER_BLOCK[part.compression]
+    # Byte of each channel inside a scanline, they are stored one after the other sorted by name
+    line_size = 0
+    channel_start = dict()
+    for channel in part.channels:
+        if channel.x_sampling != 1 or channel.y_sampling != 1:
+            raise VerifyError('{0} has subsampled channels'.format(header.path))
+        channel_start[channel.name] = line_size
+        line_size += width * PIXEL_DTYPES[channel.pixel_type].itemsize
+    planes = {layer: numpy.empty((len(exr_channels), y_end - y_start + 1, width), numpy.float32)
+              for layer, exr_channels in channels.items()}
+    first_chunk = (y_start - y_min) // lines_per_chunk
+    last_chunk = (y_end - y_min) // lines_per_chunk
+    for chunk in range(first_chunk, last_chunk + 1):
+        # The chunk starts with the part number in multipart files, the first scanline and the size of the data
+        offset = offsets[chunk] + (4 if header.multipart else 0)
+        if offset + 8 > len(data):
+            raise VerifyError('{0} is truncated'.format(header.path))
+        chunk_y, size = struct.unpack_from('<ii', data, offset)
+        lines = min(lines_per_chunk, y_max - chunk_y + 1)
+        pixels = decode_chunk(data[offset + 8:offset + 8 + size], part.compression, lines * line_size, header.path)
+        pixels = pixels.reshape(lines, line_size)
+        # Only the scanlines of the chunk inside the block are copied
+        first = max(y_start, chunk_y)
+        last = min(y_end, chunk_y + lines - 1)
+        rows = slice(first - chunk_y, last - chunk_y + 1)
+        for layer, exr_channels in channels.items():
+            for index, channel in enumerate(exr_channels):
+                dtype = PIXEL_DTYPES[channel.pixel_type]
+                start = channel_start[channel.name]
+                values = numpy.ascontiguousarray(pixels[rows, start:start + width * dtype.itemsize]).view(dtype)
+                planes[layer][index, first - y_start:last - y_start + 1] = values
+    return planes
+
+
+def decode_chunk(raw: bytes, compression: str, size: int, path: str = ''):
+    """
+     Decodes the data of a chunk without compression or with ZIP.
+
+     @raw: bytes - The data of the chunk.
+     @compression: str - The name of the compression.
+     @size: int - The bytes of the chunk without compression.
+     @path: str - The path of the file used in the errors.
+
+     @return Array of uint8 with the scanlines of the chunk.
+    """
+    # Chunks that don't get smaller are stored without compression
+    if len(raw) == size:
+        return numpy.frombuffer(raw, numpy.uint8)
+    if compression not in ZLIB_COMPRESSIONS:
+        raise VerifyError('{0} has a chunk of {1} bytes instead of {2}'.format(path, len(raw), size))
+    try:
+        encoded = numpy.frombuffer(zlib.decompress(raw), numpy.uint8)
+    except zlib.error as error:
+        raise VerifyError('{0} has a broken chunk: {1}'.format(path, error))
+    if encoded.size != size:
+        raise VerifyError('{0} has a chunk of {1} bytes instead of {2}'.format(path, encoded.size, size))
+    # Every byte was stored as the difference with the previous one plus 128
+    deltas = encoded.astype(numpy.int64) - 128
+    deltas[0] = encoded[0]
+    predicted = (numpy.cumsum(deltas) & 0xff).astype(numpy.uint8)
+    # The even bytes were stored in the first half and the odd bytes in the second one
+    half = (size + 1) // 2
+    decoded = numpy.empty(size, numpy.uint8)
+    decoded[0::2] = predicted[:half]
+    decoded[1::2] = predicted[half:]
+    return decoded
+
+
+def read_block_openexr(path: str, channels: dict, y_start: int, y_end: int, width: int) -> dict:
+    """
+     Reads the pixels of some scanlines with the OpenEXR module, used for PIZ and the compressions not decoded here.
+
+     @path: str - The path of the file.
+     @channels: dict - The layers with their ExrChannel.
+     @y_start: int - The first scanline.
+     @y_end: int - The last scanline.
+     @width: int - The pixels of each scanline.
+
+     @return Dictionary with an array of float32 of each layer with the shape channels, lines, width.
+    """
+    try:
+        import Imath
+        import OpenEXR
+    except ImportError:
+        raise VerifyError('{} needs the OpenEXR module to be decoded'.format(path))
+    pixel_type = Imath.PixelType(Imath.PixelType.FLOAT)
+    exr_file = OpenEXR.InputFile(path)
+    try:
+        planes = dict()
+        for layer, exr_channels in channels.items():
+            planes[layer] = numpy.stack([
+                numpy.frombuffer(exr_file.channel(channel.name, pixel_type, y_start, y_end), numpy.float32)
+                .reshape(y_end - y_start + 1, width) for channel in exr_channels])
+        return planes
+    finally:
+        exr_file.close()
+
+
+def rebuild_beauty(planes: dict, terms: tuple):
+    """
+     Rebuilds the beauty with the math of the template: the unpremult, the raw lighting of each AOV divided by its
+     albedo where the albedo is not 0, the pass multiplied by the albedo, the sum of the passes and the emission and
+     the premult with the alpha of the render.
+
+     @planes: dict - The layers with their arrays of float32, rgba included.
+     @terms: tuple - The layers and their albedo from beauty_terms.
+
+     @return Array of float32 with the red, green and blue rebuilt.
+    """
+    alpha = planes['rgba'][3]
+    has_alpha = alpha != 0
+
+    def unpremult(layer: str):
+        return numpy.divide(planes[layer], alpha, out=planes[layer].copy(), where=has_alpha)
+
+    beauty = numpy.zeros_like(planes['rgba'][:3])
+    albedos = dict()
+    for layer, albedo in terms:
+        lighting = unpremult(layer)
+        if albedo is None:
+            beauty += lighting
+            continue
+        if albedo not in albedos:
+            albedos[albedo] = unpremult(albedo)
+        albedo_values = albedos[albedo]
+        raw = numpy.divide(lighting, albedo_values, out=lighting, where=albedo_values != 0)
+        beauty += raw * albedo_values
+    return beauty * alpha
+
+
+def block_errors(beauty, rgba, x_min: int, y_start: int, tolerance: float) -> ErrorStats:
+    """
+     Measures the error of the beauty rebuilt in a block.
+
+     @beauty: array - The red, green and blue rebuilt.
+     @rgba: array - The channels of the beauty of the render.
+     @x_min: int - The X of the first pixel of the scanlines.
+     @y_start: int - The first scanline of the block.
+     @tolerance: float - The error allowed in each channel.
+
+     @return ErrorStats.
+    """
+    reference = rgba[:3].astype(numpy.float64)
+    error = numpy.abs(beauty.astype(numpy.float64) - reference)
+    error[~numpy.isfinite(error)] = numpy.inf
+    pixel_error = error.max(axis=0)
+    worst = numpy.unravel_index(numpy.argmax(pixel_error), pixel_error.shape)
+    bad = (error > tolerance * numpy.maximum(numpy.abs(reference), 1.0)).any(axis=0)
+    return ErrorStats(pixels=pixel_error.size, total=float(error.sum()), squared=float(numpy.square(error).sum()),
+                      maximum=float(pixel_error[worst]), worst=(x_min + int(worst[1]), y_start + int(worst[0])),
+                      bad_pixels=int(bad.sum()))
+
+
+def add_errors(first: ErrorStats, second: ErrorStats) -> ErrorStats:
+    """
+     Joins the error of two blocks.
+
+     @first: ErrorStats - The error of a block.
+     @second: ErrorStats - The error of another block.
+
+     @return ErrorStats.
+    """
+    worst = first if first.maximum >= second.maximum else second
+    return ErrorStats(pixels=first.pixels + second.pixels, total=first.total + second.total,
+                      squared=first.squared + second.squared, maximum=worst.maximum, worst=worst.worst,
+                      bad_pixels=first.bad_pixels + second.bad_pixels)
+
+
+def verify_block(path: str, y_start: int, y_end: int, terms: tuple, tolerance: float = ERROR_TOLERANCE) -> ErrorStats:
+    """
+     Rebuilds the beauty of some scanlines of a frame and measures its error, it runs in the pool of processes.
+
+     @path: str - The path of the file.
+     @y_start: int - The first scanline.
+     @y_end: int - The last scanline.
+     @terms: tuple - The layers and their albedo from beauty_terms.
+     @tolerance: float - The error allowed in each channel.
+
+     @return ErrorStats.
+    """
+    from .exr_header import (ExrHeaderError, parse_exr_header)
+    try:
+        with open(path, 'rb') as exr_file:
+            with mmap.mmap(exr_file.fileno(), 0, access=mmap.ACCESS_READ) as exr_map:
+                header = parse_exr_header(exr_map, path)
+                part_index, channels = find_channels(header, term_layers(terms))
+                part = header.parts[part_index]
+                x_min, _, x_max, _ = part.data_window
+                if part.tiles is None and part.compression in ('none',) + ZLIB_COMPRESSIONS:
+                    planes = read_block(exr_map, header, part_index, channels, y_start, y_end)
+                elif part_index == 0:
+                    planes = read_block_openexr(path, channels, y_start, y_end, x_max - x_min + 1)
+                else:
+                    raise VerifyError('{0} uses {1} in a part after the first one'.format(path, part.compression))
+    except (OSError, ValueError, ExrHeaderError) as error:
+        raise VerifyError(str(error))
+    return block_errors(rebuild_beauty(planes, terms), planes['rgba'], x_min, y_start, tolerance)
+
+
+def frame_blocks(path: str, layers: tuple, block_lines: int = BLOCK_LINES) -> list:
+    """
+     Splits the scanlines of the part with the layers of a frame in blocks, only the header is read.
+
+     @path: str - The path of the file.
+     @layers: tuple - The layers needed, rgba included.
+     @block_lines: int - The scanlines of each block.
+
+     @return List with the first and last scanline of each block.
+    """
+    from .exr_header import (ExrHeaderError, read_exr_header)
+    try:
+        header = read_exr_header(path)
+    except (OSError, ExrHeaderError) as error:
+        raise VerifyError(str(error))
+    part_index, _ = find_channels(header, layers)
+    _, y_min, _, y_max = header.parts[part_index].data_window
+    return [(y_start, min(y_start + block_lines - 1, y_max)) for y_start in range(y_min, y_max + 1, block_lines)]
+
+
+def verify_sequence(frames, layers_dict: dict, workers: int = VERIFY_WORKERS, block_lines: int = BLOCK_LINES,
+                    tolerance: float = ERROR_TOLERANCE):
+    """
+     Verifies that the template rebuilds the beauty of every frame of a sequence. The frames are split in blocks of
+     scanlines verified in a pool of processes, only a few blocks are in flight so the memory used is the same for
+     any size of frame and length of sequence.
+
+     @frames: iterable - Tuples with the frame number and the path of the file.
+     @layers_dict: dict - All the AOV's of the template separated in groups.
+     @workers: int - The number of processes.
+     @block_lines: int - The scanlines of each block.
+     @tolerance: float - The error allowed in each channel.
+
+     @return Generator of FrameReport in frame order.
+    """
+    terms = beauty_terms(layers_dict)
+    layers = term_layers(terms)
+    # Each frame keeps its error and the blocks that are still in flight
+    pending = deque()
+
+    def collect(state: dict, future):
+        try:
+            state['stats'] = add_errors(state['stats'], future.result())
+        except VerifyError as error:
+            state['error'] = state['error'] or str(error)
+        state['blocks'] -= 1
+        return FrameReport(state['frame'], state['path'], state['stats'], state['error']) if not state['blocks'] else None
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for frame, path in frames:
+            try:
+                blocks = frame_blocks(path, layers, block_lines)
+            except VerifyError as error:
+                blocks, error_text = list(), str(error)
+            else:
+                error_text = ''
+            if not blocks:
+                # Waits for the frames before it so the reports keep the order
+                while pending:
+                    report = collect(*pending.popleft())
+                    if report:
+                        yield report
+                yield FrameReport(frame, path, error=error_text or '{} has no pixels'.format(path))
+                continue
+            state = {'frame': frame, 'path': path, 'stats': ErrorStats(), 'error': '', 'blocks': len(blocks)}
+            for y_start, y_end in blocks:
+                pending.append((state, executor.submit(verify_block, path, y_start, y_end, terms, tolerance)))
+                if len(pending) >= workers * 2:
+                    report = collect(*pending.popleft())
+                    if report:
+                        yield report
+        while pending:
+            report = collect(*pending.popleft())
+            if report:
+                yield report
+
+
+def match_frame_template(path: str, layers_dict: dict) -> dict:
+    """
+     Gets the groups of a template found in a frame like the sanity check of the tool, the light group patterns are
+     expanded with the light groups of the frame. The rest of the frames must have the same AOV's.
+
+     @path: str - The path of the frame.
+     @layers_dict: dict - All the AOV's of the template separated in groups.
+
+     @return Dictionary with the groups of the template found in the frame and their layers.
+    """
+    from .exr_header import (ExrHeaderError, exr_layers, read_exr_header)
+    from .sanity_check import (compare_layers, template_sets)
+    try:
+        found_layers = exr_layers(read_exr_header(path))
+    except (OSError, ExrHeaderError) as error:
+        raise VerifyError(str(error))
+    layers_found, missing_layers = compare_layers(template_sets(layers_dict), found_layers)
+    if missing_layers:
+        raise VerifyError('{0} has some missing AOVs: {1}'.format(path, ', '.join(missing_layers)))
+    if not layers_found:
+        raise VerifyError('{} has none of the AOVs of the template'.format(path))
+    return layers_found
+
+
+def main(argv: list) -> int:
+    """
+     Entry point of the verifier.
+
+     @argv: list - The arguments without the name of the program.
+
+     @return Integer with the exit code, 1 if a frame could not be verified or has pixels over the tolerance.
+    """
+    from .btn_actions import (template_selection)
+    from .sequence_scan import (frame_path)
+    from .templates import (get_registry)
+    parser = argparse.ArgumentParser(prog='aovs_verify',
+                                     description="Checks that the Arnold AOV's of a template rebuild the beauty.")
+    parser.add_argument('path', help='Path of the render, %%04d or #### for the frame number.')
+    parser.add_argument('--template', required=True, choices=get_registry().names(), help='Name of the template.')
+    parser.add_argument('--frames', type=int, nargs=2, metavar=('FIRST', 'LAST'), help='First and last frame.')
+    parser.add_argument('--workers', type=int, default=VERIFY_WORKERS, help='Number of processes.')
+    parser.add_argument('--block-lines', type=int, default=BLOCK_LINES, help='Scanlines verified by each task.')
+    parser.add_argument('--tolerance', type=float, default=ERROR_TOLERANCE, help='Error allowed in each channel.')
+    args = parser.parse_args(argv)
+    if args.frames:
+        frames = ((frame, frame_path(args.path, frame)) for frame in range(args.frames[0], args.frames[1] + 1))
+    else:
+        frames = [(0, args.path)]
+    # Only the groups of the template found in the first frame are verified
+    try:
+        layers_dict = match_frame_template(frame_path(args.path, args.frames[0]) if args.frames else args.path,
+                                           template_selection(args.template))
+    except VerifyError as error:
+        print(error)
+        return 1
+    failed = 0
+    print('{0:>8}{1:>12}{2:>12}{3:>12}{4:>16}{5:>12}'.format('frame', 'mean', 'rms', 'max', 'worst pixel', 'bad pixels'))
+    for report in verify_sequence(frames, layers_dict, args.workers, args.block_lines, args.tolerance):
+        failed += not report.ok
+        if report.error:
+            print('{0:>8}  {1}'.format(report.frame, report.error))
+            continue
+        stats = report.stats
+        print('{0:>8}{1:>12.6f}{2:>12.6f}{3:>12.6f}{4:>16}{5:>12}'.format(
+            report.frame, stats.mean, stats.rms, stats.maximum, '{0}, {1}'.format(*stats.worst), stats.bad_pixels))
+    if failed:
+        print('{} frames do not rebuild the beauty'.format(failed))
+    return 1 if failed else 0
@@ -1,34 +1,214 @@
 from __future__ import annotations
+import os
+import re
 
-def run_create(template_type: str, new_group: bool) -> None:
+# Name of the groups built by the tool
+GROUP_NAME = re.compile(r'^(.+) Group (\d+)$')
+
+
+def run_create(template_type: str, new_group: bool, paste: bool = False, parallel: bool = False,
+               full_sequence: bool = False, update: bool = False, options = None) -> None:
     """
      Separates all the AOVs using the template type selected to review or apply corrections if needed.
 
      @param template_type: str - Name of the template selected.
      @param new_group: bool - True to create a new group node, False deletes and create the original.
+     @param paste: bool - True to write all the templates as a Nuke script and paste them with a single call.
+     @param parallel: bool - True to check the files of the read nodes in a pool of threads.
+     @param full_sequence: bool - True to check the header of every frame of the read nodes.
+     @param update: bool - True to update the groups already built for the read nodes instead of creating new ones.
+     @param options: PlanOptions|None - The options of the plan, None uses the default ones.
 
      @return None.
     """
-    from .nuke_helper import (create_progress_task)
-    from .sanity_check import (AOV_check)
+    from .tracer import (span)
+    trace_path = begin_trace(template_type)
+    try:
+        with span('run_create'):
+            create_templates(template_type, new_group, paste, parallel, full_sequence, update, options)
+    finally:
+        end_trace(trace_path)
+
+
+def begin_trace(template_type: str) -> str|None:
+    """
+     Starts tracing a build when the environment variable has the path of the trace file.
+
+     @template_type: str - Name of the template selected.
+
+     @return String with the path of the trace file, None if the build is not traced.
+    """
+    from .tracer import (TRACE_ENV, start_trace)
+    trace_path = os.environ.get(TRACE_ENV)
+    if trace_path:
+        start_trace('{} Template'.format(template_type))
+    return trace_path or None
+
+
+def end_trace(trace_path: str|None) -> None:
+    """
+     Stops tracing a build and writes the trace, a trace that can't be written only shows a warning so the error of
+     the build is not hidden.
+
+     @trace_path: str|None - The path of the trace file from begin_trace.
+
+     @return None.
+    """
+    from .nuke_helper import (error_messages)
+    from .tracer import (stop_trace, write_trace)
+    trace = stop_trace()
+    if not trace_path or trace is None:
+        return
+    try:
+        write_trace(trace, trace_path)
+    except (OSError, TypeError, ValueError) as error:
+        error_messages('The trace could not be written in {0}: {1}'.format(trace_path, error), 'warning')
+        return
+    error_messages('The trace of the build was written in {}'.format(trace_path), 'notice')
+
+
+def create_templates(template_type: str, new_group: bool, paste: bool = False, parallel: bool = False,
+                     full_sequence: bool = False, update: bool = False, options = None) -> None:
+    """
+     Checks the selected read nodes and builds their templates in a single undo.
+
+     @param template_type: str - Name of the template selected.
+     @param new_group: bool - True to create a new group node, False deletes and create the original.
+     @param paste: bool - True to write all the templates as a Nuke script and paste them with a single call.
+     @param parallel: bool - True to check the files of the read nodes in a pool of threads.
+     @param full_sequence: bool - True to check the header of every frame of the read nodes.
+     @param update: bool - True to update the groups already built for the read nodes instead of creating new ones.
+     @param options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return None.
+    """
+    from .nuke_helper import (BuildCancelled, build_transaction, create_progress_task)
+    from .sanity_check import (AOV_check, sequence_check)
+    from .tracer import (span)
     # Looks for the template needed
     layers_dict = template_selection(template_type)
-    # Do a sanity check in the selected Read nodes for the AOV's needed
-    read_data = AOV_check(layers_dict)
-    # Ends if there was an error in the Read nodes
-    if not read_data:
+    # A single progress bar and undo for the whole build, cancelling it undoes everything
+    task = create_progress_task('Building {} Template'.format(template_type))
+    with build_transaction('Build {} Template'.format(template_type)):
+        # Do a sanity check in the selected Read nodes for the AOV's needed
+        with span('AOV_check', 'check'):
+            read_data = AOV_check(layers_dict, parallel, task=task)
+        # Checks the rest of the frames of the Read nodes
+        if read_data and full_sequence:
+            with span('sequence_check', 'check'):
+                read_data = sequence_check(read_data, task=task)
+        # Ends if there was an error in the Read nodes
+        if not read_data:
+            return
+        with span('build_templates', 'build'):
+            built = build_templates(read_data, template_type, new_group, paste, update, task, options)
+        if not built:
+            raise BuildCancelled()
+
+
+def build_templates(read_data: dict, template_type: str, new_group: bool, paste: bool = False,
+                    update: bool = False, task = None, options = None) -> bool:
+    """
+     Builds the template of every read node checked.
+
+     @read_data: dict - The read nodes with the dictionary of the AOV's found in groups.
+     @template_type: str - Name of the template selected.
+     @new_group: bool - True to create a new group node, False builds the template next to the read node.
+     @paste: bool - True to write all the templates as a Nuke script and paste them with a single call.
+     @update: bool - True to update the groups already built, the changes are applied node by node so paste is not used.
+     @task: Progress Bar|None - Progress bar of the whole build, None creates one.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return True if all the templates were built, False if it was cancelled.
+    """
+    from .nuke_helper import (create_progress_task)
+    if task is None:
+        task = create_progress_task('Building {} Template'.format(template_type))
+    for _ in build_steps(read_data, template_type, new_group, paste, update, task, options):
+        if task.isCancelled():
+            return False
+    return True
+
+
+def build_steps(read_data: dict, template_type: str, new_group: bool, paste: bool, update: bool, task,
+                options = None):
+    """
+     Builds the template of every read node checked one step at a time, the caller decides when to do the next one.
+
+     @read_data: dict - The read nodes with the dictionary of the AOV's found in groups.
+     @template_type: str - Name of the template selected.
+     @new_group: bool - True to create a new group node, False builds the template next to the read node.
+     @paste: bool - True to write all the templates as a Nuke script and paste them with a single call.
+     @update: bool - True to update the groups already built, the changes are applied node by node so paste is not used.
+     @task: Progress Bar - Progress bar of the whole build.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return Generator that yields the name of each read node built.
+    """
+    from .nuke_helper import (get_all_groups_names)
+    from .tracer import (span)
+    task.setProgress(0)
+    # The names of the groups are indexed once for all the read nodes
+    group_index = group_name_index(get_all_groups_names()) if new_group else None
+    # Builds all the templates at once writing them as a Nuke script
+    if paste and not (update and new_group):
+        with span('build_paste', 'build', reads=len(read_data)):
+            build_paste(read_data, task, new_group, template_type, group_index, options)
+        task.setProgress(100)
         return
+    # Places the templates side by side when they are built next to the read nodes
+    origins = dict() if new_group else plan_origins(read_data, options)
+    # The read nodes with the same AOV's as another one or with a toolset cached get a copy of the group
+    clones = dict()
+    if new_group and not update:
+        read_data, clones = split_shared_reads(read_data, template_type, options)
     # Calculates the progress bar for the selected Read nodes
-    progPerRead = 90.0/float(len(read_data))
+    progPerRead = 90.0/float(max(len(read_data), 1))
     progress = 10
     # Builds the template and starts the progress bar
     for read_node, layers_found in read_data.items():
-        task = create_progress_task('Building {} Template'.format(template_type))
-        build_up(layers_found, read_node, task, new_group)
+        read_name = read_node['name'].value()
+        task.setMessage('Building {}'.format(read_name))
+        with span('build_up', 'build', read=read_name):
+            build_up(layers_found, read_node, task, new_group, origins.get(read_node), update, group_index, options)
+        # The group built is saved so the next builds load it
+        if new_group and not update:
+            group_contents(layers_found, template_type, options)
         progress = int(progPerRead + progress)
         task.setProgress(progress)
-        if task.isCancelled():
-            return
+        yield read_name
+    if clones:
+        task.setMessage('Copying the {} Template'.format(template_type))
+        with span('build_paste', 'build', reads=len(clones)):
+            build_paste(clones, task, new_group, template_type, group_index, options)
+    task.setProgress(100)
+
+
+def split_shared_reads(read_data: dict, template_type: str|None = None, options = None) -> tuple:
+    """
+     Separates the first read node of each set of AOV's from the read nodes with the same set or with the group
+     already in the toolset cache.
+
+     @read_data: dict - The read nodes with the dictionary of the AOV's found in groups.
+     @template_type: str|None - Name of the template, None doesn't use the toolset cache.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return Tuple with the dictionary of the read nodes to build and the dictionary of the read nodes to copy.
+    """
+    from .template_plan import (layers_signature)
+    from .toolset_cache import (has_toolset)
+    unique = dict()
+    shared = dict()
+    signatures = set()
+    for read_node, layers_found in read_data.items():
+        signature = layers_signature(layers_found)
+        key = template_toolset_key(layers_found, template_type, options)
+        if signature in signatures or (key and has_toolset(key)):
+            shared[read_node] = layers_found
+        else:
+            signatures.add(signature)
+            unique[read_node] = layers_found
+    return unique, shared
 
 
 def template_selection(template_type: str) -> dict:
@@ -39,32 +219,29 @@ def template_selection(template_type: str) -> dict:
 
      @return Dictionary with the AOV's needed for the template.
     """
-    if template_type == 'Simple':
-        layers_dict = {'General': ['direct', 'albedo', 'indirect'],
-                       'Emission':['emission'],
-                       'Shadow':['shadow_matte']}
-    elif template_type == 'Intermediate':
-        layers_dict = {'Diffuse': ['diffuse', 'diffuse_albedo'],
-                       'SSS':['sss', 'sss_albedo'],
-                       'Transmission':['transmission', 'transmission_albedo'],
-                       'Specular':['specular', 'specular_albedo'],
-                       'Coat':['coat', 'coat_albedo'],
-                       'Sheen':['sheen', 'sheen_albedo'],
-                       'Emission':['emission'],
-                       'Shadow':['shadow_matte']}
-    elif template_type == 'Complex':
-        layers_dict = {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect'],
-                       'SSS':['sss_direct', 'sss_albedo', 'sss_indirect'],
-                       'Transmission':['transmission_direct', 'transmission_albedo', 'transmission_indirect'],
-                       'Specular':['specular_direct', 'specular_albedo', 'specular_indirect'],
-                       'Coat':['coat_direct', 'coat_albedo', 'coat_indirect'],
-                       'Sheen':['sheen_direct', 'sheen_albedo', 'sheen_indirect'],
-                       'Emission':['emission'],
-                       'Shadow':['shadow_matte']}
-    return layers_dict
-
-
-def build_up(layers_dict: dict, read_node, progress_bar, new_group: bool) -> None:
+    from .templates import (get_registry)
+    return get_registry().get(template_type).layers_dict
+
+
+def plan_origins(read_data: dict, options = None) -> dict:
+    """
+     Calculates where each template starts so the templates of all the read nodes are side by side without overlapping.
+
+     @read_data: dict - The read nodes with the dictionary of the AOV's found in groups.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return Dictionary with the read nodes and a tuple with the X and Y where the template starts.
+    """
+    from .layout import (pack_templates)
+    from .template_plan import (plan_template)
+    read_nodes = list(read_data)
+    origins = [(int(read_node['xpos'].value()), int(read_node['ypos'].value())) for read_node in read_nodes]
+    bounds = [plan_template(read_data[read_node], read_node['name'].value(), options).bounds for read_node in read_nodes]
+    return dict(zip(read_nodes, pack_templates(origins, bounds)))
+
+
+def build_up(layers_dict: dict, read_node, progress_bar, new_group: bool, origin: tuple|None = None,
+             update: bool = False, group_index: dict|None = None, options = None) -> None:
     """
      Wrapper to start building the template with a group or in direct in the workspace.
 
@@ -72,53 +249,239 @@ def build_up(layers_dict: dict, read_node, progress_bar, new_group: bool) -> Non
      @read_node: Nuke Node - A read node from nuke, to get specific information.
      @progress_bar: Progress Bar - Progress bar created in Nuke to update messages.
      @new_group: bool - True to create a new group node, False deletes and create the original.
+     @origin: tuple|None - The X and Y where the template starts when it is built in the workspace.
+     @update: bool - True to update the group already built for the read node instead of creating a new one.
+     @group_index: dict|None - The index of the group names from group_name_index.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
 
      @return None.
     """
-    from .nuke_helper import (create_group, create_input, create_output, get_all_groups_names)
     # Verify for group nodes that has similar names to delete or create a new one
     if new_group:
-        build_group(layers_dict, read_node, progress_bar)
+        if update and update_group(layers_dict, read_node, progress_bar, options):
+            return
+        build_group(layers_dict, read_node, progress_bar, group_index, options)
     else:
-        node = build_comp(layers_dict, read_node, progress_bar)
+        node = build_comp(layers_dict, read_node, progress_bar, origin=origin, options=options)
 
 
-def build_group(layers_dict: dict, read_node, progress_bar) -> None:
+def build_paste(read_data: dict, progress_bar, new_group: bool, template_type: str|None = None,
+                group_index: dict|None = None, options = None) -> None:
+    """
+     Writes the templates of all the read nodes as a Nuke script and pastes it with a single call.
+
+     @read_data: dict - The read nodes with the dictionary of the AOV's found in groups.
+     @progress_bar: Progress Bar - Progress bar created in Nuke to update messages.
+     @new_group: bool - True to create a new group node, False builds the template next to the read node.
+     @template_type: str|None - Name of the template, the contents of the groups are kept in the toolset cache.
+     @group_index: dict|None - The index of the group names from group_name_index, None indexes the groups of the script.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return None.
+    """
+    from .nuke_helper import (get_all_groups_names, get_node_by_name, paste_script, deselect_nodes, set_input)
+    from .script_writer import (plan_to_script, shared_group_to_script)
+    from .template_plan import (INPUT, plan_template)
+    from .tracer import (span)
+    if group_index is None and new_group:
+        group_index = group_name_index(get_all_groups_names())
+    scripts = list()
+    connections = list()
+    progress_bar.setMessage('Planning the templates')
+    origins = dict() if new_group else plan_origins(read_data, options)
+    for read_node, layers_found in read_data.items():
+        read_name = read_node['name'].value()
+        # The groups of the read nodes with the same AOV's are written once and only the names change
+        if new_group:
+            contents = group_contents(layers_found, template_type, options)
+            group_name = '{0} Group {1}'.format(read_name, next_group_seq(group_index, read_name))
+            scripts.append(shared_group_to_script(contents, read_name, group_name, read_node['xpos'].value(),
+                                                  read_node['ypos'].value()+100))
+            connections.append((group_name, read_node))
+            continue
+        plan = plan_template(layers_found, read_name, options)
+        # The nodes connected to the read are found by name after pasting, if the name is taken it is built node by node
+        entry_names = [dict(plan_node.knobs)['name'] for plan_node in plan.nodes if (0, INPUT) in plan_node.inputs]
+        if any(get_node_by_name(entry_name) for entry_name in entry_names):
+            build_comp(layers_found, read_node, progress_bar, origin=origins[read_node], options=options)
+            continue
+        xpos, ypos = origins[read_node]
+        scripts.append(plan_to_script(plan, xpos, ypos))
+        connections.extend((entry_name, read_node) for entry_name in entry_names)
+    progress_bar.setMessage('Pasting the templates')
+    deselect_nodes()
+    with span('paste', 'build'):
+        paste_script('\n'.join(scripts))
+    for node_name, read_node in connections:
+        set_input(get_node_by_name(node_name), 0, read_node)
+    deselect_nodes()
+
+
+def group_contents(layers_dict: dict, template_type: str|None = None, options = None) -> str:
+    """
+     Gets the contents of the group of a template as Nuke script, they are loaded from the toolset cache or written
+     and saved in it.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+     @template_type: str|None - Name of the template, None doesn't use the toolset cache.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return String with the Nuke script planned for READ_PLACEHOLDER.
+    """
+    from .script_writer import (group_contents_script)
+    from .template_plan import (READ_PLACEHOLDER, plan_template)
+    from .toolset_cache import (load_toolset, save_toolset)
+    key = template_toolset_key(layers_dict, template_type, options)
+    contents = load_toolset(key) if key else None
+    if contents is None:
+        contents = group_contents_script(plan_template(layers_dict, READ_PLACEHOLDER, options))
+        if key:
+            save_toolset(key, contents)
+    return contents
+
+
+def template_toolset_key(layers_dict: dict, template_type: str|None, options = None) -> str|None:
+    """
+     Gets the key of the contents of a group in the toolset cache.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+     @template_type: str|None - Name of the template.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return String with the key or None if there is no template.
+    """
+    from .template_plan import (DEFAULT_OPTIONS, layers_signature)
+    from .toolset_cache import (toolset_key)
+    if not template_type:
+        return None
+    return toolset_key(template_type, template_selection(template_type), layers_signature(layers_dict),
+                       options or DEFAULT_OPTIONS)
+
+
+def group_name_index(group_names: list) -> dict:
+    """
+     Indexes the names of the groups built by the tool, named as "<Read> Group <N>", with the last sequence of each read node.
+
+     @group_names: list - The names of all the group nodes.
+
+     @return Dictionary with the name of the read nodes and their last sequence.
+    """
+    group_index = dict()
+    for group_name in group_names:
+        match = GROUP_NAME.match(group_name)
+        # The groups with other names are not built by the tool
+        if not match:
+            continue
+        read_name, seq = match.group(1), int(match.group(2))
+        if seq > group_index.get(read_name, 0):
+            group_index[read_name] = seq
+    return group_index
+
+
+def next_group_seq(group_index: dict, read_name: str) -> int:
+    """
+     Gets the next sequence for the group name of a read node and adds it to the index.
+
+     @group_index: dict - The index from group_name_index.
+     @read_name: str - The name of the read node.
+
+     @return Integer with the next sequence.
+    """
+    seq = group_index.get(read_name, 0) + 1
+    group_index[read_name] = seq
+    return seq
+
+
+def build_group(layers_dict: dict, read_node, progress_bar, group_index: dict|None = None, options = None) -> None:
     """
      Start building the template inside the group.
 
      @layers_dict: dict - A dictionary that contains all the AOV's in groups.
      @read_node: Nuke Node - A read node from nuke, to get specific information.
      @progress_bar: Progress Bar - Progress bar created in Nuke to update messages.
+     @group_index: dict|None - The index of the group names from group_name_index, None indexes the groups of the script.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
 
      @return None.
     """
-    from .nuke_helper import (create_group, create_input, create_output, get_all_groups_names)
-    group_names = get_all_groups_names()
-    next_seq = 1
-    seq_group = [int(group_name.split(' ')[-1]) for group_name in group_names if read_node['name'].value() in group_name]
-    if seq_group:
-        next_seq = max(seq_group) + 1
-    group_node = create_group(read_node['name'].value(), next_seq)
+    from .nuke_helper import (create_group, create_input, create_output, get_all_groups_names, set_input, set_knobs,
+                              tag_node)
+    from .template_plan import (GROUP, INPUT, OUTPUT)
+    if group_index is None:
+        group_index = group_name_index(get_all_groups_names())
+    read_name = read_node['name'].value()
+    group_node = create_group(read_name, next_group_seq(group_index, read_name))
+    tag_node(group_node, GROUP)
     # Starts creating the template inside the group
     with group_node:
         input_node = create_input()
+        tag_node(input_node, INPUT)
         # Set the position of the input, to go around the bug of not setting the template correctly
-        input_node['xpos'].setValue(0)
-        input_node['ypos'].setValue(0)
+        set_knobs(input_node, {'xpos': 0, 'ypos': 0})
         # Start building comp
-        last_node = build_comp(layers_dict, read_node, progress_bar, input_node)
+        last_node = build_comp(layers_dict, read_node, progress_bar, input_node, options=options)
         # Creates the Output
         output_node = create_output()
-        output_node.setInput(0, last_node)
-        output_node['xpos'].setValue(last_node['xpos'].value())
-        output_node['ypos'].setValue(last_node['ypos'].value()+50)
+        tag_node(output_node, OUTPUT)
+        set_input(output_node, 0, last_node)
+        set_knobs(output_node, {'xpos': last_node['xpos'].value(), 'ypos': last_node['ypos'].value()+50})
     # Set the group node position
-    group_node.setInput(0, read_node)
-    group_node['xpos'].setValue(read_node['xpos'].value())
-    group_node['ypos'].setValue(read_node['ypos'].value()+100)
+    set_input(group_node, 0, read_node)
+    set_knobs(group_node, {'xpos': read_node['xpos'].value(), 'ypos': read_node['ypos'].value()+100})
+
+
+def find_template_group(read_node):
+    """
+     Gets the last group built by the tool for a read node.
+
+     @read_node: Nuke Node - The read node connected to the group.
 
-def build_comp(layers_dict: dict, read_node, progress_bar, input_node = None) -> None:
+     @return Nuke node or None if there is no group for the read node.
+    """
+    from .nuke_helper import (get_all_type_nodes, get_node_tag, same_node)
+    from .template_plan import (GROUP)
+    groups = [group_node for group_node in get_all_type_nodes('Group')
+              if get_node_tag(group_node) == GROUP and same_node(group_node.input(0), read_node)]
+    if groups:
+        return groups[-1]
+    return None
+
+
+def update_group(layers_dict: dict, read_node, progress_bar, options = None) -> bool:
+    """
+     Updates the group already built for a read node, the columns of the new AOV's are created, the ones of the
+     AOV's that are not in the render anymore are deleted and the rest of the nodes keep their knobs.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+     @read_node: Nuke Node - A read node from nuke, to get specific information.
+     @progress_bar: Progress Bar - Progress bar created in Nuke to update messages.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return True if the group was updated, False if there is no group to update.
+    """
+    from .nuke_helper import (connect_planned, get_tagged_nodes, set_position, update_plan)
+    from .template_plan import (INPUT, OUTPUT, plan_template)
+    from .tracer import (span)
+    group_node = find_template_group(read_node)
+    if group_node is None:
+        return False
+    existing = get_tagged_nodes(group_node)
+    if INPUT not in existing or OUTPUT not in existing:
+        return False
+    progress_bar.setMessage('Updating {}'.format(group_node.name()))
+    with span('plan', 'build'):
+        plan = plan_template(layers_dict, read_node['name'].value(), options)
+    with group_node, span('update', 'build'):
+        created = update_plan(plan, existing[INPUT], existing)
+        last_node = created[plan.output]
+        output_node = existing[OUTPUT]
+        connect_planned(output_node, 0, last_node)
+        set_position(output_node, int(last_node['xpos'].value()), int(last_node['ypos'].value())+50)
+    return True
+
+
+def build_comp(layers_dict: dict, read_node, progress_bar, input_node = None, origin: tuple|None = None,
+               options = None):
     """
      Start building the template with the selected options.
 
@@ -126,340 +489,22 @@ def build_comp(layers_dict: dict, read_node, progress_bar, input_node = None) ->
      @read_node: Nuke Node - A read node from nuke, to get specific information.
      @progress_bar: Progress Bar - Progress bar created in Nuke to update messages.
      @input_node: Node|None -Default value as None if there is no input node and uses the read node otherwise uses the input node given.
+     @origin: tuple|None - The X and Y where the template starts, None uses the position of the input node.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
 
-     @return None.
+     @return Nuke node the last node of the template.
     """
+    from .nuke_helper import (apply_plan)
+    from .template_plan import (plan_template)
+    from .tracer import (span)
     if not input_node:
         input_node = read_node
-    # Set the first node of the template an unpremult
-    progress_bar.setMessage('Creating the unpremult')
-    unpremult_node = build_unpremult(input_node, read_node['name'].value())
-    # Start building all the AOV's found for the template
-    progress_bar.setMessage('Building the AOVs')
-    passes_merge, emission_node = build_layers(layers_dict, unpremult_node)
-    # Creates all the merges from all the passes to get the beauty again
-    progress_bar.setMessage('Building the beauty')
-    last_merge = build_beauty(passes_merge, emission_node)
-    # Copy the alpha from the original render
-    progress_bar.setMessage('Copying the alpha')
-    copy_node, dot_node = build_copy_alpha(unpremult_node, last_merge, read_node)
-    shadow_node = build_shadow_matte(layers_dict, copy_node, dot_node, read_node)
-    last_node = build_premult(shadow_node, read_node)
-    return last_node
-
-def build_unpremult(start_node, name: str):
-    """
-     Builds the unpremult node to start the template.
-
-     @start_node: Nuke node - Node used to get the position and start building from there.
-     @name: str - The name for the unpremult node.
-
-     @return A Nuke node the Unpremult Node.
-    """
-    from .nuke_helper import (create_unpremult)
-    start_pos_x = start_node['xpos'].value()
-    start_pos_y = start_node['ypos'].value()
-    unpremult_node = create_unpremult(name)
-    unpremult_node.setInput(0, start_node)
-    unpremult_node['xpos'].setValue(start_pos_x)
-    unpremult_node['ypos'].setValue(start_pos_y+90)
-    return unpremult_node
-
-
-def build_layers(layers_dict: dict, top_node):
-    """
-     Builds all the AOV's in columns using backdrops to separate each AOV and Group.
-
-     @layers_dict: dict - All the AOV's needed to recreate the beauty separated in groups.
-     @top_node: Nuke node - The starting position where the tree is going to be connected.
-
-     @return Tuple with all the merges that recreates the passes and the emission node that has the emission AOV or None.
-    """
-    from .nuke_helper import (deselect_nodes, select_nodes, create_backdrops, backdrop_wh_backdrops)
-    # Dot offset to start building the tree of the AOVs
-    dot_layers_offset_x = 34
-    dot_layers_offset_y = 90
-    emission_node = None
-    passes_merge = list()
-    # Loop through all the groups and layers needed
-    for group, layers in layers_dict.items():
-        all_merge_nodes = list()
-        backdrop_layers = list()
-        if 'Shadow' in group:
-            continue
-        for layer in layers:
-            # Deselects nodes to prevent not wanted connections
-            deselect_nodes()
-            # Look for specific names in the layers to give a different function
-            if 'albedo' in layer:
-                top_node, dot_albedo_nodes, backdrop_node = build_albedo(top_node, layer, dot_layers_offset_x, dot_layers_offset_y)
-                backdrop_layers.append(backdrop_node)
-            elif 'emission' in layer:
-                emission_node, backdrop_node = build_emission(top_node, layer, dot_layers_offset_x, dot_layers_offset_y)
-                backdrop_layers.append(backdrop_node)
-            else:
-                top_node, merge_nodes, backdrop_node = build_aov(top_node, layer, dot_layers_offset_x, dot_layers_offset_y)
-                all_merge_nodes.extend(merge_nodes)
-                backdrop_layers.append(backdrop_node)
-            # Create a new offset for the dots that connects
-            dot_layers_offset_x = backdrop_node['bdwidth'].value() + 50
-            dot_layers_offset_y = 0
-        # Connects all the merges to get the global lighting for comp and recreate the AOV
-        for merge_node in all_merge_nodes:
-            if 'Lighting' in merge_node['label'].value():
-                merge_node.setInput(1, dot_albedo_nodes[0])
-            elif 'Pass' in merge_node['label'].value():
-                merge_node.setInput(1, dot_albedo_nodes[1])
-                passes_merge.append(merge_node)
-        # Selects the backdrops of the layers to create a new backdrop with the group it belongs
-        select_nodes(backdrop_layers)
-        width, height = backdrop_wh_backdrops(backdrop_layers)
-        group_backdrop = create_backdrops(width=width, height=height, label=group)
-    return passes_merge, emission_node
-
-
-def build_beauty(passes_merge: list, emission_node):
-    """
-     Connects all the AOV's merge to recreate the beauty.
-
-     @passes_merge: list - List that contains all the merge nodes of the AOV's.
-     @emission_node: Nuke Node|None - Contains the last emission node to recreate the beauty or None if there is no emission.
-
-     @return A Nuke node the last merge node created.
-    """
-    from .nuke_helper import (create_dot, create_merge)
-    last_merge = passes_merge[0]
-    index = 1
-    # Loops through all the AOV's merge to recreate the beauty
-    while index < len(passes_merge):
-        pass_name = passes_merge[index]['label'].value().split(" ")[0]
-        merge_node = create_merge(pass_name, 'plus')
-        dot_node = create_dot(pass_name)
-        merge_node['xpos'].setValue(last_merge['xpos'].value())
-        merge_node['ypos'].setValue(last_merge['ypos'].value()+80)
-        dot_node['xpos'].setValue(passes_merge[index]['xpos'].value()+34)
-        dot_node['ypos'].setValue(merge_node['ypos'].value()+9)
-        merge_node.setInput(0, last_merge)
-        merge_node.setInput(1, dot_node)
-        dot_node.setInput(0, passes_merge[index])
-        last_merge = merge_node
-        index += 1
-    # Checks if the emission node is needed to complete the beauty
-    if emission_node:
-        dot_emission = create_dot('emission')
-        dot_emission.setInput(0, emission_node)
-        emission_merge = create_merge('emission', 'plus')
-        emission_merge.setInput(0, last_merge)
-        emission_merge.setInput(1, dot_emission)
-        emission_merge['xpos'].setValue(last_merge['xpos'].value())
-        emission_merge['ypos'].setValue(last_merge['ypos'].value()+60)
-        dot_emission['xpos'].setValue(emission_node['xpos'].value()+34)
-        dot_emission['ypos'].setValue(emission_merge['ypos'].value()+9)
-        last_merge = emission_merge
-    return last_merge
-
-
-def build_copy_alpha(unpremult_node, last_merge, read_node):
-    """
-     Builds the last part of the template copying the alpha from the original to the recreated beauty.
-
-     @unpremult_node: Nuke node - The node where it is going to copy the alpha.
-     @last_merge: Nuke node - The last merge node of the AOV's to paste the alpha.
-     @read_node: Nuke node - The read node to use the name.
-
-     @return A Nuke node the unpremult node
-    """
-    from .nuke_helper import (create_dot, create_copy)
-    dot_copy_1 = create_dot()
-    dot_copy_1.setInput(0, unpremult_node)
-    dot_copy_1['xpos'].setValue(unpremult_node['xpos'].value()-120)
-    dot_copy_1['ypos'].setValue(unpremult_node['ypos'].value()+3)
-    dot_copy_2 = create_dot()
-    dot_copy_2.setInput(0, dot_copy_1)
-    dot_copy_2['xpos'].setValue(dot_copy_1['xpos'].value())
-    dot_copy_2['ypos'].setValue(last_merge['ypos'].value()+68)
-    copy_node = create_copy(from_channels=['rgba.alpha'], to_channels=['rgba.alpha'], node_name=read_node['name'].value())
-    copy_node.setInput(0, last_merge)
-    copy_node.setInput(1, dot_copy_2)
-    copy_node['xpos'].setValue(dot_copy_2['xpos'].value()+120)
-    copy_node['ypos'].setValue(last_merge['ypos'].value()+60)
-    return copy_node, dot_copy_2
-
-
-def build_shadow_matte(layers_dict: dict, top_node, dot_node, read_node):
-    """
-     Build the tree for the Shadow Matte AOV.
-
-     @layers_dict: dict - Dictionary with all the layers founded in the read node.
-     @top_node: Nuke node - The starting node to connect the grade.
-     @dot_node: Nuke node - The dot node to get the Shadow AOV.
-     @read_node: Nuke node - The original read node to get the name.
-
-     @return Nuke Node.
-    """
-    from .nuke_helper import (shuffle_aov, select_nodes, create_backdrops, backdrop_wh_nodes, create_grade, deselect_nodes)
-    deselect_nodes()
-    if not layers_dict.get('Shadow'):
-        return top_node
-    layer = layers_dict.get('Shadow')
-    shuffle_node = shuffle_aov(layer[0])
-    shuffle_node.setInput(0, dot_node)
-    shuffle_node['xpos'].setValue(dot_node['xpos'].value()-34)
-    shuffle_node['ypos'].setValue(dot_node['ypos'].value()+130)
-    shuffle_node["mappings"].setValue('shadow_matte.red', 'rgba.alpha')
-    grade_node = create_grade(read_node['name'].value())
-    grade_node.setInput(0, top_node)
-    grade_node.setInput(grade_node.minInputs()-1, shuffle_node)
-    grade_node['xpos'].setValue(top_node['xpos'].value())
-    grade_node['ypos'].setValue(top_node['ypos'].value()+168)
-    nodes_to_select = [shuffle_node, grade_node]
-    select_nodes(nodes_to_select)
-    width, height = backdrop_wh_nodes(nodes_to_select)
-    backdrop_node = create_backdrops(width, height, 'Shadow')
-    return grade_node
-    
-
-def build_premult(top_node, read_node):
-    """
-     Build the tree to break the AOV.
-
-     @top_node: Nuke node - A nuke node to get the position to start building.
-     @read_node: str - The original read node to get the name.
-
-     @return Nuke Node.
-    """
-    from .nuke_helper import (create_premult, deselect_nodes)
-    premult_node = create_premult(read_node['name'].value())
-    premult_node.setInput(0, top_node)
-    premult_node['xpos'].setValue(top_node['xpos'].value())
-    premult_node['ypos'].setValue(top_node['ypos'].value()+120)
-    deselect_nodes()
-    return premult_node
-
-
-def build_aov(node_to_connect, layer: str, x_offset: int, y_offset: int):
-    """
-     Build the tree to break the AOV.
-
-     @node_to_connect: Nuke node - A nuke node to get the position to start building.
-     @layer: str - The name of the AOV to rename the nodes.
-     @x_offset: int - Offset in X for the dot node.
-     @ y_offset: int - Offset in Y for the dot node.
-
-     @return Tuple dot node to get the top position, merge nodes to break the AOV for the global lighting and recreate, backdrop node to create the group backdrop.
-    """
-    from .nuke_helper import (create_dot, shuffle_aov, create_remove, create_mergeExpression,
-                          create_mergePass, select_nodes, create_backdrops, backdrop_wh_nodes)
-    dot_node = create_dot()
-    dot_node.setInput(0, node_to_connect)
-    dot_node['xpos'].setValue(node_to_connect['xpos'].value()+x_offset)
-    dot_node['ypos'].setValue(node_to_connect['ypos'].value()+y_offset)
-    # Creates a shuffle to get the AOV
-    shuffle_node = shuffle_aov(layer)
-    shuffle_node.setInput(0, dot_node)
-    shuffle_node['xpos'].setValue(dot_node['xpos'].value()-34)
-    shuffle_node['ypos'].setValue(dot_node['ypos'].value()+180)
-    # Create a remove node to delete other layers and just get the specific AOV
-    remove_node = create_remove(layer)
-    remove_node.setInput(0, shuffle_node)
-    remove_node['xpos'].setValue(shuffle_node['xpos'].value())
-    remove_node['ypos'].setValue(shuffle_node['ypos'].value()+100)
-    # Merge to get the global lighting
-    merge_expression_node = create_mergeExpression(layer)
-    merge_expression_node.setInput(0, remove_node)
-    merge_expression_node['xpos'].setValue(remove_node['xpos'].value())
-    merge_expression_node['ypos'].setValue(remove_node['ypos'].value()+70)
-    # Merge to rebuild the AOV
-    merge_node = create_mergePass(layer)
-    merge_node.setInput(0, merge_expression_node)
-    merge_node['xpos'].setValue(merge_expression_node['xpos'].value())
-    merge_node['ypos'].setValue(merge_expression_node['ypos'].value()+400)
-    # Select node to create the backdrop and get the width and height
-    nodes_to_select = [shuffle_node, remove_node, merge_expression_node, merge_node]
-    select_nodes(nodes_to_select)
-    width, height = backdrop_wh_nodes(nodes_to_select)
-    backdrop_node = create_backdrops(width=width+200, height=height, label=layer, font_size=25)
-    # List of the merge nodes for connection with the albedo
-    merge_nodes = [merge_expression_node, merge_node]
-    return dot_node, merge_nodes, backdrop_node
-
-
-def build_albedo(node_to_connect, layer:str, x_offset: int, y_offset: int):
-    """
-     Build the tree for the albedo AOV.
-
-     @node_to_connect: Nuke node - A nuke node to get the position to start building.
-     @layer: str - The name of the AOV to rename the nodes.
-     @x_offset: int - Offset in X for the dot node.
-     @ y_offset: int - Offset in Y for the dot node.
-
-     @return Tuple dot node to get the top position, dot albedo nodes to connect to the merge to break and recreate the AOV, backdrop node to create the group backdrop.
-    """
-    from .nuke_helper import (create_dot, shuffle_aov, create_remove, select_nodes, create_backdrops, backdrop_wh_nodes)
-    dot_node = create_dot()
-    dot_node.setInput(0, node_to_connect)
-    dot_node['xpos'].setValue(node_to_connect['xpos'].value()+x_offset)
-    dot_node['ypos'].setValue(node_to_connect['ypos'].value()+y_offset)
-    # Creates a shuffle to get the AOV
-    shuffle_node = shuffle_aov(layer)
-    shuffle_node.setInput(0, dot_node)
-    shuffle_node['xpos'].setValue(dot_node['xpos'].value()-34)
-    shuffle_node['ypos'].setValue(dot_node['ypos'].value()+180)
-    # Create a remove node to delete other layers and just get the specific AOV
-    remove_node = create_remove(layer)
-    remove_node.setInput(0, shuffle_node)
-    remove_node['xpos'].setValue(shuffle_node['xpos'].value())
-    remove_node['ypos'].setValue(shuffle_node['ypos'].value()+100)
-    # Create a dot for the global lighting
-    dot_expression_node = create_dot()
-    dot_expression_node.setInput(0, remove_node)
-    dot_expression_node['xpos'].setValue(remove_node['xpos'].value()+34)
-    dot_expression_node['ypos'].setValue(remove_node['ypos'].value()+79)
-    # Create a dot to rebuild the AOV
-    dot_merge_node = create_dot()
-    dot_merge_node.setInput(0, dot_expression_node)
-    dot_merge_node['xpos'].setValue(dot_expression_node['xpos'].value())
-    dot_merge_node['ypos'].setValue(dot_expression_node['ypos'].value()+400)
-    # Select node to create the backdrop and get the width and height
-    nodes_to_select = [shuffle_node, remove_node, dot_expression_node, dot_merge_node]
-    select_nodes(nodes_to_select)
-    width, height = backdrop_wh_nodes(nodes_to_select)
-    backdrop_node = create_backdrops(width=width, height=height, label=layer, font_size=25)
-    # List of the dot nodes for connection with the other AOV's
-    dot_albedo_nodes = [dot_expression_node, dot_merge_node]
-    return dot_node, dot_albedo_nodes, backdrop_node
-
-
-def build_emission(node_to_connect, layer:str, x_offset: int, y_offset: int):
-    """
-     Build the tree for the emission AOV.
-
-     @node_to_connect: Nuke node - A nuke node to get the position to start building.
-     @layer: str - The name of the AOV to rename the nodes.
-     @x_offset: int - Offset in X for the dot node.
-     @ y_offset: int - Offset in Y for the dot node.
-
-     @return Tuple remove node to get the position of the last node for emission, backdrop node to create the group backdrop.
-    """
-    from .nuke_helper import (create_dot, shuffle_aov, create_remove, select_nodes, create_backdrops, backdrop_wh_nodes)
-    dot_node = create_dot()
-    dot_node.setInput(0, node_to_connect)
-    dot_node['xpos'].setValue(node_to_connect['xpos'].value()+x_offset)
-    dot_node['ypos'].setValue(node_to_connect['ypos'].value()+y_offset)
-    # Creates a shuffle to get the AOV
-    shuffle_node = shuffle_aov(layer)
-    shuffle_node.setInput(0, dot_node)
-    shuffle_node['xpos'].setValue(dot_node['xpos'].value()-34)
-    shuffle_node['ypos'].setValue(dot_node['ypos'].value()+180)
-    # Create a remove node to delete other layers and just get the specific AOV
-    remove_node = create_remove(layer)
-    remove_node.setInput(0, shuffle_node)
-    remove_node['xpos'].setValue(shuffle_node['xpos'].value())
-    remove_node['ypos'].setValue(shuffle_node['ypos'].value()+100)
-    # Select node to create the backdrop and get the width and height
-    nodes_to_select = [shuffle_node, remove_node]
-    select_nodes(nodes_to_select)
-    width, height = backdrop_wh_nodes(nodes_to_select)
-    backdrop_node = create_backdrops(width=width, height=height, label=layer, font_size=25)
-    return remove_node, backdrop_node
-
+    # Plans all the template without touching Nuke
+    progress_bar.setMessage('Planning the template')
+    with span('plan', 'build'):
+        plan = plan_template(layers_dict, read_node['name'].value(), options)
+    # Creates all the nodes, connections and backdrops planned
+    progress_bar.setMessage('Building the template')
+    with span('apply', 'build'):
+        created = apply_plan(plan, input_node, origin)
+    return created[plan.output]
@@ -0,0 +1,374 @@
+from __future__ import annotations
+import mmap
+import struct
+from dataclasses import dataclass
+
+EXR_MAGIC = 20000630
+# Flags of the version field
+TILED_FLAG = 0x200
+LONG_NAMES_FLAG = 0x400
+NON_IMAGE_FLAG = 0x800
+MULTIPART_FLAG = 0x1000
+COMPRESSIONS = ('none', 'rle', 'zips', 'zip', 'piz', 'pxr24', 'b44', 'b44a', 'dwaa', 'dwab')
+PIXEL_TYPES = ('uint', 'half', 'float')
+# Scanlines stored in each chunk by compression
+LINES_PER_BLOCK = {'none': 1, 'rle': 1, 'zips': 1, 'zip': 16, 'piz': 32, 'pxr24': 16,
+                   'b44': 32, 'b44a': 32, 'dwaa': 32, 'dwab': 256}
+# Channels without layer and the layer Nuke gives them
+DEFAULT_LAYERS = {'R': 'rgba', 'G': 'rgba', 'B': 'rgba', 'A': 'rgba', 'Z': 'depth'}
+# Names of the part that holds the beauty in multipart files
+BEAUTY_PARTS = ('', 'rgba', 'beauty')
+
+
+class ExrHeaderError(Exception):
+    """Raised when a file is not an OpenEXR or its header is truncated or broken."""
+
+
+@dataclass(frozen=True)
+class ExrChannel:
+    """
+     A channel of an OpenEXR part.
+
+     @name: str - The full name of the channel, usually layer.channel.
+     @pixel_type: str - The type of the pixels uint, half or float.
+     @x_sampling: int - The sampling in X.
+     @y_sampling: int - The sampling in Y.
+    """
+    name: str
+    pixel_type: str
+    x_sampling: int = 1
+    y_sampling: int = 1
+
+
+@dataclass(frozen=True)
+class ExrPart:
+    """
+     A part of an OpenEXR, single part files have only one.
+
+     @name: str - The name of the part, empty for single part files.
+     @part_type: str - The type of the part scanlineimage, tiledimage, deepscanline or deeptile.
+     @channels: tuple - All the ExrChannel sorted by name.
+     @data_window: tuple - The xMin, yMin, xMax and yMax of the pixels stored.
+     @display_window: tuple - The xMin, yMin, xMax and yMax of the image.
+     @compression: str - The name of the compression.
+     @line_order: int - The order of the scanlines.
+     @tiles: tuple|None - The X size, Y size and mode of the tiles or None.
+     @chunk_count: int|None - The number of chunks, only written in multipart files.
+    """
+    name: str
+    part_type: str
+    channels: tuple
+    data_window: tuple
+    display_window: tuple
+    compression: str
+    line_order: int = 0
+    tiles: tuple|None = None
+    chunk_count: int|None = None
+
+    @property
+    def channel_names(self) -> list:
+        return [channel.name for channel in self.channels]
+
+
+@dataclass(frozen=True)
+class ExrHeader:
+    """
+     The header of an OpenEXR file.
+
+     @path: str - The path of the file.
+     @version: int - The version of the file format.
+     @flags: int - The flags of the version field.
+     @parts: tuple - All the ExrPart of the file.
+     @header_end: int - The byte where the headers end and the offset tables start.
+    """
+    path: str
+    version: int
+    flags: int
+    parts: tuple
+    header_end: int
+
+    @property
+    def multipart(self) -> bool:
+        return bool(self.flags & MULTIPART_FLAG)
+
+    @property
+    def part_names(self) -> list:
+        return [part.name for part in self.parts]
+
+
+def read_exr_header(path: str) -> ExrHeader:
+    """
+     Reads the header of an OpenEXR file, only the bytes of the header are read from the memory map.
+
+     @path: str - The path of the file.
+
+     @return ExrHeader.
+    """
+    with open(path, 'rb') as exr_file:
+        try:
+            exr_map = mmap.mmap(exr_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ExrHeaderError('{} is empty'.format(path))
+        with exr_map:
+            return parse_exr_header(exr_map, path)
+
+
+def parse_exr_header(data, path: str = '') -> ExrHeader:
+    """
+     Parses the header of an OpenEXR from its bytes.
+
+     @data: bytes|mmap - The bytes of the file, at least the whole header.
+     @path: str - The path of the file used in the errors.
+
+     @return ExrHeader.
+    """
+    if len(data) < 8:
+        raise ExrHeaderError('{} is truncated'.format(path))
+    magic, version_field = struct.unpack_from('<ii', data, 0)
+    if magic != EXR_MAGIC:
+        raise ExrHeaderError('{} is not an OpenEXR file'.format(path))
+    version = version_field & 0xff
+    flags = version_field & ~0xff
+    multipart = bool(flags & MULTIPART_FLAG)
+    offset = 8
+    parts = list()
+    while True:
+        attributes, offset = _read_attributes(data, offset, path)
+        parts.append(_build_part(attributes, flags, multipart))
+        if not multipart:
+            break
+        # Multipart files end the list of headers with an empty header
+        if _byte(data, offset, path) == 0:
+            offset += 1
+            break
+    return ExrHeader(path=path, version=version, flags=flags, parts=tuple(parts), header_end=offset)
+
+
+def exr_layers(header: ExrHeader) -> frozenset:
+    """
+     Gets the layers of an OpenEXR named as Nuke names them.
+
+     @header: ExrHeader - The header of the file.
+
+     @return Frozenset with the name of the layers.
+    """
+    layers = set()
+    for index, part in enumerate(header.parts):
+        for channel in part.channels:
+            if '.' in channel.name:
+                layers.add(channel.name.rsplit('.', 1)[0].replace('.', '_'))
+            elif header.multipart and index and part.name.lower() not in BEAUTY_PARTS:
+                layers.add(part.name)
+            else:
+                layers.add(DEFAULT_LAYERS.get(channel.name, 'other'))
+    return frozenset(layers)
+
+
+def chunk_count(part: ExrPart) -> int:
+    """
+     Gets the number of chunks of a part, the size of its offset table.
+
+     @part: ExrPart - The part of the file.
+
+     @return Integer with the number of chunks.
+    """
+    if part.chunk_count is not None:
+        return part.chunk_count
+    x_min, y_min, x_max, y_max = part.data_window
+    if part.tiles:
+        tile_width, tile_height, _ = part.tiles
+        return -(-(x_max - x_min + 1) // tile_width) * -(-(y_max - y_min + 1) // tile_height)
+    return -(-(y_max - y_min + 1) // LINES_PER_BLOCK.get(part.compression, 1))
+
+
+def read_chunk_offsets(data, header: ExrHeader) -> list:
+    """
+     Reads the offset tables of all the parts, they are stored after the headers.
+
+     @data: bytes|mmap - The bytes of the file.
+     @header: ExrHeader - The header of the file.
+
+     @return List with a tuple of offsets for each part.
+    """
+    offset = header.header_end
+    tables = list()
+    for part in header.parts:
+        count = chunk_count(part)
+        if offset + count * 8 > len(data):
+            raise ExrHeaderError('{} is truncated'.format(header.path))
+        tables.append(struct.unpack_from('<{}Q'.format(count), data, offset))
+        offset += count * 8
+    return tables
+
+
+def is_truncated(data, header: ExrHeader) -> bool:
+    """
+     Checks if the pixels of a file were not written completely, the offset tables must point inside the file
+     and the last chunk must end before the end of the file.
+
+     @data: bytes|mmap - The bytes of the file.
+     @header: ExrHeader - The header of the file.
+
+     @return True if the file is truncated.
+    """
+    try:
+        tables = read_chunk_offsets(data, header)
+    except ExrHeaderError:
+        return True
+    for part, offsets in zip(header.parts, tables):
+        if not offsets:
+            continue
+        if 0 in offsets or max(offsets) >= len(data):
+            return True
+        # The chunk starts with the part number in multipart files and with the tile or scanline coordinates
+        last_chunk = max(offsets)
+        prefix = (4 if header.multipart else 0) + (16 if part.tiles else 4)
+        if part.part_type.startswith('deep'):
+            continue
+        if last_chunk + prefix + 4 > len(data):
+            return True
+        size = struct.unpack_from('<i', data, last_chunk + prefix)[0]
+        if size < 0 or last_chunk + prefix + 4 + size > len(data):
+            return True
+    return False
+
+
+def _build_part(attributes: dict, flags: int, multipart: bool) -> ExrPart:
+    """
+     Creates a part from the attributes of its header.
+
+     @attributes: dict - The name of the attributes with the type and the raw value.
+     @flags: int - The flags of the version field.
+     @multipart: bool - True if the file has several parts.
+
+     @return ExrPart.
+    """
+    default_type = 'tiledimage' if flags & TILED_FLAG else 'scanlineimage'
+    compression = _value(attributes, 'compression', 0)
+    tiles = _value(attributes, 'tiles', None)
+    return ExrPart(name=_value(attributes, 'name', ''),
+                   part_type=_value(attributes, 'type', default_type),
+                   channels=_value(attributes, 'channels', ()),
+                   data_window=_value(attributes, 'dataWindow', (0, 0, -1, -1)),
+                   display_window=_value(attributes, 'displayWindow', (0, 0, -1, -1)),
+                   compression=COMPRESSIONS[compression] if compression < len(COMPRESSIONS) else str(compression),
+                   line_order=_value(attributes, 'lineOrder', 0),
+                   tiles=tiles,
+                   chunk_count=_value(attributes, 'chunkCount', None) if multipart else None)
+
+
+def _read_attributes(data, offset: int, path: str) -> tuple:
+    """
+     Reads the attributes of a header until the null byte that ends it.
+
+     @data: bytes|mmap - The bytes of the file.
+     @offset: int - The byte where the header starts.
+     @path: str - The path of the file used in the errors.
+
+     @return Tuple with the dictionary of the attributes and the byte after the header.
+    """
+    attributes = dict()
+    while True:
+        name, offset = _read_string(data, offset, path)
+        if not name:
+            return attributes, offset
+        attribute_type, offset = _read_string(data, offset, path)
+        if offset + 4 > len(data):
+            raise ExrHeaderError('{} is truncated'.format(path))
+        size = struct.unpack_from('<i', data, offset)[0]
+        offset += 4
+        if size < 0 or offset + size > len(data):
+            raise ExrHeaderError('{} is truncated'.format(path))
+        attributes[name] = (attribute_type, bytes(data[offset:offset + size]))
+        offset += size
+
+
+def _value(attributes: dict, name: str, default):
+    """
+     Decodes the value of the attributes used by the tool.
+
+     @attributes: dict - The name of the attributes with the type and the raw value.
+     @name: str - The name of the attribute.
+     @default: The value used when the attribute is not in the header.
+
+     @return The value decoded.
+    """
+    if name not in attributes:
+        return default
+    attribute_type, raw = attributes[name]
+    if attribute_type == 'chlist':
+        return _read_channels(raw)
+    elif attribute_type == 'box2i':
+        return struct.unpack('<iiii', raw)
+    elif attribute_type in ('compression', 'lineOrder'):
+        return raw[0]
+    elif attribute_type == 'tiledesc':
+        return struct.unpack('<IIB', raw)
+    elif attribute_type == 'int':
+        return struct.unpack('<i', raw)[0]
+    elif attribute_type == 'string':
+        return raw.decode('utf-8', 'replace')
+    return raw
+
+
+def _read_channels(raw: bytes) -> tuple:
+    """
+     Decodes a list of channels.
+
+     @raw: bytes - The value of the chlist attribute.
+
+     @return Tuple of ExrChannel.
+    """
+    channels = list()
+    offset = 0
+    while offset < len(raw) and raw[offset] != 0:
+        end = raw.index(b'\0', offset)
+        name = raw[offset:end].decode('utf-8', 'replace')
+        pixel_type, _, x_sampling, y_sampling = struct.unpack_from('<iB3xii', raw, end + 1)
+        channels.append(ExrChannel(name, PIXEL_TYPES[pixel_type] if 0 <= pixel_type < 3 else str(pixel_type),
+                                   x_sampling, y_sampling))
+        offset = end + 1 + 16
+    return tuple(channels)
+
+
+def _read_string(data, offset: int, path: str) -> tuple:
+    """
+     Reads a string ended by a null byte.
+
+     @data: bytes|mmap - The bytes of the file.
+     @offset: int - The byte where the string starts.
+     @path: str - The path of the file used in the errors.
+
+     @return Tuple with the string and the byte after the null.
+    """
+    end = data.find(b'\0', offset, offset + 256)
+    if end < 0:
+        raise ExrHeaderError('{} is truncated'.format(path))
+    return bytes(data[offset:end]).decode('utf-8', 'replace'), end + 1
+
+
+def _byte(data, offset: int, path: str) -> int:
+    """
+     Reads a single byte.
+
+     @data: bytes|mmap - The bytes of the file.
+     @offset: int - The byte to read.
+     @path: str - The path of the file used in the errors.
+
+     @return Integer with the byte.
+    """
+    if offset >= len(data):
+        raise ExrHeaderError('{} is truncated'.format(path))
+    return data[offset]
+
+
+def cached_exr_layers(path: str) -> frozenset:
+    """
+     Gets the layers of an OpenEXR reading only its header, cached by path and modification time.
+
+     @path: str - The path of the file.
+
+     @return Frozenset with the name of the layers.
+    """
+    from .layer_cache import (cached_layers, layer_cache_key)
+    return cached_layers(layer_cache_key(path, None), lambda: exr_layers(read_exr_header(path)))
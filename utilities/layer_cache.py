@@ -0,0 +1,72 @@
+from __future__ import annotations
+import os
+import threading
+from collections import OrderedDict
+
+# Maximum number of files kept in the cache, the least recently used are evicted first
+CACHE_SIZE = 1024
+_layer_cache = OrderedDict()
+# The cache is shared by the threads of the parallel check
+_cache_lock = threading.Lock()
+
+
+def layers_from_channels(channels: list) -> frozenset:
+    """
+     Gets the layers from a list of channels named as layer.channel.
+
+     @channels: list - The names of the channels.
+
+     @return Frozenset with the name of the layers.
+    """
+    return frozenset(channel.split('.')[0] for channel in channels)
+
+
+def layer_cache_key(file_path: str, frame: int) -> tuple|None:
+    """
+     Gets the key of a file in the cache, the modification time invalidates the layers of a file that was rendered again.
+
+     @file_path: str - The path of the file evaluated for the frame.
+     @frame: int - The frame of the file.
+
+     @return Tuple with the path, frame and modification time or None if the file can't be found.
+    """
+    try:
+        mtime = os.stat(file_path).st_mtime
+    except (OSError, TypeError, ValueError):
+        return None
+    return file_path, frame, mtime
+
+
+def cached_layers(key: tuple|None, loader) -> frozenset:
+    """
+     Gets the layers of a file from the cache, loading them the first time.
+
+     @key: tuple|None - The key of the file, None loads the layers without caching them.
+     @loader: callable - Function without arguments that returns the layers of the file.
+
+     @return Frozenset with the name of the layers.
+    """
+    if key is None:
+        return frozenset(loader())
+    with _cache_lock:
+        layers = _layer_cache.get(key)
+        if layers is not None:
+            _layer_cache.move_to_end(key)
+            return layers
+    # The layers are loaded outside the lock so the threads read their files at the same time
+    layers = frozenset(loader())
+    with _cache_lock:
+        _layer_cache[key] = layers
+        while len(_layer_cache) > CACHE_SIZE:
+            _layer_cache.popitem(last=False)
+    return layers
+
+
+def clear_layer_cache() -> None:
+    """
+     Removes all the layers cached.
+
+     @return None.
+    """
+    with _cache_lock:
+        _layer_cache.clear()
@@ -0,0 +1,337 @@
+from __future__ import annotations
+from dataclasses import dataclass
+
+# Offsets of the nodes of each kind of column from the dot that starts the column
+COLUMN_NODES = {'aov': (('shuffle', -34, 180), ('remove', -34, 280), ('raw', -34, 350), ('pass', -34, 750)),
+                'albedo': (('shuffle', -34, 180), ('remove', -34, 280), ('dot_raw', 0, 359), ('dot_pass', 0, 759)),
+                'emission': (('shuffle', -34, 180), ('remove', -34, 280))}
+# Offsets of the lean columns, the lighting is divided and multiplied by expressions that read the albedo directly
+# so the albedo has no column, the remove keeps only the AOV and its albedo for the expressions
+LEAN_COLUMN_NODES = {'aov': (('remove', -34, 180), ('raw', -34, 280), ('pass', -34, 750)),
+                     'albedo': (),
+                     'emission': COLUMN_NODES['emission']}
+# Width added to the backdrop of each kind of column
+COLUMN_EXTRA_WIDTH = {'aov': 200, 'albedo': 0, 'emission': 0}
+# Size of a node used to calculate the backdrops
+NODE_WIDTH = 99
+NODE_HEIGHT = 130
+# Border around the nodes enclosed by a backdrop
+BACKDROP_LEFT = 10
+BACKDROP_TOP = 80
+# Space between the columns and between the templates packed side by side
+COLUMN_SPACING = 50
+TEMPLATE_SPACING = 100
+# Space between the levels of merges of the balanced beauty
+TREE_LEVEL_SPACING = 80
+
+
+@dataclass(frozen=True)
+class Rect:
+    """
+     A rectangle in the node graph.
+
+     @x: int - Position in X of the left side.
+     @y: int - Position in Y of the top side.
+     @width: int - The width of the rectangle.
+     @height: int - The height of the rectangle.
+     @z_order: int - Rectangles with lower values are drawn behind.
+    """
+    x: int
+    y: int
+    width: int
+    height: int
+    z_order: int = 0
+
+    @property
+    def right(self) -> int:
+        return self.x + self.width
+
+    @property
+    def bottom(self) -> int:
+        return self.y + self.height
+
+
+@dataclass(frozen=True)
+class TemplateLayout:
+    """
+     All the positions of a template relative to its input, solved from the structure of the layers.
+
+     @positions: dict - The ids of the nodes with their position as a tuple of X and Y.
+     @backdrops: dict - The ids of the backdrops with their Rect.
+     @passes: tuple - The layers that recreate the beauty in order.
+     @emission: str|None - The emission layer or None.
+    """
+    positions: dict
+    backdrops: dict
+    passes: tuple
+    emission: str|None
+
+    def bounds(self) -> Rect:
+        """
+         Gets the rectangle that encloses all the nodes and backdrops.
+
+         @return Rect.
+        """
+        xs = [x for x, _ in self.positions.values()]
+        ys = [y for _, y in self.positions.values()]
+        left = min(xs + [rect.x for rect in self.backdrops.values()])
+        top = min(ys + [rect.y for rect in self.backdrops.values()])
+        right = max([x + NODE_WIDTH for x in xs] + [rect.right for rect in self.backdrops.values()])
+        bottom = max([y + NODE_HEIGHT for y in ys] + [rect.bottom for rect in self.backdrops.values()])
+        return Rect(left, top, right - left, bottom - top)
+
+
+def layer_kind(layer: str) -> str:
+    """
+     Gets the kind of column used by a layer.
+
+     @layer: str - The name of the AOV.
+
+     @return String with the kind albedo, emission or aov.
+    """
+    if 'albedo' in layer:
+        return 'albedo'
+    elif 'emission' in layer:
+        return 'emission'
+    return 'aov'
+
+
+def column_nodes(kind: str, lean: bool = False) -> tuple:
+    """
+     Gets the nodes of a kind of column with their offsets from the dot that starts it.
+
+     @kind: str - The kind of column from layer_kind.
+     @lean: bool - True for the columns of the lean templates.
+
+     @return Tuple with the suffix of the id, X and Y of each node, empty if the kind has no column.
+    """
+    return (LEAN_COLUMN_NODES if lean else COLUMN_NODES)[kind]
+
+
+def solve_layout(layers_dict: dict, options = None) -> TemplateLayout:
+    """
+     Solves the position of every node and backdrop of a template from the groups and layers.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return TemplateLayout.
+    """
+    from .template_plan import (DEFAULT_OPTIONS)
+    options = options or DEFAULT_OPTIONS
+    positions = {'unpremult': (0, 90)}
+    # The remove that keeps the channels of the template goes under the unpremult and the columns start from it
+    if options.prune:
+        positions['prune'] = (0, 180)
+    backdrops = dict()
+    passes = list()
+    emission = None
+    # The first column starts from the unpremult, the next ones from the last lighting or albedo column
+    anchor_x, anchor_y = positions.get('prune', positions['unpremult'])
+    offset_x, offset_y = 34, 90
+    for group, layers in layers_dict.items():
+        if 'Shadow' in group:
+            continue
+        group_rects = list()
+        for layer in layers:
+            kind = layer_kind(layer)
+            nodes = column_nodes(kind, options.lean)
+            if not nodes:
+                continue
+            dot_x, dot_y = anchor_x + offset_x, anchor_y + offset_y
+            positions['{}/dot'.format(layer)] = (dot_x, dot_y)
+            column = list()
+            for suffix, x, y in nodes:
+                positions['{0}/{1}'.format(layer, suffix)] = (dot_x + x, dot_y + y)
+                column.append((dot_x + x, dot_y + y))
+            rect = nodes_rect(column, COLUMN_EXTRA_WIDTH[kind])
+            backdrops['{}/backdrop'.format(layer)] = rect
+            group_rects.append(rect)
+            if kind == 'emission':
+                emission = layer
+            else:
+                anchor_x, anchor_y = dot_x, dot_y
+                if kind == 'aov':
+                    passes.append(layer)
+            offset_x, offset_y = rect.width + COLUMN_SPACING, 0
+        if group_rects:
+            backdrops['group/{}'.format(group)] = group_rect(group_rects)
+    if options.beauty == 'tree':
+        last_y = _solve_beauty_tree(positions, passes, emission)
+    else:
+        last_y = _solve_beauty(positions, passes, emission)
+    _solve_alpha(positions, backdrops, layers_dict, last_y)
+    return TemplateLayout(positions=positions, backdrops=backdrops, passes=tuple(passes), emission=emission)
+
+
+def _solve_beauty(positions: dict, passes: list, emission: str|None) -> tuple:
+    """
+     Solves the positions of the merges that recreate the beauty.
+
+     @positions: dict - The positions solved, the new ones are added.
+     @passes: list - The layers that recreate the beauty in order.
+     @emission: str|None - The emission layer or None.
+
+     @return Integer with the position in Y of the last merge.
+    """
+    last_x, last_y = positions['{}/pass'.format(passes[0])]
+    for layer in passes[1:]:
+        last_y += 80
+        positions['beauty/{}/merge'.format(layer)] = (last_x, last_y)
+        positions['beauty/{}/dot'.format(layer)] = (positions['{}/pass'.format(layer)][0] + 34, last_y + 9)
+    if emission:
+        last_y += 60
+        positions['beauty/emission/merge'] = (last_x, last_y)
+        positions['beauty/emission/dot'] = (positions['{}/remove'.format(emission)][0] + 34, last_y + 9)
+    return last_y
+
+
+def _solve_beauty_tree(positions: dict, passes: list, emission: str|None) -> int:
+    """
+     Solves the positions of the balanced merges that recreate the beauty, every merge goes under its B input one
+     level below the previous one.
+
+     @positions: dict - The positions solved, the new ones are added.
+     @passes: list - The layers that recreate the beauty in order.
+     @emission: str|None - The emission layer or None.
+
+     @return Integer with the position in Y of the last merge.
+    """
+    last_y = positions['{}/pass'.format(passes[0])][1]
+    first_y = last_y
+    for merge_id, level, b_id, _ in merge_tree(beauty_leaves(passes, emission)):
+        last_y = first_y + level * TREE_LEVEL_SPACING
+        positions[merge_id] = (positions[b_id][0], last_y)
+    return last_y
+
+
+def beauty_leaves(passes: list, emission: str|None) -> list:
+    """
+     Gets the ids of the nodes merged to recreate the beauty, the passes in order and the emission at the end.
+
+     @passes: list - The layers that recreate the beauty in order.
+     @emission: str|None - The emission layer or None.
+
+     @return List with the ids of the nodes.
+    """
+    leaves = ['{}/pass'.format(layer) for layer in passes]
+    if emission:
+        leaves.append('{}/remove'.format(emission))
+    return leaves
+
+
+def merge_tree(leaves: list) -> list:
+    """
+     Pairs the nodes merged to recreate the beauty level by level, an odd node is merged in the next level.
+
+     @leaves: list - The ids of the nodes merged.
+
+     @return List of tuples with the id of the merge, its level and the ids of its B and A inputs, in creation order.
+    """
+    merges = list()
+    level_ids = list(leaves)
+    level = 0
+    while len(level_ids) > 1:
+        level += 1
+        next_ids = list()
+        for index in range(0, len(level_ids) - 1, 2):
+            merge_id = 'beauty/{0}/{1}/merge'.format(level, index // 2)
+            merges.append((merge_id, level, level_ids[index], level_ids[index + 1]))
+            next_ids.append(merge_id)
+        if len(level_ids) % 2:
+            next_ids.append(level_ids[-1])
+        level_ids = next_ids
+    return merges
+
+
+def _solve_alpha(positions: dict, backdrops: dict, layers_dict: dict, last_y: int) -> None:
+    """
+     Solves the positions of the alpha copy, the shadow matte and the premult that end the template, the alpha is
+     taken from the remove of the channels when the template has it.
+
+     @positions: dict - The positions solved, the new ones are added.
+     @backdrops: dict - The backdrops solved, the new ones are added.
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+     @last_y: int - Position in Y of the last merge of the beauty.
+
+     @return None.
+    """
+    unpremult_x, unpremult_y = positions.get('prune', positions['unpremult'])
+    positions['alpha/dot_top'] = (unpremult_x - 120, unpremult_y + 3)
+    positions['alpha/dot'] = (unpremult_x - 120, last_y + 68)
+    positions['alpha/copy'] = (unpremult_x, last_y + 60)
+    top_x, top_y = positions['alpha/copy']
+    if layers_dict.get('Shadow'):
+        dot_x, dot_y = positions['alpha/dot']
+        positions['shadow/shuffle'] = (dot_x - 34, dot_y + 130)
+        positions['shadow/grade'] = (top_x, top_y + 168)
+        backdrops['shadow/backdrop'] = nodes_rect([positions['shadow/shuffle'], positions['shadow/grade']])
+        top_x, top_y = positions['shadow/grade']
+    positions['premult'] = (top_x, top_y + 120)
+
+
+def nodes_rect(positions: list, extra_width: int = 0) -> Rect:
+    """
+     Gets the rectangle of a backdrop around nodes.
+
+     @positions: list - Tuples with the X and Y of the nodes enclosed.
+     @extra_width: int - Width added to the one calculated.
+
+     @return Rect.
+    """
+    xpos_list = [x for x, _ in positions]
+    ypos_list = [y for _, y in positions]
+    width = max(xpos_list) - min(xpos_list) + NODE_WIDTH + extra_width
+    height = max(ypos_list) - min(ypos_list) + NODE_HEIGHT
+    return Rect(min(xpos_list) - BACKDROP_LEFT, min(ypos_list) - BACKDROP_TOP, width, height)
+
+
+def group_rect(rects: list) -> Rect:
+    """
+     Gets the rectangle of a backdrop around the backdrops of a group, it is drawn behind them.
+
+     @rects: list - The Rect of the backdrops enclosed.
+
+     @return Rect.
+    """
+    xpos_list = [rect.x for rect in rects]
+    ypos_list = [rect.y for rect in rects]
+    extra_width = int(((max(xpos_list) - min(xpos_list)))*((len(xpos_list)-1)/len(xpos_list)))
+    width = max(xpos_list) - min(xpos_list) + extra_width
+    height = max(ypos_list) - min(ypos_list)
+    if width == extra_width:
+        width = max(rect.width for rect in rects) + 120
+    if not height:
+        height = max(rect.height for rect in rects) + 85
+    z_order = min(rect.z_order for rect in rects) - 1
+    return Rect(min(xpos_list) - BACKDROP_LEFT, min(ypos_list) - BACKDROP_TOP, width, height, z_order)
+
+
+def pack_templates(origins: list, bounds: list, spacing: int = TEMPLATE_SPACING) -> list:
+    """
+     Moves the origins of several templates to the right so they are side by side without overlapping.
+
+     @origins: list - Tuples with the X and Y where each template starts, usually its read node.
+     @bounds: list - The Rect of each template relative to its origin.
+     @spacing: int - The space left between the templates.
+
+     @return List of tuples with the X and Y of each template in the same order.
+    """
+    packed = list(origins)
+    placed = list()
+    # Templates are placed from left to right so the ones already placed never move
+    for index in sorted(range(len(origins)), key=lambda i: (origins[i][0], origins[i][1])):
+        x, y = origins[index]
+        rect = bounds[index]
+        moved = True
+        while moved:
+            moved = False
+            for other in placed:
+                overlaps_x = x + rect.x < other.right + spacing and other.x < x + rect.right + spacing
+                overlaps_y = y + rect.y < other.bottom + spacing and other.y < y + rect.bottom + spacing
+                if overlaps_x and overlaps_y:
+                    x = other.right + spacing - rect.x
+                    moved = True
+        packed[index] = (x, y)
+        placed.append(Rect(x + rect.x, y + rect.y, rect.width, rect.height))
+    return packed
@@ -0,0 +1,318 @@
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+
+# Environment variable with the path of the database, each user has its own one without it. It must be in a local
+# disk, the locks of SQLite are not reliable in network folders
+METADATA_ENV = 'ARNOLD_AOVS_METADATA_DB'
+METADATA_DB = os.path.join(os.path.expanduser('~'), '.nuke', 'arnold_aovs_metadata.db')
+# Environment variable that turns off the database in the sanity check when it is 0, off, false or no
+METADATA_CACHE_ENV = 'ARNOLD_AOVS_METADATA_CACHE'
+# Changes when the columns of the table change, the old entries are dropped
+METADATA_FORMAT = 2
+# How the layers of a file were found, Nuke and the header can name them differently so each check only uses the
+# entries found like it finds them
+HEADER_SOURCE = 'header'
+NUKE_SOURCE = 'nuke'
+# Seconds a session waits for another one that is writing in the database
+LOCK_TIMEOUT = 30.0
+# Seconds the sanity check waits for the database before reading the files itself
+CHECK_LOCK_TIMEOUT = 2.0
+# Paths sent in each query, older SQLite versions allow 999 variables
+QUERY_PATHS = 500
+# Number of threads used to read the headers of a render folder
+PREFETCH_WORKERS = 8
+# Frame number at the end of the name of a file of a sequence, like render.1001.exr
+FRAME_PATTERN = re.compile(r'^(.*?)(\d+)(\.exr)$', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class FileMetadata:
+    """
+     What is known of a render file, it is valid while the file keeps its size and modification time.
+
+     @path: str - The absolute path of the file.
+     @size: int - The bytes of the file.
+     @mtime: int - The modification time in nanoseconds.
+     @layers: frozenset - The layers of the file named as Nuke names them.
+     @data_window: tuple|None - The xMin, yMin, xMax and yMax of the pixels or None if the header was not read.
+     @frame_range: tuple|None - The first and last frame of the sequence of the file or None if it is unknown.
+     @source: str - HEADER_SOURCE if the layers were read from the header, NUKE_SOURCE if Nuke found them.
+    """
+    path: str
+    size: int
+    mtime: int
+    layers: frozenset
+    data_window: tuple|None = None
+    frame_range: tuple|None = None
+    source: str = HEADER_SOURCE
+
+
+def metadata_db() -> str:
+    """
+     Gets the path of the database, the environment variable changes it.
+
+     @return String with the path of the database.
+    """
+    return os.environ.get(METADATA_ENV) or METADATA_DB
+
+
+def cache_enabled() -> bool:
+    """
+     Checks if the sanity check uses the database, the environment variable turns it off.
+
+     @return True if the database is used.
+    """
+    return os.environ.get(METADATA_CACHE_ENV, '').strip().lower() not in ('0', 'off', 'false', 'no')
+
+
+def connect(db_path: str|None = None, timeout: float = LOCK_TIMEOUT) -> sqlite3.Connection:
+    """
+     Opens the database and creates its table the first time.
+
+     @db_path: str|None - The path of the database, None uses metadata_db.
+     @timeout: float - Seconds it waits for another session that is writing.
+
+     @return Connection, it must be closed.
+    """
+    db_path = db_path or metadata_db()
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=timeout)
+    try:
+        if connection.execute('PRAGMA user_version').fetchone()[0] != METADATA_FORMAT:
+            with connection:
+                connection.execute('DROP TABLE IF EXISTS files')
+                # The path and source are the primary key so every lookup is a search in its index
+                connection.execute('CREATE TABLE files (path TEXT NOT NULL, source TEXT NOT NULL, '
+                                   'size INTEGER NOT NULL, mtime INTEGER NOT NULL, layers TEXT NOT NULL, '
+                                   'data_window TEXT, first_frame INTEGER, last_frame INTEGER, checked REAL NOT NULL, '
+                                   'PRIMARY KEY (path, source))')
+                connection.execute('PRAGMA user_version = {}'.format(METADATA_FORMAT))
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return connection
+
+
+def stat_files(paths) -> dict:
+    """
+     Gets the size and modification time of the files, the key of their entries in the database.
+
+     @paths: iterable - The paths of the files.
+
+     @return Dictionary with the paths found and a tuple with their size and modification time.
+    """
+    stats = dict()
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError, ValueError):
+            continue
+        stats[path] = (stat.st_size, stat.st_mtime_ns)
+    return stats
+
+
+def lookup_files(stats: dict, db_path: str|None = None, timeout: float = LOCK_TIMEOUT,
+                 source: str = HEADER_SOURCE) -> dict:
+    """
+     Gets the metadata of many files with a query for every QUERY_PATHS files, the entries of files that changed
+     since they were saved are ignored.
+
+     @stats: dict - The paths with their size and modification time from stat_files.
+     @db_path: str|None - The path of the database, None uses metadata_db.
+     @timeout: float - Seconds it waits for another session that is writing.
+     @source: str - Only the entries found this way are used, HEADER_SOURCE or NUKE_SOURCE.
+
+     @return Dictionary with the paths found and their FileMetadata.
+    """
+    absolute = {os.path.abspath(path): path for path in stats}
+    found = dict()
+    if not absolute:
+        return found
+    try:
+        with closing(connect(db_path, timeout)) as connection:
+            paths = list(absolute)
+            for start in range(0, len(paths), QUERY_PATHS):
+                chunk = paths[start:start + QUERY_PATHS]
+                rows = connection.execute('SELECT path, size, mtime, layers, data_window, first_frame, last_frame, '
+                                          'source FROM files WHERE source = ? AND path IN ({})'.format(
+                                              ', '.join('?' * len(chunk))), [source] + chunk)
+                for row in rows:
+                    path = absolute[row[0]]
+                    if tuple(row[1:3]) == stats[path]:
+                        found[path] = _metadata(row)
+    except (OSError, ValueError, sqlite3.Error):
+        # A locked, broken or unreachable database is not used, the check only reads the files again
+        return dict()
+    return found
+
+
+def store_files(entries, db_path: str|None = None, timeout: float = LOCK_TIMEOUT) -> bool:
+    """
+     Saves the metadata of many files in a single transaction, replacing the old entries of the same paths.
+
+     @entries: iterable - The FileMetadata to save.
+     @db_path: str|None - The path of the database, None uses metadata_db.
+     @timeout: float - Seconds it waits for another session that is writing.
+
+     @return True if they were saved.
+    """
+    checked = time.time()
+    rows = [(os.path.abspath(entry.path), entry.source, entry.size, entry.mtime, json.dumps(sorted(entry.layers)),
+             json.dumps(entry.data_window) if entry.data_window else None,
+             entry.frame_range[0] if entry.frame_range else None,
+             entry.frame_range[1] if entry.frame_range else None, checked) for entry in entries]
+    if not rows:
+        return True
+    try:
+        with closing(connect(db_path, timeout)) as connection:
+            with connection:
+                connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    except (OSError, sqlite3.Error):
+        return False
+    return True
+
+
+def read_file_metadata(path: str, stat: tuple, frame_range: tuple|None = None) -> FileMetadata:
+    """
+     Reads the metadata of an OpenEXR from its header.
+
+     @path: str - The path of the file.
+     @stat: tuple - The size and modification time from stat_files.
+     @frame_range: tuple|None - The first and last frame of its sequence.
+
+     @return FileMetadata.
+    """
+    from .exr_header import (exr_layers, read_exr_header)
+    header = read_exr_header(path)
+    return FileMetadata(path, stat[0], stat[1], exr_layers(header), header.parts[0].data_window, frame_range)
+
+
+def sequence_ranges(file_names: list) -> dict:
+    """
+     Finds the frame range of the sequences of a folder from the names of their files.
+
+     @file_names: list - The names of the files.
+
+     @return Dictionary with the name of each file and the first and last frame of its sequence.
+    """
+    sequences = dict()
+    for file_name in file_names:
+        match = FRAME_PATTERN.match(file_name)
+        if match:
+            key = (match.group(1), len(match.group(2)), match.group(3))
+            sequences.setdefault(key, list()).append(int(match.group(2)))
+    ranges = dict()
+    for file_name in file_names:
+        match = FRAME_PATTERN.match(file_name)
+        if match:
+            frames = sequences[(match.group(1), len(match.group(2)), match.group(3))]
+            ranges[file_name] = (min(frames), max(frames))
+    return ranges
+
+
+def prefetch_directory(directory: str, recursive: bool = False, workers: int = PREFETCH_WORKERS,
+                       db_path: str|None = None) -> int:
+    """
+     Saves the metadata of all the OpenEXR of a render folder, only the files that are not in the database or
+     changed are read.
+
+     @directory: str - The folder of the renders.
+     @recursive: bool - True to read the folders inside it too.
+     @workers: int - The number of threads that read the headers.
+     @db_path: str|None - The path of the database, None uses metadata_db.
+
+     @return Integer with the number of files read.
+    """
+    from .exr_header import (ExrHeaderError)
+    frame_ranges = dict()
+    for root, folders, file_names in os.walk(directory):
+        file_names = [file_name for file_name in file_names if file_name.lower().endswith('.exr')]
+        for file_name, frame_range in sequence_ranges(file_names).items():
+            frame_ranges[os.path.join(root, file_name)] = frame_range
+        for file_name in file_names:
+            frame_ranges.setdefault(os.path.join(root, file_name), None)
+        if not recursive:
+            break
+    stats = stat_files(frame_ranges)
+    cached = lookup_files(stats, db_path)
+    missing = [path for path in stats if path not in cached]
+
+    def read(path: str) -> FileMetadata|None:
+        try:
+            return read_file_metadata(path, stats[path], frame_ranges[path])
+        except (OSError, ExrHeaderError):
+            return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        entries = [entry for entry in executor.map(read, missing) if entry]
+    store_files(entries, db_path)
+    return len(entries)
+
+
+def prune_files(max_age_days: float|None = None, db_path: str|None = None) -> int:
+    """
+     Removes the entries of files that were deleted or changed, and the ones older than the age given.
+
+     @max_age_days: float|None - Days an entry is kept since it was saved, None keeps them while the file is the same.
+     @db_path: str|None - The path of the database, None uses metadata_db.
+
+     @return Integer with the number of entries removed.
+    """
+    with closing(connect(db_path)) as connection:
+        rows = connection.execute('SELECT path, source, size, mtime, checked FROM files').fetchall()
+        stats = stat_files({row[0] for row in rows})
+        oldest = time.time() - max_age_days * 86400 if max_age_days is not None else None
+        stale = [(path, source) for path, source, size, mtime, checked in rows
+                 if stats.get(path) != (size, mtime) or (oldest is not None and checked < oldest)]
+        with connection:
+            connection.executemany('DELETE FROM files WHERE path = ? AND source = ?', stale)
+    return len(stale)
+
+
+def _metadata(row: tuple) -> FileMetadata:
+    """
+     Creates the metadata of a file from a row of the database.
+
+     @row: tuple - The path, size, mtime, layers, data window, first and last frame and source.
+
+     @return FileMetadata.
+    """
+    path, size, mtime, layers, data_window, first_frame, last_frame, source = row
+    return FileMetadata(path, size, mtime, frozenset(json.loads(layers)),
+                        tuple(json.loads(data_window)) if data_window else None,
+                        (first_frame, last_frame) if first_frame is not None else None, source)
+
+
+def main(argv: list) -> int:
+    """
+     Entry point to fill and clean the database from a terminal.
+
+     @argv: list - The arguments without the name of the program.
+
+     @return Integer with the exit code.
+    """
+    parser = argparse.ArgumentParser(prog='aovs_metadata', description="Caches the Arnold AOV's of the renders.")
+    parser.add_argument('--db', default=None, help='Path of the database, {} by default.'.format(metadata_db()))
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    prefetch = commands.add_parser('prefetch', help='Reads the headers of the renders of some folders.')
+    prefetch.add_argument('folders', nargs='+', help='Folders of the renders.')
+    prefetch.add_argument('--recursive', action='store_true', help='Reads the folders inside them too.')
+    prefetch.add_argument('--workers', type=int, default=PREFETCH_WORKERS, help='Number of threads.')
+    prune = commands.add_parser('prune', help='Removes the entries of files that changed or were deleted.')
+    prune.add_argument('--days', type=float, default=None, help='Removes the entries older than these days too.')
+    args = parser.parse_args(argv)
+    if args.command == 'prefetch':
+        for folder in args.folders:
+            print('{0}: {1} files read'.format(folder, prefetch_directory(folder, args.recursive, args.workers, args.db)))
+    else:
+        print('{} entries removed'.format(prune_files(args.days, args.db)))
+    return 0
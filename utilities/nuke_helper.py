@@ -1,6 +1,12 @@
 from __future__ import annotations
+from contextlib import contextmanager
 import nuke
-import nukescripts
+from .tracer import (count, span)
+
+
+class BuildCancelled(Exception):
+    """Raised inside build_transaction when the build is cancelled, everything done in the transaction is undone."""
+
 
 def create_group(name: str, seq: int = 1):
     """
@@ -11,8 +17,9 @@ def create_group(name: str, seq: int = 1):
 
      @return Nuke node
     """
-    group_node = nuke.createNode('Group')
-    group_node['name'].setValue('{0} Group {1}'.format(name, str(seq)))
+    group_node = nuke.nodes.Group()
+    count('create')
+    set_knobs(group_node, {'name': '{0} Group {1}'.format(name, str(seq))})
     return group_node
 
 def create_input():
@@ -21,7 +28,8 @@ def create_input():
 
      @return Nuke node
     """
-    input_node = nuke.createNode('Input')
+    input_node = nuke.nodes.Input()
+    count('create')
     return input_node
 
 
@@ -31,178 +39,295 @@ def create_output():
 
      @return Nuke node
     """
-    output_node = nuke.createNode('Output')
+    output_node = nuke.nodes.Output()
+    count('create')
     return output_node
 
 
-def create_mergeExpression(label: str):
+def create_backdrop(backdrop, x: int = 0, y: int = 0):
     """
-     Create a merge node using a expression to divide and break the AOV to generate the Raw Lighting
+     Creates a backdrop from a planned backdrop with its rectangle, label, font size and color, the selection is not used.
 
-     @label: str - The name for the merge label
+     @backdrop: PlanBackdrop - The backdrop planned in the template.
+     @x: int - Offset in X added to the planned position.
+     @y: int - Offset in Y added to the planned position.
 
-     @return Nuke node
+     @return Nuke node.
     """
-    merge_node = nuke.nodes.MergeExpression()
-    merge_node['label'].setValue('Raw {} Lighting'.format(label))
-    merge_node['expr0'].setValue('Ar == 0 ? Br : Br/Ar')
-    merge_node['expr1'].setValue('Ag == 0 ? Bg : Bg/Ag')
-    merge_node['expr2'].setValue('Ab == 0 ? Bb : Bb/Ab')
-    merge_node['expr3'].setValue('Aa == 0 ? Ba : Ba/Aa')
-    return merge_node
+    knobs = {'xpos': backdrop.xpos + x, 'ypos': backdrop.ypos + y, 'bdwidth': backdrop.width,
+             'bdheight': backdrop.height, 'note_font_size': backdrop.font_size, 'z_order': backdrop.z_order,
+             'tile_color': backdrop.tile_color}
+    backdrop_node = nuke.nodes.BackdropNode(**knobs)
+    count('create')
+    count('knob', len(knobs))
+    backdrop_node.setName(backdrop.label)
+    count('knob')
+    set_knobs(backdrop_node, {'label': backdrop.label})
+    tag_node(backdrop_node, backdrop.id)
+    return backdrop_node
 
 
-def create_merge(name: str, operation: str):
+def create_plan_node(plan_node, x: int = 0, y: int = 0):
     """
-     Creates a merge node with a specific name and operation.
+     Creates a node from a planned node setting all the knobs and the position.
 
-     @name: str - Name of the node.
-     @operation: str - The operation that the merge will do.
+     @plan_node: PlanNode - The node planned in the template.
+     @x: int - Offset in X added to the planned position.
+     @y: int - Offset in Y added to the planned position.
 
      @return Nuke node.
     """
-    merge_node = nuke.nodes.Merge2(label='{0}_{1}'.format(name, operation))
-    merge_node['operation'].setValue(operation)
-    return merge_node
+    node = getattr(nuke.nodes, plan_node.node_class)()
+    count('create')
+    for knob_name, value in plan_node.knobs:
+        if knob_name == 'mappings':
+            for from_channel, to_channel in value:
+                node[knob_name].setValue(from_channel, to_channel)
+                count('knob')
+        else:
+            set_knobs(node, {knob_name: value})
+    set_knobs(node, {'xpos': plan_node.xpos + x, 'ypos': plan_node.ypos + y})
+    tag_node(node, plan_node.id)
+    return node
+
 
+def apply_plan(plan, input_node, origin: tuple|None = None) -> dict:
+    """
+     Creates in one pass all the nodes, connections and backdrops of a planned template.
+
+     @plan: GraphPlan - The template planned for a read node.
+     @input_node: Nuke node - The node that feeds the template.
+     @origin: tuple|None - The X and Y where the template starts, None uses the position of the input node.
+
+     @return Dictionary with the ids of the plan and the Nuke nodes created.
+    """
+    from .template_plan import (INPUT, MASK_INPUT)
+    if origin:
+        x, y = origin
+    else:
+        x = int(input_node['xpos'].value())
+        y = int(input_node['ypos'].value())
+    created = {INPUT: input_node}
+    for plan_node in plan.nodes:
+        created[plan_node.id] = create_plan_node(plan_node, x, y)
+    for plan_node in plan.nodes:
+        node = created[plan_node.id]
+        for index, source_id in plan_node.inputs:
+            if index == MASK_INPUT:
+                index = node.minInputs()-1
+            set_input(node, index, created[source_id])
+    with span('backdrops'):
+        for backdrop in plan.backdrops:
+            created[backdrop.id] = create_backdrop(backdrop, x, y)
+    return created
+
+
+def update_plan(plan, input_node, existing: dict) -> dict:
+    """
+     Updates a template already built to match the plan, only the nodes that changed are created, moved, connected
+     or deleted so the knobs edited in the nodes kept are not lost, only the display profile is set in them. The nodes
+     added by the artists between the nodes of the template are kept connected.
+
+     @plan: GraphPlan - The template planned for a read node.
+     @input_node: Nuke node - The node that feeds the template.
+     @existing: dict - The ids of the plan with the Nuke nodes already built, from get_tagged_nodes.
+
+     @return Dictionary with the ids of the plan and the Nuke nodes of the template.
+    """
+    from .template_plan import (INPUT, MASK_INPUT, OUTPUT)
+    x = int(input_node['xpos'].value())
+    y = int(input_node['ypos'].value())
+    # The Input and Output of the group are not part of the plan
+    planned = {INPUT, OUTPUT} | {plan_node.id for plan_node in plan.nodes} | {backdrop.id for backdrop in plan.backdrops}
+    stale = [node for node_id, node in existing.items() if node_id not in planned]
+    created = {INPUT: input_node}
+    for plan_node in plan.nodes:
+        node = existing.get(plan_node.id)
+        if node is not None and node.Class() == plan_node.node_class:
+            set_position(node, plan_node.xpos + x, plan_node.ypos + y)
+            set_display(node, plan_node)
+        else:
+            if node is not None:
+                stale.append(node)
+            node = create_plan_node(plan_node, x, y)
+        created[plan_node.id] = node
+    # The nodes are connected before the stale ones are deleted so the inputs that still end in them are found
+    for plan_node in plan.nodes:
+        node = created[plan_node.id]
+        for index, source_id in plan_node.inputs:
+            if index == MASK_INPUT:
+                index = node.minInputs()-1
+            connect_planned(node, index, created[source_id])
+    for node in stale:
+        delete_node(node)
+    for backdrop in plan.backdrops:
+        backdrop_node = existing.get(backdrop.id)
+        if backdrop_node is None:
+            backdrop_node = create_backdrop(backdrop, x, y)
+        else:
+            set_position(backdrop_node, backdrop.xpos + x, backdrop.ypos + y)
+            set_knob(backdrop_node, 'bdwidth', backdrop.width)
+            set_knob(backdrop_node, 'bdheight', backdrop.height)
+        created[backdrop.id] = backdrop_node
+    return created
+
+
+def connect_planned(node, index: int, source) -> None:
+    """
+     Connects an input of a template already built to its planned source. The nodes without the tag of the plan
+     added by the artists in the input, like a Grade, are kept: the input is changed only when it ends in another
+     node of the template or in nothing, and then the first node of the artists is connected to the source.
+
+     @node: Nuke node - The node of the template to connect.
+     @index: int - The number of the input.
+     @source: Nuke node - The node planned for the input.
 
-def create_mergePass(name: str):
+     @return None.
     """
-     Creates a merge node using the name provided with the suffix Pass using the multiply operation.
+    target, target_index = node, index
+    current = node.input(index)
+    while current is not None and get_node_tag(current) is None:
+        target, target_index = current, 0
+        current = current.input(0)
+    if not same_node(current, source):
+        set_input(target, target_index, source)
 
-     @name: str - Name for the label of the node.
 
-     @return Nuke node.
+def same_node(first, second) -> bool:
     """
-    merge_node = nuke.nodes.Merge2(label='{} Pass'.format(name))
-    merge_node['operation'].setValue('multiply')
-    return merge_node
+     Compares two nodes by their full name, Nuke returns a new Python object every time a node is found so they
+     can't be compared with is.
 
+     @first: Nuke node|None - A node or None.
+     @second: Nuke node|None - Another node or None.
 
-def create_remove(layer: str, operation: str='keep', channels: str= 'rgb'):
+     @return True if both are the same node or both are None.
     """
-     Creates a remove node.
+    if first is None or second is None:
+        return first is None and second is None
+    return first.fullName() == second.fullName()
 
-     @layer: str - Part of the name of the node.
-     @operation: str - The operation that the remove node will do and also for the name of the node.
-     @channels: str - The channels that it will use.
 
-     @return Nuke node.
+def tag_node(node, node_id: str) -> None:
     """
-    remove_node = nuke.nodes.Remove(label='{0}_{1}'.format(layer,operation))
-    remove_node['operation'].setValue(operation)
-    remove_node['channels'].setValue(channels)
-    return remove_node
+     Adds a hidden knob with the id of the node in the plan so the template can be updated later.
 
+     @node: Nuke node - The node built.
+     @node_id: str - The id of the node in the plan.
 
-def create_dot(label_txt: str|None = None, font_size: int = 25):
+     @return None.
     """
-     Creates a dot node.
+    from .template_plan import (TAG_KNOB)
+    knob = nuke.String_Knob(TAG_KNOB, TAG_KNOB)
+    knob.setFlag(nuke.INVISIBLE)
+    node.addKnob(knob)
+    count('knob')
+    set_knobs(node, {TAG_KNOB: node_id})
 
-     @label_txt: str|None - The label that it will show in the dot
-     @font_size: int - The size of the font for the label
 
-     @return Nuke node.
+def get_node_tag(node) -> str|None:
     """
-    dot_node = nuke.nodes.Dot()
-    if label_txt:
-        dot_node['label'].setValue(label_txt)
-        dot_node['note_font_size'].setValue(font_size)
-    return dot_node
+     Gets the id of the plan saved in a node.
 
+     @node: Nuke node - The node to look for the id.
 
-def create_copy(from_channels: list[str], to_channels: list[str], node_name: str):
+     @return String with the id or None if the node was not built by the tool.
     """
-     Create a copy node to get the channels that are going to be copy.
+    from .template_plan import (TAG_KNOB)
+    knob = node.knobs().get(TAG_KNOB)
+    if knob is None:
+        return None
+    return knob.value() or None
 
-     @from_channels: list[str] - The channels you want to copy from.
-     @to_channels: list[str] - The channels you want to copy to.
-     @node_name: str - The name of the node.
 
-     @return Nuke node.
+def get_tagged_nodes(group_node) -> dict:
     """
-    copy_node = nuke.nodes.Copy()
-    copy_node['name'].setValue('{}_copy'.format(node_name))
-    for index, channel in enumerate(from_channels):
-        copy_node['from{}'.format(index)].setValue(channel)
-        copy_node['to{}'.format(index)].setValue(to_channels[index])
-    return copy_node
+     Gets the nodes built by the tool inside a group.
 
+     @group_node: Nuke node - The group node.
 
-def create_premult(name: str):
+     @return Dictionary with the ids of the plan and the Nuke nodes.
     """
-     Creates a premult node.
+    tagged_nodes = dict()
+    for node in group_node.nodes():
+        node_id = get_node_tag(node)
+        if node_id:
+            tagged_nodes[node_id] = node
+    return tagged_nodes
 
-     @name: str - The name of the node
 
-     @return Nuke node.
+def set_position(node, x: int, y: int) -> None:
     """
-    premult_node = nuke.nodes.Premult()
-    premult_node['name'].setValue('{}_Premult'.format(name))
-    return premult_node
+     Moves a node only if it is not already in the position.
 
+     @node: Nuke node - The node to move.
+     @x: int - The position in X.
+     @y: int - The position in Y.
 
-def create_unpremult(name: str):
+     @return None.
     """
-     Creates an unpremult node.
+    set_knob(node, 'xpos', x)
+    set_knob(node, 'ypos', y)
 
-     @name: str - The name for the node
 
-     @return Nuke node.
+def set_display(node, plan_node) -> None:
     """
-    unpremult_node = nuke.nodes.Unpremult()
-    unpremult_node['name'].setValue('{}_Unpremult'.format(name))
-    return unpremult_node
+     Sets the knobs of the display profile in a node kept by an update, the thumbnail of the shuffles and the label of
+     the dots, the rest of its knobs are not changed.
 
+     @node: Nuke node - The node to change.
+     @plan_node: PlanNode - The node planned in the template.
 
-def create_grade(name:str):
+     @return None.
     """
-     Creates a grade node.
+    knobs = dict(plan_node.knobs)
+    if plan_node.node_class == 'Shuffle2':
+        set_knob(node, 'postage_stamp', knobs.get('postage_stamp', False))
+    elif plan_node.node_class == 'Dot':
+        set_knob(node, 'label', knobs.get('label', ''))
 
-     @name: str - The name for the node
 
-     @return Nuke node.
+def set_knobs(node, knobs: dict) -> None:
     """
-    grade_node = nuke.nodes.Grade()
-    grade_node['name'].setValue('{}_Grade'.format(name))
-    return grade_node
+     Sets several knobs of a node even if they already have the value, used in the nodes just created.
 
+     @node: Nuke node - The node to change.
+     @knobs: dict - The names of the knobs and their values.
 
-def shuffle_aov(layer: str):
+     @return None.
     """
-     Creates a shuffle node with the specific AOV.
+    for knob_name, value in knobs.items():
+        node[knob_name].setValue(value)
+        count('knob')
 
-     layer: str - The AOV to be used
 
-     @return Nuke node.
+def set_input(node, index: int, source) -> None:
     """
-    shuffle_node = nuke.nodes.Shuffle2(label=layer)
-    shuffle_node['in1'].setValue(layer)
-    shuffle_node['postage_stamp'].setValue( True )
-    return shuffle_node
+     Connects an input of a node.
 
+     @node: Nuke node - The node to connect.
+     @index: int - The number of the input.
+     @source: Nuke node - The node connected to the input.
 
-def create_backdrops(width: int, height: int, label: str|None = None, font_size: int|None = None):
+     @return None.
     """
-     Create a backdrop with the specific width, height, font size and label for it.
+    node.setInput(index, source)
+    count('input')
 
-     @width: int - The value for the width.
-     @height: int - The value for the height.
-     @label: str|None - The text to be display in the label.
-     @font_size: int - The size of the font to be displayed in the label.
 
-     @return Nuke node.
+def set_knob(node, knob_name: str, value) -> None:
     """
-    backdrop_node = nukescripts.autoBackdrop()
-    if label:
-        backdrop_node.setName(label)
-        backdrop_node['label'].setValue(label)
-        backdrop_node['name'].setValue(label)
-    if font_size:
-        backdrop_node['note_font_size'].setValue(font_size)
-    backdrop_node["bdwidth"].setValue(width)
-    backdrop_node["bdheight"].setValue(height)
-    return backdrop_node
+     Sets the value of a knob only if it changed.
+
+     @node: Nuke node - The node to change.
+     @knob_name: str - The name of the knob.
+     @value: The new value.
+
+     @return None.
+    """
+    if node[knob_name].value() != value:
+        node[knob_name].setValue(value)
+        count('knob')
 
 
 def get_layers(node) -> list[str]:
@@ -213,12 +338,74 @@ def get_layers(node) -> list[str]:
 
      @return List of string with all the AOV's founded in the node.
     """
-    channels = node.channels()
-    layers = list( set([c.split('.')[0] for c in channels]) )
+    layers = list(get_layer_set(node))
     layers.sort()
     return layers
 
 
+def get_layer_set(node) -> frozenset:
+    """
+     Get all the AOV's from a read node, cached by file, frame and modification time so they are found only once.
+
+     @node: Nuke node - The node to look for the AOV's
+
+     @return Frozenset with all the AOV's founded in the node.
+    """
+    from .layer_cache import (cached_layers, layer_cache_key, layers_from_channels)
+    key = layer_cache_key(get_file_path(node), nuke.frame())
+    return cached_layers(key, lambda: layers_from_channels(node.channels()))
+
+
+def get_file_path(node) -> str:
+    """
+     Get the path of the file of a read node evaluated for the current frame.
+
+     @node: Nuke node - The read node.
+
+     @return String with the path of the file.
+    """
+    return node['file'].evaluate()
+
+
+def get_frame_paths(node) -> list[tuple]:
+    """
+     Get the path of every frame in the frame range of a read node. The first and last knobs are the frames of the
+     files, the frame knob moves them in the script when frame_mode is offset or start at.
+
+     @node: Nuke node - The read node.
+
+     @return List of tuples with the frame of the script and the path of its file.
+    """
+    from .sequence_scan import (frame_path)
+    pattern = node['file'].value()
+    offset = get_frame_offset(node)
+    frames = range(int(node['first'].value()), int(node['last'].value()) + 1)
+    # Paths with TCL expressions can only be solved by Nuke, they are evaluated at the frame of the script
+    if '[' in pattern:
+        return [(frame + offset, frame_path(node['file'].evaluate(frame + offset), frame)) for frame in frames]
+    return [(frame + offset, frame_path(pattern, frame)) for frame in frames]
+
+
+def get_frame_offset(node) -> int:
+    """
+     Get the frames a read node moves its files in the script.
+
+     @node: Nuke node - The read node.
+
+     @return Integer added to the frame of a file to get its frame in the script, 0 when the frame knob is an expression.
+    """
+    try:
+        frame = int(node['frame'].value())
+    except ValueError:
+        return 0
+    frame_mode = node['frame_mode'].value()
+    if frame_mode == 'offset':
+        return frame
+    if frame_mode == 'start at':
+        return frame - int(node['first'].value())
+    return 0
+
+
 def get_type_nodes(node_class: str) -> list:
     """
      Get a specific type of nodes from a selection.
@@ -231,6 +418,17 @@ def get_type_nodes(node_class: str) -> list:
     return selected_nodes
 
 
+def get_all_type_nodes(node_class: str) -> list:
+    """
+     Get a specific type of nodes from all the script.
+
+     @node_class: str - The type of the node.
+
+     @return List of all the nodes.
+    """
+    return nuke.allNodes(node_class)
+
+
 def get_all_groups_names() -> list[str]:
     """
      Search for all the group nodes and get the names.
@@ -253,6 +451,40 @@ def get_node_by_name(name: str):
     return node
 
 
+def paste_script(script: str) -> None:
+    """
+     Creates all the nodes written in a Nuke script text with a single call.
+
+     @script: str - The Nuke script text.
+
+     @return None.
+    """
+    nuke.scriptReadText(script)
+    count('paste')
+
+
+def open_script(path: str) -> None:
+    """
+     Opens a Nuke script in the current session.
+
+     @path: str - The path of the script.
+
+     @return None.
+    """
+    nuke.scriptOpen(path)
+
+
+def save_script(path: str) -> None:
+    """
+     Saves the current Nuke script, overwriting the file.
+
+     @path: str - The path of the script.
+
+     @return None.
+    """
+    nuke.scriptSaveAs(path, overwrite=1)
+
+
 def create_progress_task(title: str):
     """
      Create a progress bar in Nuke.
@@ -264,6 +496,30 @@ def create_progress_task(title: str):
     return nuke.ProgressTask(title)
 
 
+def run_in_main_thread(function, *args) -> None:
+    """
+     Runs a function in the main thread when Nuke is idle, it returns at once.
+
+     @function: callable - The function that uses Nuke.
+     @args: The arguments of the function.
+
+     @return None.
+    """
+    nuke.executeInMainThread(function, args)
+
+
+def call_in_main_thread(function, *args):
+    """
+     Runs a function in the main thread and waits for its result, it can only be used from other threads.
+
+     @function: callable - The function that uses Nuke.
+     @args: The arguments of the function.
+
+     @return The result of the function.
+    """
+    return nuke.executeInMainThreadWithResult(function, args)
+
+
 def error_messages(message: str, format: str = 'error'):
     """
      Creates a window showing an error.
@@ -282,72 +538,65 @@ def error_messages(message: str, format: str = 'error'):
     nuke.message(("{} " + message).format(errorFormat))
 
 
-def deselect_nodes() -> None:
+def set_tile_colors(tile_colors: dict) -> None:
     """
-     Deselect all the nodes selected.
+     Sets the color of several nodes at once, only the colors that change are set.
+
+     @tile_colors: dict - The nodes with their new color.
 
      @return None.
     """
-    if nuke.selectedNodes():
-        for i in nuke.selectedNodes():
-            i['selected'].setValue(False)
+    for node, tile_color in tile_colors.items():
+        set_knob(node, 'tile_color', tile_color)
 
 
-def select_nodes(nodes_list: list) -> None:
+@contextmanager
+def build_transaction(name: str):
     """
-     Make a selection of the list of nodes.
+     Groups all the changes of a build in a single undo. If the build is cancelled with BuildCancelled or fails, all
+     the changes are undone so nothing half built is left in the script. The viewers and the node graph are not paused,
+     Nuke has no API for it, the nodes are created with nuke.nodes so they don't open panels or move.
 
-     @nodes_list: list - List of nodes.
+     @name: str - The name of the undo.
 
-     @return None.
+     @return Context manager.
     """
-    for node in nodes_list:
-        node['selected'].setValue(True)
+    undo = nuke.Undo()
+    undo.begin(name)
+    try:
+        yield
+    except BuildCancelled:
+        undo.cancel()
+    except Exception:
+        undo.cancel()
+        raise
+    else:
+        undo.end()
 
 
-def backdrop_wh_nodes(nodes_enclosed: list) -> tuple:
+def deselect_nodes() -> None:
     """
-     Calculate the width and height of a backdrop from a selection of nodes.
-
-     @nodes_enclosed: list - List of nodes.
+     Deselect all the nodes selected.
 
-     @return Tuple the width and height of the backdrop.
+     @return None.
     """
-    xpos_list = list()
-    ypos_list = list()
-    for node in nodes_enclosed:
-        xpos_list.append(node['xpos'].value())
-        ypos_list.append(node['ypos'].value())
-    width = max(xpos_list) - min(xpos_list) + 99
-    height = max(ypos_list) - min(ypos_list) + 130
-    return width, height
+    if nuke.selectedNodes():
+        for i in nuke.selectedNodes():
+            i['selected'].setValue(False)
+            count('select')
 
 
-def backdrop_wh_backdrops(selected_backdrops: list) -> tuple:
+def select_nodes(nodes_list: list) -> None:
     """
-     Calculate the width and height of a backdrop from a selection of backdrops.
+     Make a selection of the list of nodes.
 
-     @selected_backdrops: list - List of backdrop nodes.
+     @nodes_list: list - List of nodes.
 
-     @return Tuple the width and height of the backdrop.
+     @return None.
     """
-    xpos_list = list()
-    ypos_list = list()
-    bdwidth_list = list()
-    bdheight_list = list()
-    for node in selected_backdrops:
-        xpos_list.append(node['xpos'].value())
-        ypos_list.append(node['ypos'].value())
-        bdwidth_list.append(node['bdwidth'].value())
-        bdheight_list.append(node['bdheight'].value())
-    extra_width = int(((max(xpos_list) - min(xpos_list)))*((len(xpos_list)-1)/len(xpos_list)))
-    width = max(xpos_list) - min(xpos_list) + extra_width
-    height = max(ypos_list) - min(ypos_list)
-    if width == extra_width:
-        width = max(bdwidth_list) + 120
-    if not height:
-        height = max(bdheight_list) + 85
-    return width, height
+    for node in nodes_list:
+        node['selected'].setValue(True)
+        count('select')
 
 
 def delete_node(node) -> None:
@@ -357,4 +606,5 @@ def delete_node(node) -> None:
      @return None.
     """
     nuke.delete(node)
+    count('delete')
 
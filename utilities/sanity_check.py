@@ -1,58 +1,334 @@
 from __future__ import annotations
 
-def AOV_check(layers_dict: dict) -> dict|None:
+# Number of threads used to read the files in the parallel check
+PARALLEL_WORKERS = 8
+
+
+def AOV_check(layers_dict: dict, parallel: bool = False, workers: int = PARALLEL_WORKERS, task = None) -> dict|None:
     """
      Sanity Check for the read nodes selected that has the correct AOV's needed for the template.
 
      @layers_dict: dict - Dictionary with the AOV's needed for the template.
+     @parallel: bool - True to read the files of the read nodes in a pool of threads.
+     @workers: int - The number of threads used in the parallel check.
+     @task: Progress Bar|None - Progress bar of the whole build, None creates one for the check.
 
      @return Dictionary with the read nodes and AOV's found, if something went wrong None.
     """
-    from .nuke_helper import (get_type_nodes, get_layers, create_progress_task, error_messages)
+    from .metadata_cache import (HEADER_SOURCE, NUKE_SOURCE)
+    from .nuke_helper import (get_file_path, get_type_nodes, create_progress_task)
     # Get all the read nodes selected
     read_nodes = get_type_nodes('Read')
     read_data = dict()
     wrong_data = dict()
+    # The layers of each group are compiled to bitmasks once for all the read nodes
+    template_groups = template_sets(layers_dict)
     # Start progress bar
-    task = create_progress_task('Searching for correct AOVs in the read nodes selected')
-    progPerRead = 90.0/float(len(read_nodes))
-    progress = 10
-    for read_node in read_nodes:
-        read_node.knob('tile_color').setValue(0)
-        missing_layers = list()
-        layers_found = dict()
-        task.setMessage('Reviewing {}'.format(read_node['name'].value()))
-        # Get all AOV's founded in the read node
-        found_layers = get_layers(read_node)
-        for group, layers in layers_dict.items():
-            layers_intersected = list(set(found_layers).intersection(layers))
-            # Checks if there is no AOV intersected skip
-            if not layers_intersected:
-                continue
-            # Checks if the AOV's found are not the same as the template needed added to list the missing AOV
-            elif not set(layers) == set(layers_intersected):
-                missing_layers.extend(list(set(layers).difference(layers_intersected)))
-                continue
-            layers_found[group] = layers
+    if task is None:
+        task = create_progress_task('Searching for correct AOVs in the read nodes selected')
+    task.setMessage('Searching for correct AOVs in the read nodes selected')
+    # The files checked before in any session are found with a single query, only the rest are read. The parallel
+    # check reads the headers and the other one asks Nuke, each one only uses the entries found the same way
+    file_paths = {read_node: get_file_path(read_node) for read_node in read_nodes}
+    found_layers, file_stats = cached_file_layers(file_paths, HEADER_SOURCE if parallel else NUKE_SOURCE)
+    new_reads = [read_node for read_node in read_nodes if read_node not in found_layers]
+    if new_reads and parallel:
+        header_layers = check_reads_parallel(new_reads, task, workers)
+        if header_layers is None:
+            return None
+        header_layers = {read_node: layers for read_node, layers in header_layers.items() if layers is not None}
+        store_read_layers(header_layers, file_stats, read_frame_ranges(header_layers), HEADER_SOURCE)
+        found_layers.update(header_layers)
+        # The files that can't be read as OpenEXR are checked by Nuke
+        new_reads = [read_node for read_node in new_reads if read_node not in header_layers]
+    if new_reads:
+        nuke_layers = check_reads(new_reads, task)
+        if nuke_layers is None:
+            return None
+        store_read_layers(nuke_layers, file_stats, read_frame_ranges(nuke_layers), NUKE_SOURCE)
+        found_layers.update(nuke_layers)
+    results = {read_node: compare_layers(template_groups, found_layers[read_node]) for read_node in read_nodes}
+    for read_node, (layers_found, missing_layers) in results.items():
         # If there are missing AOV's group them with the corresponded read node for future error message
         if missing_layers:
             wrong_data[read_node] = missing_layers
         # If there is no issue added to the dictionary
         else:
             read_data[read_node] = layers_found
+    report_missing_aovs(read_nodes, wrong_data)
+    if wrong_data:
+        return None
+    return read_data
+
+
+def report_missing_aovs(read_nodes: list, wrong_data: dict) -> None:
+    """
+     Colors the read nodes with missing AOV's in red and shows them in a message, the rest get their color back.
+
+     @read_nodes: list - All the read nodes checked.
+     @wrong_data: dict - The read nodes with the list of their missing AOV's.
+
+     @return None.
+    """
+    from .nuke_helper import (error_messages, set_tile_colors)
+    # The colors of the read nodes are set together at the end, only the ones that change
+    tile_colors = {read_node: 0 for read_node in read_nodes}
+    if not wrong_data:
+        set_tile_colors(tile_colors)
+        return
+    # Creates an error message for founded missing AOV's 
+    error_message = 'There are some missing AOVs\n'
+    nuke_hex = int('%02x%02x%02x%02x' % (int(1*255),int(0*255),int(0*255),255),16)
+    for read_node, missing_layers in wrong_data.items():
+        error_message += '{0} -> {1}\n'.format(read_node['name'].value(), ', '.join(missing_layers))
+        tile_colors[read_node] = nuke_hex
+    set_tile_colors(tile_colors)
+    error_messages(error_message)
+
+
+def check_reads(read_nodes: list, task) -> dict|None:
+    """
+     Gets the AOV's of the read nodes one by one.
+
+     @read_nodes: list - The read nodes to check.
+     @task: Progress Bar - Progress bar created in Nuke to update messages.
+
+     @return Dictionary with the read nodes and the layers found, None if it was cancelled.
+    """
+    from .nuke_helper import (get_layer_set)
+    from .tracer import (span)
+    results = dict()
+    progPerRead = 90.0/float(len(read_nodes))
+    progress = 10
+    for read_node in read_nodes:
+        read_name = read_node['name'].value()
+        task.setMessage('Reviewing {}'.format(read_name))
+        # Get all AOV's founded in the read node
+        with span('get_layers', 'check', read=read_name):
+            results[read_node] = get_layer_set(read_node)
         # Progress calculation
         progress = int(progPerRead + progress)
         task.setProgress(progress)
         if task.isCancelled():
             return None
+    return results
+
+
+def check_reads_parallel(read_nodes: list, task, workers: int = PARALLEL_WORKERS) -> dict|None:
+    """
+     Gets the AOV's of the read nodes reading the headers of their files in a pool of threads.
+     Nuke is only used in the main thread to get the file paths.
+
+     @read_nodes: list - The read nodes to check.
+     @task: Progress Bar - Progress bar created in Nuke to update messages.
+     @workers: int - The number of threads.
+
+     @return Dictionary with the read nodes and the layers found or None for the files that can't be read as
+     OpenEXR, None if it was cancelled.
+    """
+    from concurrent.futures import (ThreadPoolExecutor, as_completed)
+    from .nuke_helper import (get_file_path)
+    results = dict()
+    progPerRead = 90.0/float(len(read_nodes))
+    progress = 10
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = {executor.submit(check_file, get_file_path(read_node)): read_node for read_node in read_nodes}
+    try:
+        for future in as_completed(futures):
+            read_node = futures[future]
+            task.setMessage('Reviewing {}'.format(read_node['name'].value()))
+            results[read_node] = future.result()
+            progress = int(progPerRead + progress)
+            task.setProgress(progress)
+            if task.isCancelled():
+                return None
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+    # Keeps the order of the selection
+    return {read_node: results[read_node] for read_node in read_nodes}
+
+
+def check_file(file_path: str) -> frozenset|None:
+    """
+     Gets the AOV's of an OpenEXR file, it is safe to use outside the main thread.
+
+     @file_path: str - The path of the file.
+
+     @return Frozenset with the layers found, None if the file can't be read as OpenEXR.
+    """
+    from .exr_header import (ExrHeaderError, cached_exr_layers)
+    try:
+        return cached_exr_layers(file_path)
+    except (OSError, ExrHeaderError):
+        return None
+
+
+def cached_file_layers(file_paths: dict, source: str) -> tuple:
+    """
+     Gets the AOV's of the files saved in the metadata database with a single query, the files that changed are not
+     used. Nothing is found when the database is turned off or can't be used, so all the files are read. It doesn't
+     use Nuke.
+
+     @file_paths: dict - The read nodes with the path of their file.
+     @source: str - How the check finds the layers, only the entries found the same way are used.
+
+     @return Tuple with a dictionary of the read nodes found and their layers and a dictionary with the read nodes
+     and the path of their file with its size and modification time.
+    """
+    from .metadata_cache import (CHECK_LOCK_TIMEOUT, cache_enabled, lookup_files, stat_files)
+    from .tracer import (span)
+    if not cache_enabled():
+        return dict(), dict()
+    with span('metadata_lookup', 'check', reads=len(file_paths)):
+        stats = stat_files(file_paths.values())
+        cached = lookup_files(stats, timeout=CHECK_LOCK_TIMEOUT, source=source)
+    found_layers = {read_node: cached[file_path].layers for read_node, file_path in file_paths.items()
+                    if file_path in cached}
+    return found_layers, {read_node: (file_path, stats[file_path]) for read_node, file_path in file_paths.items()
+                          if file_path in stats}
+
+
+def read_frame_ranges(read_nodes) -> dict:
+    """
+     Gets the frame range of the read nodes.
+
+     @read_nodes: iterable - The read nodes.
+
+     @return Dictionary with the read nodes and a tuple with their first and last frame.
+    """
+    return {read_node: (int(read_node['first'].value()), int(read_node['last'].value())) for read_node in read_nodes}
+
+
+def store_read_layers(read_layers: dict, file_stats: dict, frame_ranges: dict, source: str) -> None:
+    """
+     Saves the AOV's found in the read nodes in the metadata database with their frame range. It doesn't use Nuke.
+
+     @read_layers: dict - The read nodes and the layers found.
+     @file_stats: dict - The read nodes with the path of their file and its size and modification time.
+     @frame_ranges: dict - The read nodes with their first and last frame.
+     @source: str - HEADER_SOURCE if the layers were read from the headers, NUKE_SOURCE if Nuke found them.
+
+     @return None.
+    """
+    from .metadata_cache import (CHECK_LOCK_TIMEOUT, FileMetadata, cache_enabled, store_files)
+    from .tracer import (span)
+    if not cache_enabled():
+        return
+    entries = list()
+    for read_node, layers in read_layers.items():
+        if read_node not in file_stats:
+            continue
+        file_path, (size, mtime) = file_stats[read_node]
+        entries.append(FileMetadata(file_path, size, mtime, frozenset(layers), None, frame_ranges.get(read_node), source))
+    with span('metadata_store', 'check', files=len(entries)):
+        store_files(entries, timeout=CHECK_LOCK_TIMEOUT)
+
+
+def AOV_check_files(layers_dict: dict, file_paths: list) -> tuple:
+    """
+     Sanity Check for OpenEXR files reading only their headers, it works without Nuke.
+
+     @layers_dict: dict - Dictionary with the AOV's needed for the template.
+     @file_paths: list - The paths of the files to check.
+
+     @return Tuple with a dictionary of the correct files and the AOV's found and a dictionary of the wrong files and the missing AOV's or the error.
+    """
+    from .exr_header import (ExrHeaderError, cached_exr_layers)
+    template_groups = template_sets(layers_dict)
+    file_data = dict()
+    wrong_data = dict()
+    for file_path in file_paths:
+        try:
+            found_layers = cached_exr_layers(file_path)
+        except (OSError, ExrHeaderError) as error:
+            wrong_data[file_path] = [str(error)]
+            continue
+        layers_found, missing_layers = compare_layers(template_groups, found_layers)
+        if missing_layers:
+            wrong_data[file_path] = missing_layers
+        else:
+            file_data[file_path] = layers_found
+    return file_data, wrong_data
+
+
+def sequence_check(read_data: dict, workers: int = PARALLEL_WORKERS, task = None) -> dict|None:
+    """
+     Sanity Check for every frame of the read nodes, the header of each frame is read to find missing or
+     incomplete files and frames without the AOV's used by the template.
+
+     @read_data: dict - Dictionary with the read nodes and AOV's found from AOV_check.
+     @workers: int - The number of threads used to read the headers.
+     @task: Progress Bar|None - Progress bar of the whole build, None creates one for the check.
+
+     @return The same read_data if all the frames are correct, if something went wrong None.
+    """
+    from .nuke_helper import (get_frame_paths, create_progress_task)
+    from .sequence_scan import (scan_sequence, summarize_issues)
+    if task is None:
+        task = create_progress_task('Searching for missing frames in the read nodes selected')
+    wrong_data = dict()
+    progPerRead = 90.0/float(len(read_data))
+    progress = 10
+    for read_node, layers_found in read_data.items():
+        task.setMessage('Reviewing frames of {}'.format(read_node['name'].value()))
+        required_layers = frozenset(layer for layers in layers_found.values() for layer in layers)
+        issues = list(scan_sequence(get_frame_paths(read_node), required_layers, workers, task.isCancelled))
+        if task.isCancelled():
+            return None
+        if issues:
+            wrong_data[read_node] = summarize_issues(issues)
+        progress = int(progPerRead + progress)
+        task.setProgress(progress)
+        if task.isCancelled():
+            return None
     if wrong_data:
-        # Creates an error message for founded missing AOV's 
-        error_message = 'There are some missing AOVs\n'
-        nuke_hex = int('%02x%02x%02x%02x' % (int(1*255),int(0*255),int(0*255),255),16)
-        for read_node, missing_layers in wrong_data.items():
-            error_message += '{0} -> {1}\n'.format(read_node['name'].value(), ', '.join(missing_layers))
-            read_node.knob('tile_color').setValue(nuke_hex)
-        error_messages(error_message)
+        report_wrong_frames(wrong_data)
         return None
-    
-    return read_data
\ No newline at end of file
+    return read_data
+
+
+def report_wrong_frames(wrong_data: dict) -> None:
+    """
+     Colors the read nodes with wrong frames in red and shows their problems in a message.
+
+     @wrong_data: dict - The read nodes with the list of their problems from summarize_issues.
+
+     @return None.
+    """
+    from .nuke_helper import (error_messages, set_tile_colors)
+    # Creates an error message with the frames that have problems
+    error_message = 'There are some wrong frames\n'
+    nuke_hex = int('%02x%02x%02x%02x' % (int(1*255),int(0*255),int(0*255),255),16)
+    for read_node, problems in wrong_data.items():
+        error_message += '{0} -> {1}\n'.format(read_node['name'].value(), '; '.join(problems))
+    set_tile_colors({read_node: nuke_hex for read_node in wrong_data})
+    error_messages(error_message)
+
+
+def template_sets(layers_dict: dict) -> tuple:
+    """
+     Gets the groups of the template compiled to bitmasks to compare them, the template is compiled only once.
+
+     @layers_dict: dict - Dictionary with the AOV's needed for the template.
+
+     @return Tuple with the TemplateGroup of the template.
+    """
+    from .templates import (find_template)
+    return find_template(layers_dict).groups
+
+
+def compare_layers(template_groups: tuple, found_layers: frozenset) -> tuple:
+    """
+     Compares the layers found with the groups of the template, a group is used only if all its layers are found.
+     The light group patterns get the layers of every light group found.
+
+     @template_groups: tuple - The groups of the template from template_sets.
+     @found_layers: frozenset - The layers found in the render.
+
+     @return Tuple with the dictionary of the groups found and the list of the missing AOV's.
+    """
+    from .templates import (layers_mask, light_group_layers, match_template)
+    found_layers = frozenset(found_layers)
+    return match_template(template_groups, layers_mask(found_layers), light_group_layers(template_groups, found_layers))
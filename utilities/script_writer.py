@@ -0,0 +1,253 @@
+from __future__ import annotations
+from functools import lru_cache
+from .template_plan import (GROUP, INPUT, MASK_INPUT, OUTPUT, READ_PLACEHOLDER, TAG_KNOB)
+
+# Channel index used by Nuke to write the Shuffle2 mappings
+CHANNEL_INDEX = {'red': 0, 'green': 1, 'blue': 2, 'alpha': 3}
+
+
+def group_to_script(plan, group_name: str, xpos: int, ypos: int) -> str:
+    """
+     Serializes a planned template inside a group node as Nuke script text.
+
+     @plan: GraphPlan - The template planned for a read node.
+     @group_name: str - The name of the group node.
+     @xpos: int - Position in X of the group node.
+     @ypos: int - Position in Y of the group node.
+
+     @return String with the Nuke script.
+    """
+    return _group_header(group_name, xpos, ypos) + group_contents_script(plan)
+
+
+def shared_group_to_script(contents: str, read_name: str, group_name: str, xpos: int, ypos: int) -> str:
+    """
+     Serializes a template shared by several read nodes inside a group node, the contents are written once and
+     only the name of the read node is replaced.
+
+     @contents: str - The contents of the group planned for READ_PLACEHOLDER, from group_contents_script.
+     @read_name: str - The name of the read node used to name the nodes.
+     @group_name: str - The name of the group node.
+     @xpos: int - Position in X of the group node.
+     @ypos: int - Position in Y of the group node.
+
+     @return String with the Nuke script.
+    """
+    return _group_header(group_name, xpos, ypos) + contents.replace(READ_PLACEHOLDER, read_name)
+
+
+@lru_cache(maxsize=64)
+def group_contents_script(plan) -> str:
+    """
+     Serializes the nodes inside the group of a planned template, from the Input to the end of the group.
+
+     @plan: GraphPlan - The template planned for a read node.
+
+     @return String with the Nuke script.
+    """
+    output = plan.node(plan.output)
+    lines = ['Input {',
+             ' inputs 0',
+             ' name Input1',
+             ' xpos 0',
+             ' ypos 0']
+    lines.extend(_tag(INPUT))
+    lines.extend(['}',
+                  'set {} [stack 0]'.format(_variable(INPUT))])
+    lines.append(plan_to_script(plan, input_variable=_variable(INPUT)))
+    lines.extend(['push ${}'.format(_variable(plan.output)),
+                  'Output {',
+                  ' name Output1',
+                  ' xpos {}'.format(output.xpos),
+                  ' ypos {}'.format(output.ypos + 50)])
+    lines.extend(_tag(OUTPUT))
+    lines.extend(['}',
+                  'end_group'])
+    return '\n'.join(lines) + '\n'
+
+
+def plan_to_script(plan, x: int = 0, y: int = 0, input_variable: str|None = None) -> str:
+    """
+     Serializes a planned template as Nuke script text, ready to be pasted.
+
+     @plan: GraphPlan - The template planned for a read node.
+     @x: int - Offset in X added to the planned positions.
+     @y: int - Offset in Y added to the planned positions.
+     @input_variable: str|None - Script variable that holds the input of the template, None leaves it disconnected.
+
+     @return String with the Nuke script.
+    """
+    lines = list()
+    for backdrop in plan.backdrops:
+        lines.extend(['BackdropNode {',
+                      ' inputs 0',
+                      ' name {}'.format(_value(backdrop.label)),
+                      ' label {}'.format(_value(backdrop.label)),
+                      ' note_font_size {}'.format(backdrop.font_size),
+                      ' xpos {}'.format(backdrop.xpos + x),
+                      ' ypos {}'.format(backdrop.ypos + y),
+                      ' bdwidth {}'.format(backdrop.width),
+                      ' bdheight {}'.format(backdrop.height),
+                      ' z_order {}'.format(backdrop.z_order),
+                      ' tile_color {}'.format(backdrop.tile_color)])
+        lines.extend(_tag(backdrop.id))
+        lines.append('}')
+    for plan_node in sort_plan_nodes(plan):
+        lines.extend(_push_inputs(plan_node, input_variable))
+        lines.append('{} {{'.format(plan_node.node_class))
+        lines.append(' inputs {}'.format(_inputs_count(plan_node)))
+        knobs = dict(plan_node.knobs)
+        for knob_name, value in plan_node.knobs:
+            if knob_name == 'mappings':
+                continue
+            lines.append(' {0} {1}'.format(knob_name, _value(value)))
+        if plan_node.node_class == 'Shuffle2':
+            lines.append(' mappings {}'.format(_value(_mappings(knobs['in1'], knobs.get('mappings', ())))))
+        lines.append(' xpos {}'.format(plan_node.xpos + x))
+        lines.append(' ypos {}'.format(plan_node.ypos + y))
+        lines.extend(_tag(plan_node.id))
+        lines.append('}')
+        lines.append('set {} [stack 0]'.format(_variable(plan_node.id)))
+    return '\n'.join(lines)
+
+
+def sort_plan_nodes(plan) -> list:
+    """
+     Sorts the nodes of the plan so every node is written after its inputs, keeping the planned order when possible.
+
+     @plan: GraphPlan - The template planned for a read node.
+
+     @return List of PlanNode.
+    """
+    pending = list(plan.nodes)
+    written = {INPUT}
+    sorted_nodes = list()
+    while pending:
+        for plan_node in pending:
+            if all(source_id in written for _, source_id in plan_node.inputs):
+                break
+        else:
+            raise ValueError('The plan for {} has a cycle'.format(plan.read_name))
+        pending.remove(plan_node)
+        written.add(plan_node.id)
+        sorted_nodes.append(plan_node)
+    return sorted_nodes
+
+
+def _group_header(group_name: str, xpos: int, ypos: int) -> str:
+    """
+     Serializes the group node that holds a template.
+
+     @group_name: str - The name of the group node.
+     @xpos: int - Position in X of the group node.
+     @ypos: int - Position in Y of the group node.
+
+     @return String with the Nuke script.
+    """
+    lines = ['Group {',
+             ' inputs 0',
+             ' name {}'.format(_value(group_name)),
+             ' xpos {}'.format(int(xpos)),
+             ' ypos {}'.format(int(ypos))]
+    lines.extend(_tag(GROUP))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def _push_inputs(plan_node, input_variable: str|None) -> list:
+    """
+     Pushes the inputs of the node to the stack, the input 0 ends at the top and the mask at the bottom.
+
+     @plan_node: PlanNode - The node to connect.
+     @input_variable: str|None - Script variable that holds the input of the template.
+
+     @return List of script lines.
+    """
+    inputs = dict(plan_node.inputs)
+    lines = list()
+    if MASK_INPUT in inputs:
+        lines.append('push ${}'.format(_variable(inputs.pop(MASK_INPUT))))
+    for index in range(max(inputs, default=-1), -1, -1):
+        source_id = inputs.get(index)
+        if source_id is None or (source_id == INPUT and not input_variable):
+            lines.append('push 0')
+        elif source_id == INPUT:
+            lines.append('push ${}'.format(input_variable))
+        else:
+            lines.append('push ${}'.format(_variable(source_id)))
+    return lines
+
+
+def _inputs_count(plan_node) -> str:
+    """
+     Gets the inputs value of the node as Nuke writes it, the mask is added with a plus.
+
+     @plan_node: PlanNode - The node to count the inputs.
+
+     @return String with the inputs.
+    """
+    indexes = [index for index, _ in plan_node.inputs if index != MASK_INPUT]
+    count = max(indexes) + 1 if indexes else 0
+    if any(index == MASK_INPUT for index, _ in plan_node.inputs):
+        return '{}+1'.format(count)
+    return str(count)
+
+
+def _mappings(layer: str, mappings: tuple) -> str:
+    """
+     Gets the mappings of a Shuffle2 node, the layer goes to the rgb and the mappings given override the default.
+
+     @layer: str - The layer of the in1 input.
+     @mappings: tuple - Pairs of channels to map from and to.
+
+     @return String with the Shuffle2 mappings.
+    """
+    targets = {'rgba.{}'.format(channel): '{0}.{1}'.format(layer, channel) for channel in ('red', 'green', 'blue')}
+    targets['rgba.alpha'] = 'black'
+    for from_channel, to_channel in mappings:
+        targets[to_channel] = from_channel
+    values = [str(len(targets))]
+    for to_channel, from_channel in targets.items():
+        if from_channel == 'black':
+            values.append('black -1 -1')
+        else:
+            values.append('{0} 0 {1}'.format(from_channel, CHANNEL_INDEX[from_channel.split('.')[-1]]))
+        values.append('{0} 0 {1}'.format(to_channel, CHANNEL_INDEX[to_channel.split('.')[-1]]))
+    return ' '.join(values)
+
+
+def _tag(node_id: str) -> list:
+    """
+     Gets the lines of the hidden knob with the id of the node in the plan.
+
+     @node_id: str - The id of the node in the plan.
+
+     @return List of script lines.
+    """
+    return [' addUserKnob {{1 {} +INVISIBLE}}'.format(TAG_KNOB), ' {0} {1}'.format(TAG_KNOB, _value(node_id))]
+
+
+def _variable(node_id: str) -> str:
+    """
+     Gets the script variable for a node id.
+
+     @node_id: str - The id of the node in the plan.
+
+     @return String with the variable.
+    """
+    return 'N_{}'.format(''.join(character if character.isalnum() else '_' for character in node_id))
+
+
+def _value(value) -> str:
+    """
+     Formats a knob value as it is written in a Nuke script.
+
+     @value: The value of the knob.
+
+     @return String with the value.
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return '"{}"'.format(str(value).replace('\\', '\\\\').replace('"', '\\"'))
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Number of threads used to read the headers of the frames
+SCAN_WORKERS = 8
+PRINTF_PATTERN = re.compile(r'%(0?\d*)d')
+HASH_PATTERN = re.compile(r'#+')
+
+
+class ScanCancelled(Exception):
+    """Raised inside scan_sequence to stop reading the frames when the scan is cancelled."""
+
+
+@dataclass(frozen=True)
+class FrameIssue:
+    """
+     A problem found in a frame of a sequence.
+
+     @frame: int - The frame number.
+     @path: str - The path of the file.
+     @problem: str - missing, empty, unreadable, truncated or layers.
+     @layers: tuple - The missing layers when the problem is layers.
+    """
+    frame: int
+    path: str
+    problem: str
+    layers: tuple = ()
+
+
+def frame_path(pattern: str, frame: int) -> str:
+    """
+     Gets the path of a frame from a sequence written with printf (%04d) or hashes (####).
+
+     @pattern: str - The path of the sequence.
+     @frame: int - The frame number.
+
+     @return String with the path of the frame.
+    """
+    path = PRINTF_PATTERN.sub(lambda match: ('%' + match.group(1) + 'd') % frame, pattern)
+    return HASH_PATTERN.sub(lambda match: str(frame).zfill(len(match.group(0))), path)
+
+
+def scan_frame(frame: int, path: str, required_layers: frozenset) -> FrameIssue|None:
+    """
+     Checks that a frame exists, is complete and has all the layers needed, only the header and offset table are read.
+
+     @frame: int - The frame number.
+     @path: str - The path of the file.
+     @required_layers: frozenset - The layers every frame must have.
+
+     @return FrameIssue or None if the frame is correct.
+    """
+    from .exr_header import (ExrHeaderError, exr_layers, is_truncated, parse_exr_header)
+    try:
+        with open(path, 'rb') as exr_file:
+            if not os.fstat(exr_file.fileno()).st_size:
+                return FrameIssue(frame, path, 'empty')
+            with mmap.mmap(exr_file.fileno(), 0, access=mmap.ACCESS_READ) as exr_map:
+                header = parse_exr_header(exr_map, path)
+                truncated = is_truncated(exr_map, header)
+    except FileNotFoundError:
+        return FrameIssue(frame, path, 'missing')
+    except (OSError, ExrHeaderError):
+        return FrameIssue(frame, path, 'unreadable')
+    missing_layers = required_layers - exr_layers(header)
+    if missing_layers:
+        return FrameIssue(frame, path, 'layers', tuple(sorted(missing_layers)))
+    if truncated:
+        return FrameIssue(frame, path, 'truncated')
+    return None
+
+
+def scan_sequence(frames, required_layers: frozenset, workers: int = SCAN_WORKERS, cancelled = None):
+    """
+     Checks all the frames of a sequence reading the headers at the same time, only a few frames are in flight
+     so the memory used is the same for any length of sequence.
+
+     @frames: iterable - Tuples with the frame number and the path of the file.
+     @required_layers: frozenset - The layers every frame must have.
+     @workers: int - The number of threads.
+     @cancelled: callable|None - Called after every frame read, the scan stops when it returns True.
+
+     @return Generator of FrameIssue in frame order.
+    """
+    pending = deque()
+
+    def finish_frame():
+        issue = pending.popleft().result()
+        if cancelled is not None and cancelled():
+            raise ScanCancelled()
+        return issue
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for frame, path in frames:
+                pending.append(executor.submit(scan_frame, frame, path, required_layers))
+                if len(pending) >= workers * 2:
+                    issue = finish_frame()
+                    if issue:
+                        yield issue
+            while pending:
+                issue = finish_frame()
+                if issue:
+                    yield issue
+        except ScanCancelled:
+            # The frames that didn't start are not read
+            for future in pending:
+                future.cancel()
+
+
+def frame_ranges(frames: list) -> str:
+    """
+     Joins the frames in ranges to show them in a message.
+
+     @frames: list - The frame numbers sorted.
+
+     @return String with the ranges like 1001-1005, 1010.
+    """
+    ranges = list()
+    for frame in frames:
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return ', '.join(str(first) if first == last else '{0}-{1}'.format(first, last) for first, last in ranges)
+
+
+def summarize_issues(issues: list) -> list:
+    """
+     Groups the issues of a sequence by problem to show them in a message.
+
+     @issues: list - The FrameIssue found.
+
+     @return List of strings with the frames of each problem.
+    """
+    problems = dict()
+    for issue in issues:
+        problem = 'without {}'.format(', '.join(issue.layers)) if issue.problem == 'layers' else issue.problem
+        problems.setdefault(problem, list()).append(issue.frame)
+    return ['{0}: {1}'.format(problem, frame_ranges(sorted(frames))) for problem, frames in problems.items()]
@@ -0,0 +1,709 @@
+from __future__ import annotations
+import colorsys
+import zlib
+from dataclasses import dataclass
+from functools import lru_cache
+from .layout import (Rect, beauty_leaves, column_nodes, layer_kind, merge_tree, solve_layout)
+
+# Id used by the edges that connect to the node feeding the template (the Read or the group Input)
+INPUT = 'input'
+# Input index resolved by the applier as the mask input of the node
+MASK_INPUT = -1
+# Hidden knob with the id of the plan in every node built, used to update a template already built
+TAG_KNOB = 'aov_template_id'
+# Ids of the group node and its Output, they are not part of the plan
+GROUP = 'group'
+OUTPUT = 'output'
+# Read name of the plans shared by the read nodes with the same AOV's, it is replaced by the name of each read node
+READ_PLACEHOLDER = '@AOV_READ@'
+# Ways to merge the passes that recreate the beauty, a chain of merges with a dot each or a balanced tree of merges
+BEAUTY_MODES = ('chain', 'tree')
+# How much of the template is drawn in the node graph: full has the thumbnails of the shuffles and a backdrop for every
+# AOV, light only the backdrops of the groups and the labels of the dots, none only the nodes
+DISPLAY_PROFILES = ('full', 'light', 'none')
+
+
+@dataclass(frozen=True)
+class PlanOptions:
+    """
+     The options that change how a template is planned, the same layers and options always get the same plan.
+
+     @beauty: str - How the passes are merged to recreate the beauty, one of BEAUTY_MODES.
+     @lean: bool - True to divide and multiply each lighting AOV by its albedo with expressions that read the
+     channels directly, without the shuffles, removes and dots of the albedo.
+     @prune: bool - True to keep only the layers of the template and the alpha after the unpremult, so the columns
+     don't carry the cryptomattes and the rest of the channels of the read node.
+     @display: str - How much of the template is drawn in the node graph, one of DISPLAY_PROFILES.
+    """
+    beauty: str = 'chain'
+    lean: bool = False
+    prune: bool = False
+    display: str = 'full'
+
+
+DEFAULT_OPTIONS = PlanOptions()
+
+
+@dataclass(frozen=True)
+class PlanNode:
+    """
+     A node of the template described without Nuke.
+
+     @id: str - Unique identity of the node inside the plan.
+     @node_class: str - The Nuke class of the node.
+     @knobs: tuple - Pairs of knob name and value in the order they are set.
+     @inputs: tuple - Pairs of input index and id of the node connected.
+     @xpos: int - Position in X relative to the input of the template.
+     @ypos: int - Position in Y relative to the input of the template.
+    """
+    id: str
+    node_class: str
+    knobs: tuple = ()
+    inputs: tuple = ()
+    xpos: int = 0
+    ypos: int = 0
+
+
+@dataclass(frozen=True)
+class PlanBackdrop:
+    """
+     A backdrop of the template described without Nuke.
+
+     @id: str - Unique identity of the backdrop inside the plan.
+     @label: str - The text displayed and used as name.
+     @members: tuple - Ids of the nodes or backdrops enclosed.
+     @xpos: int - Position in X relative to the input of the template.
+     @ypos: int - Position in Y relative to the input of the template.
+     @width: int - The width of the backdrop.
+     @height: int - The height of the backdrop.
+     @font_size: int - The size of the font for the label.
+     @z_order: int - Backdrops with lower values are drawn behind.
+     @tile_color: int - The color of the backdrop as Nuke writes it.
+    """
+    id: str
+    label: str
+    members: tuple
+    xpos: int
+    ypos: int
+    width: int
+    height: int
+    font_size: int = 42
+    z_order: int = 0
+    tile_color: int = 0
+
+
+@dataclass(frozen=True)
+class GraphPlan:
+    """
+     The full template for a read node, ready to be applied in Nuke.
+
+     @read_name: str - The name of the read node the plan was made for.
+     @nodes: tuple - All the PlanNode in creation order.
+     @backdrops: tuple - All the PlanBackdrop, the inner ones first.
+     @output: str - Id of the last node of the template.
+     @bounds: Rect - The rectangle that encloses the whole template relative to its input.
+    """
+    read_name: str
+    nodes: tuple
+    backdrops: tuple
+    output: str
+    bounds: Rect
+
+    def node(self, node_id: str) -> PlanNode:
+        """
+         Get a node of the plan by its id.
+
+         @node_id: str - The id of the node.
+
+         @return PlanNode.
+        """
+        for plan_node in self.nodes:
+            if plan_node.id == node_id:
+                return plan_node
+        raise KeyError(node_id)
+
+
+def plan_template(layers_dict: dict, read_name: str, options: PlanOptions|None = None) -> GraphPlan:
+    """
+     Plans the whole template for a read node without touching Nuke, plans are cached.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+     @read_name: str - The name of the read node used to name the nodes.
+     @options: PlanOptions|None - The options of the plan, None uses the default ones.
+
+     @return GraphPlan.
+    """
+    return _plan_template(layers_signature(layers_dict), read_name, options or DEFAULT_OPTIONS)
+
+
+def layers_signature(layers_dict: dict) -> tuple:
+    """
+     Gets a hashable signature of the groups and AOV's found, the read nodes with the same signature get the same template.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+
+     @return Tuple with pairs of group and tuple of layers.
+    """
+    return tuple((group, tuple(layers)) for group, layers in layers_dict.items())
+
+
+@lru_cache(maxsize=256)
+def _plan_template(layers_key: tuple, read_name: str, options: PlanOptions) -> GraphPlan:
+    """
+     Cached planning of the template, the layers are given as tuples to be hashable.
+
+     @layers_key: tuple - Pairs of group and tuple of layers.
+     @read_name: str - The name of the read node used to name the nodes.
+     @options: PlanOptions - The options of the plan.
+
+     @return GraphPlan.
+    """
+    layers_dict = {group: list(layers) for group, layers in layers_key}
+    # All the positions are solved up front from the structure of the layers
+    layout = solve_layout(layers_dict, options)
+    nodes = list()
+    top_node = plan_unpremult(nodes, layout, read_name)
+    # The columns and the alpha start from the remove of the channels when the template has it
+    if options.prune:
+        top_node = plan_prune(nodes, layout, layers_dict, top_node, read_name)
+    if options.lean:
+        passes_merge, emission_node = plan_lean_layers(nodes, layout, layers_dict, top_node, options.display)
+    else:
+        passes_merge, emission_node = plan_layers(nodes, layout, layers_dict, top_node, options.display)
+    if options.beauty == 'tree':
+        last_merge = plan_beauty_tree(nodes, layout, passes_merge, emission_node)
+    else:
+        last_merge = plan_beauty(nodes, layout, passes_merge, emission_node, options.display)
+    copy_node, dot_node = plan_copy_alpha(nodes, layout, top_node, last_merge, read_name)
+    shadow_node = plan_shadow_matte(nodes, layout, layers_dict, copy_node, dot_node, read_name, options.display)
+    last_node = plan_premult(nodes, layout, shadow_node, read_name)
+    backdrops = plan_backdrops(layout, layers_dict, options.lean, options.display)
+    return GraphPlan(read_name=read_name, nodes=tuple(nodes), backdrops=tuple(backdrops), output=last_node.id,
+                     bounds=layout.bounds())
+
+
+def plan_unpremult(nodes: list, layout, name: str) -> PlanNode:
+    """
+     Plans the unpremult node to start the template.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @name: str - The name for the unpremult node.
+
+     @return PlanNode.
+    """
+    unpremult_node = _node(layout, 'unpremult', 'Unpremult', (('name', '{}_Unpremult'.format(name)),), ((0, INPUT),))
+    nodes.append(unpremult_node)
+    return unpremult_node
+
+
+def plan_prune(nodes: list, layout, layers_dict: dict, top_node: PlanNode, name: str) -> PlanNode:
+    """
+     Plans the remove node that keeps only the channels used by the template, all the columns start from it.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @layers_dict: dict - All the AOV's needed to recreate the beauty separated in groups.
+     @top_node: PlanNode - The unpremult node.
+     @name: str - The name of the read node.
+
+     @return PlanNode.
+    """
+    prune_node = _node(layout, 'prune', 'Remove',
+                       (('name', '{}_Prune'.format(name)), ('label', 'template channels'), ('operation', 'keep'),
+                        ('channels', ' '.join(template_channels(layers_dict)))),
+                       ((0, top_node.id),))
+    nodes.append(prune_node)
+    return prune_node
+
+
+def template_channels(layers_dict: dict) -> tuple:
+    """
+     Gets the channels read by the template, the alpha of the render and the colors of every AOV.
+
+     @layers_dict: dict - All the AOV's needed to recreate the beauty separated in groups.
+
+     @return Tuple with the names of the channels as Nuke writes them.
+    """
+    channels = ['rgba.alpha']
+    for layers in layers_dict.values():
+        for layer in layers:
+            channels.extend('{0}.{1}'.format(layer, channel) for channel in ('red', 'green', 'blue')
+                            if '{0}.{1}'.format(layer, channel) not in channels)
+    return tuple(channels)
+
+
+def plan_layers(nodes: list, layout, layers_dict: dict, top_node: PlanNode, display: str = 'full'):
+    """
+     Plans all the AOV's in columns.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @layers_dict: dict - All the AOV's needed to recreate the beauty separated in groups.
+     @top_node: PlanNode - The node where the tree is going to be connected.
+     @display: str - The display profile, one of DISPLAY_PROFILES.
+
+     @return Tuple with all the merges that recreates the passes and the emission node that has the emission AOV or None.
+    """
+    emission_node = None
+    passes_merge = list()
+    for group, layers in layers_dict.items():
+        merge_nodes_ids = list()
+        dot_albedo_nodes = list()
+        if 'Shadow' in group:
+            continue
+        for layer in layers:
+            # Look for specific names in the layers to give a different function
+            kind = layer_kind(layer)
+            if kind == 'albedo':
+                top_node, dot_albedo_nodes = plan_albedo(nodes, layout, top_node, layer, display)
+            elif kind == 'emission':
+                emission_node = plan_emission(nodes, layout, top_node, layer, display)
+            else:
+                top_node, merge_nodes = plan_aov(nodes, layout, top_node, layer, display)
+                merge_nodes_ids.extend(merge_node.id for merge_node in merge_nodes)
+        # Connects all the merges to get the global lighting for comp and recreate the AOV, the AOV's without
+        # albedo like the RGBA of the light groups keep the lighting
+        for index, plan_node in enumerate(nodes):
+            if plan_node.id not in merge_nodes_ids:
+                continue
+            if plan_node.id.endswith('/raw') and dot_albedo_nodes:
+                nodes[index] = _connect(plan_node, 1, dot_albedo_nodes[0])
+            elif plan_node.id.endswith('/pass'):
+                if dot_albedo_nodes:
+                    nodes[index] = _connect(plan_node, 1, dot_albedo_nodes[1])
+                passes_merge.append(nodes[index])
+    return passes_merge, emission_node
+
+
+def plan_lean_layers(nodes: list, layout, layers_dict: dict, top_node: PlanNode, display: str = 'full'):
+    """
+     Plans all the AOV's in lean columns, the albedo of each group is read by the expressions of its lighting AOV's.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @layers_dict: dict - All the AOV's needed to recreate the beauty separated in groups.
+     @top_node: PlanNode - The node where the tree is going to be connected.
+     @display: str - The display profile, one of DISPLAY_PROFILES.
+
+     @return Tuple with all the passes that recreate the beauty and the emission node that has the emission AOV or None.
+    """
+    emission_node = None
+    passes_merge = list()
+    for group, layers in layers_dict.items():
+        if 'Shadow' in group:
+            continue
+        # The last albedo of the group is used, a group without albedo keeps its lighting
+        albedo = None
+        for layer in layers:
+            if layer_kind(layer) == 'albedo':
+                albedo = layer
+        for layer in layers:
+            kind = layer_kind(layer)
+            if kind == 'emission':
+                emission_node = plan_emission(nodes, layout, top_node, layer, display)
+            elif kind == 'aov':
+                top_node, pass_node = plan_lean_aov(nodes, layout, top_node, layer, albedo)
+                passes_merge.append(pass_node)
+    return passes_merge, emission_node
+
+
+def plan_beauty(nodes: list, layout, passes_merge: list, emission_node: PlanNode|None, display: str = 'full') -> PlanNode:
+    """
+     Plans the merges of all the AOV's to recreate the beauty.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @passes_merge: list - List that contains all the merge nodes of the AOV's.
+     @emission_node: PlanNode|None - Contains the last emission node to recreate the beauty or None if there is no emission.
+     @display: str - The display profile, the dots have no label with none.
+
+     @return PlanNode the last merge node planned.
+    """
+    last_merge = passes_merge[0]
+    # Loops through all the AOV's merge to recreate the beauty
+    for pass_node in passes_merge[1:]:
+        pass_name = pass_node.id.split('/')[0]
+        dot_node = _dot(layout, 'beauty/{}/dot'.format(pass_name), pass_node,
+                        label_txt=pass_name if display != 'none' else None)
+        merge_node = _merge(layout, 'beauty/{}/merge'.format(pass_name), pass_name, 'plus', last_merge, dot_node)
+        nodes.extend([merge_node, dot_node])
+        last_merge = merge_node
+    # Checks if the emission node is needed to complete the beauty
+    if emission_node:
+        dot_emission = _dot(layout, 'beauty/emission/dot', emission_node,
+                            label_txt='emission' if display != 'none' else None)
+        emission_merge = _merge(layout, 'beauty/emission/merge', 'emission', 'plus', last_merge, dot_emission)
+        nodes.extend([dot_emission, emission_merge])
+        last_merge = emission_merge
+    return last_merge
+
+
+def plan_beauty_tree(nodes: list, layout, passes_merge: list, emission_node: PlanNode|None) -> PlanNode:
+    """
+     Plans a balanced tree of merges to recreate the beauty, the passes are merged directly without dots so the
+     tree is only as deep as the logarithm of the passes.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @passes_merge: list - List that contains all the merge nodes of the AOV's.
+     @emission_node: PlanNode|None - Contains the last emission node to recreate the beauty or None if there is no emission.
+
+     @return PlanNode the last merge node planned.
+    """
+    planned = {plan_node.id: plan_node for plan_node in passes_merge}
+    if emission_node:
+        planned[emission_node.id] = emission_node
+    last_merge = passes_merge[0]
+    for merge_id, _, b_id, a_id in merge_tree(beauty_leaves(layout.passes, layout.emission)):
+        # The merges that add a single AOV are named after it
+        name = 'beauty' if a_id.startswith('beauty/') else a_id.split('/')[0]
+        last_merge = _merge(layout, merge_id, name, 'plus', planned[b_id], planned[a_id])
+        planned[merge_id] = last_merge
+        nodes.append(last_merge)
+    return last_merge
+
+
+def plan_copy_alpha(nodes: list, layout, unpremult_node: PlanNode, last_merge: PlanNode, name: str):
+    """
+     Plans the last part of the template copying the alpha from the original to the recreated beauty.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @unpremult_node: PlanNode - The node where it is going to copy the alpha.
+     @last_merge: PlanNode - The last merge node of the AOV's to paste the alpha.
+     @name: str - The name of the read node.
+
+     @return Tuple the copy node and the dot node that carries the original render.
+    """
+    dot_copy_1 = _dot(layout, 'alpha/dot_top', unpremult_node)
+    dot_copy_2 = _dot(layout, 'alpha/dot', dot_copy_1)
+    copy_node = _node(layout, 'alpha/copy', 'Copy',
+                      (('name', '{}_copy'.format(name)), ('from0', 'rgba.alpha'), ('to0', 'rgba.alpha')),
+                      ((0, last_merge.id), (1, dot_copy_2.id)))
+    nodes.extend([dot_copy_1, dot_copy_2, copy_node])
+    return copy_node, dot_copy_2
+
+
+def plan_shadow_matte(nodes: list, layout, layers_dict: dict, top_node: PlanNode, dot_node: PlanNode, name: str,
+                      display: str = 'full') -> PlanNode:
+    """
+     Plans the tree for the Shadow Matte AOV.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @layers_dict: dict - Dictionary with all the layers founded in the read node.
+     @top_node: PlanNode - The starting node to connect the grade.
+     @dot_node: PlanNode - The dot node to get the Shadow AOV.
+     @name: str - The name of the read node.
+     @display: str - The display profile, one of DISPLAY_PROFILES.
+
+     @return PlanNode.
+    """
+    if not layers_dict.get('Shadow'):
+        return top_node
+    layer = layers_dict.get('Shadow')[0]
+    shuffle_node = _shuffle(layout, 'shadow/shuffle', layer, dot_node, mappings=(('shadow_matte.red', 'rgba.alpha'),),
+                            display=display)
+    grade_node = _node(layout, 'shadow/grade', 'Grade', (('name', '{}_Grade'.format(name)),),
+                       ((0, top_node.id), (MASK_INPUT, shuffle_node.id)))
+    nodes.extend([shuffle_node, grade_node])
+    return grade_node
+
+
+def plan_premult(nodes: list, layout, top_node: PlanNode, name: str) -> PlanNode:
+    """
+     Plans the premult node that ends the template.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @top_node: PlanNode - The node to connect.
+     @name: str - The name of the read node.
+
+     @return PlanNode.
+    """
+    premult_node = _node(layout, 'premult', 'Premult', (('name', '{}_Premult'.format(name)),), ((0, top_node.id),))
+    nodes.append(premult_node)
+    return premult_node
+
+
+def plan_aov(nodes: list, layout, node_to_connect: PlanNode, layer: str, display: str = 'full'):
+    """
+     Plans the tree to break the AOV.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_to_connect: PlanNode - The node where the column is connected.
+     @layer: str - The name of the AOV to rename the nodes.
+     @display: str - The display profile, one of DISPLAY_PROFILES.
+
+     @return Tuple dot node to connect the next column, merge nodes to break the AOV for the global lighting and recreate.
+    """
+    dot_node = _dot(layout, '{}/dot'.format(layer), node_to_connect)
+    shuffle_node = _shuffle(layout, '{}/shuffle'.format(layer), layer, dot_node, display=display)
+    remove_node = _remove(layout, '{}/remove'.format(layer), layer, shuffle_node)
+    # Merge to get the global lighting
+    merge_expression_node = _node(layout, '{}/raw'.format(layer), 'MergeExpression',
+                                  (('label', 'Raw {} Lighting'.format(layer)),
+                                   ('expr0', 'Ar == 0 ? Br : Br/Ar'),
+                                   ('expr1', 'Ag == 0 ? Bg : Bg/Ag'),
+                                   ('expr2', 'Ab == 0 ? Bb : Bb/Ab'),
+                                   ('expr3', 'Aa == 0 ? Ba : Ba/Aa')),
+                                  ((0, remove_node.id),))
+    # Merge to rebuild the AOV
+    merge_node = _node(layout, '{}/pass'.format(layer), 'Merge2',
+                       (('label', '{} Pass'.format(layer)), ('operation', 'multiply')),
+                       ((0, merge_expression_node.id),))
+    nodes.extend([dot_node, shuffle_node, remove_node, merge_expression_node, merge_node])
+    return dot_node, [merge_expression_node, merge_node]
+
+
+def plan_lean_aov(nodes: list, layout, node_to_connect: PlanNode, layer: str, albedo: str|None):
+    """
+     Plans the lean tree to break the AOV, a remove keeps the AOV and its albedo, an expression gets the raw lighting
+     and another one rebuilds the pass, the artist grades the lighting between them.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_to_connect: PlanNode - The node where the column is connected.
+     @layer: str - The name of the AOV to rename the nodes.
+     @albedo: str|None - The albedo AOV that divides and multiplies the lighting, None keeps the lighting.
+
+     @return Tuple dot node to connect the next column and the expression that rebuilds the pass.
+    """
+    raw_exprs = list()
+    pass_exprs = list()
+    for channel, short in (('red', 'r'), ('green', 'g'), ('blue', 'b')):
+        if albedo:
+            raw_exprs.append('{0}.{1} == 0 ? {2}.{1} : {2}.{1}/{0}.{1}'.format(albedo, channel, layer))
+            pass_exprs.append('{0}*{1}.{2}'.format(short, albedo, channel))
+        else:
+            raw_exprs.append('{0}.{1}'.format(layer, channel))
+            pass_exprs.append(short)
+    dot_node = _dot(layout, '{}/dot'.format(layer), node_to_connect)
+    # Only the channels read by the expressions are carried by the rest of the column and the beauty
+    kept = ' '.join('{0}.{1}'.format(column_layer, channel) for column_layer in (layer, albedo) if column_layer
+                    for channel in ('red', 'green', 'blue'))
+    remove_node = _remove(layout, '{}/remove'.format(layer), layer, dot_node, channels=kept)
+    # Expression to get the global lighting, the alpha is cleared like the remove of the full template
+    raw_node = _node(layout, '{}/raw'.format(layer), 'Expression',
+                     (('label', 'Raw {} Lighting'.format(layer)),) +
+                     tuple(('expr{}'.format(index), expr) for index, expr in enumerate(raw_exprs)) +
+                     (('expr3', '0'),),
+                     ((0, remove_node.id),))
+    # Expression to rebuild the AOV
+    pass_node = _node(layout, '{}/pass'.format(layer), 'Expression',
+                      (('label', '{} Pass'.format(layer)),) +
+                      tuple(('expr{}'.format(index), expr) for index, expr in enumerate(pass_exprs)),
+                      ((0, raw_node.id),))
+    nodes.extend([dot_node, remove_node, raw_node, pass_node])
+    return dot_node, pass_node
+
+
+def plan_albedo(nodes: list, layout, node_to_connect: PlanNode, layer: str, display: str = 'full'):
+    """
+     Plans the tree for the albedo AOV.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_to_connect: PlanNode - The node where the column is connected.
+     @layer: str - The name of the AOV to rename the nodes.
+     @display: str - The display profile, one of DISPLAY_PROFILES.
+
+     @return Tuple dot node to connect the next column, dot albedo nodes to connect to the merge to break and recreate the AOV.
+    """
+    dot_node = _dot(layout, '{}/dot'.format(layer), node_to_connect)
+    shuffle_node = _shuffle(layout, '{}/shuffle'.format(layer), layer, dot_node, display=display)
+    remove_node = _remove(layout, '{}/remove'.format(layer), layer, shuffle_node)
+    # Dot for the global lighting and dot to rebuild the AOV
+    dot_expression_node = _dot(layout, '{}/dot_raw'.format(layer), remove_node)
+    dot_merge_node = _dot(layout, '{}/dot_pass'.format(layer), dot_expression_node)
+    nodes.extend([dot_node, shuffle_node, remove_node, dot_expression_node, dot_merge_node])
+    return dot_node, [dot_expression_node, dot_merge_node]
+
+
+def plan_emission(nodes: list, layout, node_to_connect: PlanNode, layer: str, display: str = 'full') -> PlanNode:
+    """
+     Plans the tree for the emission AOV.
+
+     @nodes: list - The list of planned nodes to add the new ones.
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_to_connect: PlanNode - The node where the column is connected.
+     @layer: str - The name of the AOV to rename the nodes.
+     @display: str - The display profile, one of DISPLAY_PROFILES.
+
+     @return PlanNode the remove node with the emission.
+    """
+    dot_node = _dot(layout, '{}/dot'.format(layer), node_to_connect)
+    shuffle_node = _shuffle(layout, '{}/shuffle'.format(layer), layer, dot_node, display=display)
+    remove_node = _remove(layout, '{}/remove'.format(layer), layer, shuffle_node)
+    nodes.extend([dot_node, shuffle_node, remove_node])
+    return remove_node
+
+
+def plan_backdrops(layout, layers_dict: dict, lean: bool = False, display: str = 'full') -> list:
+    """
+     Plans the backdrops of every AOV, of every group around them and of the shadow matte. The light display only has
+     the backdrops of the groups and the shadow matte, none has no backdrops.
+
+     @layout: TemplateLayout - The positions solved for the template.
+     @layers_dict: dict - All the AOV's needed to recreate the beauty separated in groups.
+     @lean: bool - True if the columns are the lean ones.
+     @display: str - The display profile, one of DISPLAY_PROFILES.
+
+     @return List of PlanBackdrop, the inner ones first.
+    """
+    backdrops = list()
+    if display == 'none':
+        return backdrops
+    for group, layers in layers_dict.items():
+        if 'Shadow' in group:
+            continue
+        layer_backdrops = list()
+        for layer in layers:
+            members = tuple('{0}/{1}'.format(layer, suffix) for suffix, _, _ in column_nodes(layer_kind(layer), lean))
+            if members:
+                layer_backdrops.append(_backdrop(layout, '{}/backdrop'.format(layer), layer, members, font_size=25))
+        if not layer_backdrops:
+            continue
+        if display == 'full':
+            backdrops.extend(layer_backdrops)
+            members = tuple(backdrop.id for backdrop in layer_backdrops)
+        else:
+            members = tuple(member for backdrop in layer_backdrops for member in backdrop.members)
+        backdrops.append(_backdrop(layout, 'group/{}'.format(group), group, members))
+    if 'shadow/backdrop' in layout.backdrops:
+        backdrops.append(_backdrop(layout, 'shadow/backdrop', 'Shadow', ('shadow/shuffle', 'shadow/grade')))
+    return backdrops
+
+
+def _connect(plan_node: PlanNode, index: int, source: PlanNode) -> PlanNode:
+    """
+     Gets a copy of the planned node with a new input connected.
+
+     @plan_node: PlanNode - The node to connect.
+     @index: int - The input index.
+     @source: PlanNode - The node connected to the input.
+
+     @return PlanNode.
+    """
+    return PlanNode(plan_node.id, plan_node.node_class, plan_node.knobs,
+                    plan_node.inputs + ((index, source.id),), plan_node.xpos, plan_node.ypos)
+
+
+def _node(layout, node_id: str, node_class: str, knobs: tuple = (), inputs: tuple = ()) -> PlanNode:
+    """
+     Plans a node in the position solved by the layout.
+
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_id: str - The id of the node.
+     @node_class: str - The Nuke class of the node.
+     @knobs: tuple - Pairs of knob name and value.
+     @inputs: tuple - Pairs of input index and id of the node connected.
+
+     @return PlanNode.
+    """
+    xpos, ypos = layout.positions[node_id]
+    return PlanNode(node_id, node_class, knobs=knobs, inputs=inputs, xpos=xpos, ypos=ypos)
+
+
+def _backdrop(layout, backdrop_id: str, label: str, members: tuple, font_size: int = 42) -> PlanBackdrop:
+    """
+     Plans a backdrop in the rectangle solved by the layout.
+
+     @layout: TemplateLayout - The positions solved for the template.
+     @backdrop_id: str - The id of the backdrop.
+     @label: str - The text to be display in the label.
+     @members: tuple - Ids of the nodes or backdrops enclosed.
+     @font_size: int - The size of the font to be displayed in the label.
+
+     @return PlanBackdrop.
+    """
+    rect = layout.backdrops[backdrop_id]
+    return PlanBackdrop(backdrop_id, label, members, xpos=rect.x, ypos=rect.y, width=rect.width,
+                        height=rect.height, font_size=font_size, z_order=rect.z_order, tile_color=_backdrop_color(label))
+
+
+def _backdrop_color(label: str) -> int:
+    """
+     Gets a dark color for a backdrop like the ones of autoBackdrop, the same label always gets the same color.
+
+     @label: str - The label of the backdrop.
+
+     @return Integer with the color as Nuke writes it.
+    """
+    seed = zlib.crc32(label.encode())
+    hue = (seed & 0xff) / 255.0
+    saturation = 0.1 + ((seed >> 8) & 0xff) / 255.0 * 0.15
+    value = 0.15 + ((seed >> 16) & 0xff) / 255.0 * 0.15
+    red, green, blue = colorsys.hsv_to_rgb(hue, saturation, value)
+    return int('%02x%02x%02x%02x' % (int(red*255), int(green*255), int(blue*255), 255), 16)
+
+
+def _dot(layout, node_id: str, source: PlanNode, label_txt: str|None = None, font_size: int = 25) -> PlanNode:
+    """
+     Plans a dot node.
+
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_id: str - The id of the node.
+     @source: PlanNode - The node connected to the dot.
+     @label_txt: str|None - The label that it will show in the dot.
+     @font_size: int - The size of the font for the label.
+
+     @return PlanNode.
+    """
+    knobs = (('label', label_txt), ('note_font_size', font_size)) if label_txt else ()
+    return _node(layout, node_id, 'Dot', knobs, ((0, source.id),))
+
+
+def _shuffle(layout, node_id: str, layer: str, source: PlanNode, mappings: tuple = (), display: str = 'full') -> PlanNode:
+    """
+     Plans a shuffle node with the specific AOV.
+
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_id: str - The id of the node.
+     @layer: str - The AOV to be used.
+     @source: PlanNode - The node connected to the shuffle.
+     @mappings: tuple - Pairs of channels to map from and to.
+     @display: str - The display profile, only the full one shows the thumbnail.
+
+     @return PlanNode.
+    """
+    knobs = (('label', layer), ('in1', layer), ('postage_stamp', display == 'full'))
+    if mappings:
+        knobs += (('mappings', mappings),)
+    return _node(layout, node_id, 'Shuffle2', knobs, ((0, source.id),))
+
+
+def _remove(layout, node_id: str, layer: str, source: PlanNode, operation: str = 'keep', channels: str = 'rgb') -> PlanNode:
+    """
+     Plans a remove node.
+
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_id: str - The id of the node.
+     @layer: str - Part of the label of the node.
+     @source: PlanNode - The node connected to the remove.
+     @operation: str - The operation that the remove node will do.
+     @channels: str - The channels that it will use.
+
+     @return PlanNode.
+    """
+    knobs = (('label', '{0}_{1}'.format(layer, operation)), ('operation', operation), ('channels', channels))
+    return _node(layout, node_id, 'Remove', knobs, ((0, source.id),))
+
+
+def _merge(layout, node_id: str, name: str, operation: str, b_node: PlanNode, a_node: PlanNode) -> PlanNode:
+    """
+     Plans a merge node with a specific label and operation.
+
+     @layout: TemplateLayout - The positions solved for the template.
+     @node_id: str - The id of the node.
+     @name: str - Part of the label of the node.
+     @operation: str - The operation that the merge will do.
+     @b_node: PlanNode - The node connected to the B input.
+     @a_node: PlanNode - The node connected to the A input.
+
+     @return PlanNode.
+    """
+    knobs = (('label', '{0}_{1}'.format(name, operation)), ('operation', operation))
+    return _node(layout, node_id, 'Merge2', knobs, ((0, b_node.id), (1, a_node.id)))
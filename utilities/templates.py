@@ -0,0 +1,381 @@
+from __future__ import annotations
+import json
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Templates available in the tool, the groups and layers keep the order used to build them
+BUILTIN_TEMPLATES = {
+    'Simple': {'General': ['direct', 'albedo', 'indirect'],
+               'Emission': ['emission'],
+               'Shadow': ['shadow_matte']},
+    'Intermediate': {'Diffuse': ['diffuse', 'diffuse_albedo'],
+                     'SSS': ['sss', 'sss_albedo'],
+                     'Transmission': ['transmission', 'transmission_albedo'],
+                     'Specular': ['specular', 'specular_albedo'],
+                     'Coat': ['coat', 'coat_albedo'],
+                     'Sheen': ['sheen', 'sheen_albedo'],
+                     'Emission': ['emission'],
+                     'Shadow': ['shadow_matte']},
+    'Complex': {'Diffuse': ['diffuse_direct', 'diffuse_albedo', 'diffuse_indirect'],
+                'SSS': ['sss_direct', 'sss_albedo', 'sss_indirect'],
+                'Transmission': ['transmission_direct', 'transmission_albedo', 'transmission_indirect'],
+                'Specular': ['specular_direct', 'specular_albedo', 'specular_indirect'],
+                'Coat': ['coat_direct', 'coat_albedo', 'coat_indirect'],
+                'Sheen': ['sheen_direct', 'sheen_albedo', 'sheen_indirect'],
+                'Emission': ['emission'],
+                'Shadow': ['shadow_matte']},
+    'Light Groups': {'Diffuse': ['diffuse_direct_*', 'diffuse_albedo', 'diffuse_indirect_*'],
+                     'SSS': ['sss_direct_*', 'sss_albedo', 'sss_indirect_*'],
+                     'Transmission': ['transmission_direct_*', 'transmission_albedo', 'transmission_indirect_*'],
+                     'Specular': ['specular_direct_*', 'specular_albedo', 'specular_indirect_*'],
+                     'Coat': ['coat_direct_*', 'coat_albedo', 'coat_indirect_*'],
+                     'Sheen': ['sheen_direct_*', 'sheen_albedo', 'sheen_indirect_*'],
+                     'Emission': ['emission'],
+                     'Shadow': ['shadow_matte']},
+}
+# End of the AOV's that are expanded to a column for each light group of the render, diffuse_direct_* finds
+# diffuse_direct_key and diffuse_direct_rim
+LIGHT_GROUP_SUFFIX = '_*'
+# File with the templates of the user, they are added after the built-in ones
+USER_TEMPLATES_FILE = os.path.join(os.path.expanduser('~'), '.nuke', 'arnold_aov_templates.json')
+# Every layer used by a template gets a bit, the layers of a render become an integer
+_layer_bits = dict()
+# Templates compiled by their groups, the ones of the registry are found here too
+_compiled_templates = dict()
+_registry = None
+
+
+class TemplateError(Exception):
+    """Error raised when the file of user templates can't be used."""
+
+
+@dataclass(frozen=True)
+class TemplateGroup:
+    """
+     A group of layers of a template compiled to a bitmask.
+
+     @name: str - The name of the group.
+     @layers: tuple - The layers of the group in order, with the light group patterns.
+     @mask: int - The bits of the layers of the group, the patterns have no bit.
+     @patterns: tuple - The names of the AOV's of the light group patterns, without the suffix.
+    """
+    name: str
+    layers: tuple
+    mask: int
+    patterns: tuple = ()
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+     A template with its groups compiled to bitmasks.
+
+     @name: str - The name of the template.
+     @groups: tuple - The TemplateGroup of the template in order.
+     @mask: int - The bits of all the layers of the template.
+    """
+    name: str
+    groups: tuple
+    mask: int
+
+    @property
+    def layers_dict(self) -> dict:
+        return {group.name: list(group.layers) for group in self.groups}
+
+
+@dataclass(frozen=True)
+class TemplateRegistry:
+    """
+     All the templates available, loaded once.
+
+     @templates: dict - The names of the templates with their CompiledTemplate.
+     @error: str|None - The reason the user templates were not loaded or None.
+    """
+    templates: dict
+    error: str|None = None
+
+    def names(self) -> list:
+        return list(self.templates)
+
+    def get(self, name: str) -> CompiledTemplate:
+        return self.templates[name]
+
+
+def layer_bit(layer: str) -> int:
+    """
+     Gets the bit of a layer, new layers get the next free bit.
+
+     @layer: str - The name of the AOV.
+
+     @return Integer with a single bit.
+    """
+    bit = _layer_bits.get(layer)
+    if bit is None:
+        bit = 1 << len(_layer_bits)
+        _layer_bits[layer] = bit
+        # Masks cached before the layer got its bit would miss it, and it is no longer a light group
+        layers_mask.cache_clear()
+        light_group_layers.cache_clear()
+    return bit
+
+
+@lru_cache(maxsize=1024)
+def layers_mask(layers: frozenset) -> int:
+    """
+     Gets the bitmask of the layers found in a render, the layers that are not in any template are ignored.
+
+     @layers: frozenset - The name of the layers.
+
+     @return Integer with the bits of the layers.
+    """
+    mask = 0
+    for layer in layers:
+        mask |= _layer_bits.get(layer, 0)
+    return mask
+
+
+def compile_template(name: str, layers_dict: dict) -> CompiledTemplate:
+    """
+     Compiles the groups of a template to bitmasks.
+
+     @name: str - The name of the template.
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+
+     @return CompiledTemplate.
+    """
+    groups = list()
+    template_mask = 0
+    for group, layers in layers_dict.items():
+        mask = 0
+        patterns = list()
+        for layer in layers:
+            prefix = light_group_prefix(layer)
+            if prefix:
+                patterns.append(prefix)
+            else:
+                mask |= layer_bit(layer)
+        groups.append(TemplateGroup(group, tuple(layers), mask, tuple(patterns)))
+        template_mask |= mask
+    return CompiledTemplate(name, tuple(groups), template_mask)
+
+
+def find_template(layers_dict: dict) -> CompiledTemplate:
+    """
+     Gets a template compiled with the groups given, the templates of the registry are used and the rest are
+     compiled only the first time.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+
+     @return CompiledTemplate.
+    """
+    key = tuple((group, tuple(layers)) for group, layers in layers_dict.items())
+    compiled = _compiled_templates.get(key)
+    if compiled is None:
+        compiled = next((template for template in get_registry().templates.values()
+                         if tuple((group.name, group.layers) for group in template.groups) == key), None)
+        compiled = compiled or compile_template('', layers_dict)
+        _compiled_templates[key] = compiled
+    return compiled
+
+
+def match_template(groups: tuple, found_mask: int, light_layers: dict|None = None) -> tuple:
+    """
+     Compares the layers found with the groups of a template, a group is used only if all its layers are found.
+     The light group patterns are replaced by the layers of every light group found, a group with patterns is used
+     only if some light group is found.
+
+     @groups: tuple - The TemplateGroup of the template.
+     @found_mask: int - The bitmask of the layers found in the render.
+     @light_layers: dict|None - The layers of each light group pattern from light_group_layers.
+
+     @return Tuple with the dictionary of the groups found and the list of the missing AOV's.
+    """
+    light_layers = light_layers or dict()
+    layers_found = dict()
+    missing_layers = list()
+    for group in groups:
+        intersected = group.mask & found_mask
+        lights = any(prefix in light_layers for prefix in group.patterns)
+        # Skips the groups without any AOV in the render
+        if not intersected and not lights:
+            continue
+        # Some AOV's of the group are missing
+        elif intersected != group.mask:
+            missing_layers.extend(layer for layer in group.layers
+                                  if not light_group_prefix(layer) and not _layer_bits[layer] & found_mask)
+            continue
+        # The group only has the albedo of its light groups
+        elif group.patterns and not lights:
+            continue
+        layers = list()
+        for layer in group.layers:
+            prefix = light_group_prefix(layer)
+            layers.extend(light_layers.get(prefix, ()) if prefix else (layer,))
+        layers_found[group.name] = layers
+    return layers_found, missing_layers
+
+
+def light_group_prefix(layer: str) -> str|None:
+    """
+     Gets the name of the AOV of a light group pattern.
+
+     @layer: str - The name of the AOV in the template.
+
+     @return String with the name without the suffix, None if the layer is not a pattern.
+    """
+    if layer.endswith(LIGHT_GROUP_SUFFIX):
+        return layer[:-len(LIGHT_GROUP_SUFFIX)]
+    return None
+
+
+@lru_cache(maxsize=64)
+def light_group_regex(prefixes: tuple):
+    """
+     Compiles the light group patterns to a single regular expression. The names are stored in a trie that is
+     written as nested groups, so a layer is compared with each shared start once and the longest name wins.
+
+     @prefixes: tuple - The names of the AOV's of the patterns.
+
+     @return Compiled regular expression, its first group is the AOV and the second one the light group.
+    """
+    trie = dict()
+    for prefix in prefixes:
+        node = trie
+        for character in prefix:
+            node = node.setdefault(character, dict())
+        node[''] = dict()
+    return re.compile(r'({})_(.+)$'.format(_trie_regex(trie)))
+
+
+def _trie_regex(node: dict) -> str:
+    """
+     Writes a node of the trie of light group patterns as a regular expression.
+
+     @node: dict - The characters that follow with their nodes, an empty key ends a name.
+
+     @return String with the regular expression.
+    """
+    branches = [re.escape(character) + _trie_regex(child) for character, child in sorted(node.items()) if character]
+    if not branches:
+        return ''
+    regex = branches[0] if len(branches) == 1 else '(?:{})'.format('|'.join(branches))
+    # The optional branch is greedy so the longer names are tried first
+    return '(?:{})?'.format(regex) if '' in node else regex
+
+
+@lru_cache(maxsize=1024)
+def light_group_layers(groups: tuple, layers: frozenset) -> dict:
+    """
+     Finds the layers of the light group patterns of a template in a single pass over the layers of a render. The
+     layers named in any template are not light groups, so diffuse_* doesn't find diffuse_albedo.
+
+     @groups: tuple - The TemplateGroup of the template.
+     @layers: frozenset - The name of the layers found in the render.
+
+     @return Dictionary with the names of the patterns found and a tuple of their layers sorted by light group.
+    """
+    prefixes = tuple(sorted({prefix for group in groups for prefix in group.patterns}))
+    if not prefixes:
+        return dict()
+    regex = light_group_regex(prefixes)
+    found = dict()
+    for layer in layers:
+        if layer in _layer_bits:
+            continue
+        match = regex.match(layer)
+        if match:
+            found.setdefault(match.group(1), list()).append((match.group(2), layer))
+    return {prefix: tuple(layer for _, layer in sorted(matches)) for prefix, matches in found.items()}
+
+
+def expand_light_groups(layers_dict: dict, layers: frozenset) -> dict:
+    """
+     Gets the groups of a template found in a render with its light group patterns expanded.
+
+     @layers_dict: dict - A dictionary that contains all the AOV's in groups.
+     @layers: frozenset - The name of the layers found in the render.
+
+     @return Dictionary with the groups found and their layers.
+    """
+    groups = find_template(layers_dict).groups
+    return match_template(groups, layers_mask(layers), light_group_layers(groups, layers))[0]
+
+
+def load_user_templates(path: str = USER_TEMPLATES_FILE) -> dict:
+    """
+     Reads the templates of the user from a JSON file with the name of each template and its groups of layers:
+     {"My template": {"Diffuse": ["diffuse_direct", "diffuse_albedo"], "Emission": ["emission"]}}
+     The lighting AOV's ending with _* get a column for each light group: ["diffuse_direct_*", "diffuse_albedo"]
+
+     @path: str - The path of the file.
+
+     @return Dictionary with the name of the templates and their groups, empty if the file doesn't exist.
+    """
+    from .layout import (layer_kind)
+    try:
+        with open(path) as templates_file:
+            user_templates = json.load(templates_file)
+    except FileNotFoundError:
+        return dict()
+    except (OSError, ValueError) as error:
+        raise TemplateError('{0} can not be read: {1}'.format(path, error))
+    if not isinstance(user_templates, dict):
+        raise TemplateError('{} must contain an object with the templates'.format(path))
+    for name, layers_dict in user_templates.items():
+        if not isinstance(layers_dict, dict) or not layers_dict:
+            raise TemplateError('The template {} must contain an object with the groups'.format(name))
+        for group, layers in layers_dict.items():
+            if not isinstance(layers, list) or not layers or not all(isinstance(layer, str) for layer in layers):
+                raise TemplateError('The group {0} of {1} must contain a list of AOVs'.format(group, name))
+            for layer in layers:
+                prefix = light_group_prefix(layer)
+                if '*' in (prefix if prefix is not None else layer) or prefix == '':
+                    raise TemplateError('The AOV {0} of {1} can only end with {2}'.format(layer, name, LIGHT_GROUP_SUFFIX))
+                if prefix and layer_kind(prefix) != 'aov':
+                    raise TemplateError('The AOV {0} of {1} has no light groups, only the lighting AOVs have them'
+                                        .format(layer, name))
+    return user_templates
+
+
+def load_registry(path: str = USER_TEMPLATES_FILE) -> TemplateRegistry:
+    """
+     Compiles the built-in templates and the ones of the user, a user template replaces a built-in one with the same name.
+
+     @path: str - The path of the file with the templates of the user.
+
+     @return TemplateRegistry.
+    """
+    templates_dicts = dict(BUILTIN_TEMPLATES)
+    error = None
+    try:
+        templates_dicts.update(load_user_templates(path))
+    except TemplateError as template_error:
+        error = str(template_error)
+    templates = {name: compile_template(name, layers_dict) for name, layers_dict in templates_dicts.items()}
+    return TemplateRegistry(templates, error)
+
+
+def get_registry() -> TemplateRegistry:
+    """
+     Gets the templates, they are loaded the first time.
+
+     @return TemplateRegistry.
+    """
+    global _registry
+    if _registry is None:
+        _registry = load_registry()
+    return _registry
+
+
+def reload_registry() -> TemplateRegistry:
+    """
+     Loads the templates again to find the changes in the file of the user.
+
+     @return TemplateRegistry.
+    """
+    global _registry
+    _registry = None
+    _compiled_templates.clear()
+    return get_registry()
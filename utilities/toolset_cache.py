@@ -0,0 +1,169 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import asdict
+from functools import lru_cache
+
+# Folder with the contents of the groups already written, each version of the tool has its own folder inside
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.nuke', 'arnold_aovs_cache')
+# Maximum size of the toolsets of a version, the least recently used are evicted first
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+# Changes when the format of the toolsets changes
+TOOLSET_FORMAT = 1
+# Modules that decide the contents of a template, a change in any of them is a new version of the tool
+TEMPLATE_MODULES = ('layout.py', 'template_plan.py', 'script_writer.py')
+TOOLSET_EXTENSION = '.nk'
+
+
+@lru_cache(maxsize=1)
+def tool_version() -> str:
+    """
+     Gets the version of the code that writes the templates.
+
+     @return String with the hash of the modules of the templates.
+    """
+    digest = hashlib.sha1(str(TOOLSET_FORMAT).encode())
+    module_dir = os.path.dirname(os.path.realpath(__file__))
+    for module in TEMPLATE_MODULES:
+        with open(os.path.join(module_dir, module), 'rb') as module_file:
+            digest.update(module_file.read())
+    return digest.hexdigest()[:16]
+
+
+def toolset_key(template_name: str, template_layers: dict, signature: tuple, options = None) -> str:
+    """
+     Gets the key of a toolset, the definition of the template is part of it so editing the template invalidates it.
+
+     @template_name: str - The name of the template.
+     @template_layers: dict - The groups and AOV's of the template definition.
+     @signature: tuple - The groups and AOV's found in the read node, from layers_signature.
+     @options: PlanOptions|None - The options of the plan.
+
+     @return String with the key.
+    """
+    data = json.dumps([template_name, template_layers, signature, asdict(options) if options else None], sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def toolset_dir(cache_dir: str = CACHE_DIR) -> str:
+    """
+     Gets the folder of the toolsets of the current version of the tool.
+
+     @cache_dir: str - The folder of the cache.
+
+     @return String with the path of the folder.
+    """
+    return os.path.join(cache_dir, tool_version())
+
+
+def has_toolset(key: str, cache_dir: str = CACHE_DIR) -> bool:
+    """
+     Checks if a toolset is in the cache.
+
+     @key: str - The key of the toolset.
+     @cache_dir: str - The folder of the cache.
+
+     @return True if the toolset is cached.
+    """
+    return os.path.isfile(os.path.join(toolset_dir(cache_dir), key + TOOLSET_EXTENSION))
+
+
+def load_toolset(key: str, cache_dir: str = CACHE_DIR) -> str|None:
+    """
+     Reads a toolset from the cache and marks it as used.
+
+     @key: str - The key of the toolset.
+     @cache_dir: str - The folder of the cache.
+
+     @return String with the Nuke script or None if it is not cached.
+    """
+    path = os.path.join(toolset_dir(cache_dir), key + TOOLSET_EXTENSION)
+    try:
+        with open(path) as toolset_file:
+            script = toolset_file.read()
+        os.utime(path, None)
+    except OSError:
+        return None
+    return script
+
+
+def save_toolset(key: str, script: str, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES) -> None:
+    """
+     Writes a toolset in the cache, the toolsets of other versions are removed and the oldest ones are evicted.
+
+     @key: str - The key of the toolset.
+     @script: str - The Nuke script.
+     @cache_dir: str - The folder of the cache.
+     @max_bytes: int - The maximum size of the toolsets.
+
+     @return None.
+    """
+    directory = toolset_dir(cache_dir)
+    try:
+        if not os.path.isdir(directory):
+            remove_old_versions(cache_dir)
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, key + TOOLSET_EXTENSION)
+        # Written with another name first so another session never reads half a toolset
+        temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'w') as toolset_file:
+            toolset_file.write(script)
+        os.replace(temp_path, path)
+        evict_toolsets(directory, max_bytes)
+    except OSError:
+        # The cache is only an optimization, the template is built anyway
+        return
+
+
+def evict_toolsets(directory: str, max_bytes: int = MAX_CACHE_BYTES) -> None:
+    """
+     Removes the least recently used toolsets until the folder is smaller than the maximum size.
+
+     @directory: str - The folder of the toolsets.
+     @max_bytes: int - The maximum size of the toolsets.
+
+     @return None.
+    """
+    toolsets = list()
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(TOOLSET_EXTENSION):
+            stat = entry.stat()
+            toolsets.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in toolsets)
+    for _, size, path in sorted(toolsets):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def remove_old_versions(cache_dir: str = CACHE_DIR) -> None:
+    """
+     Removes the toolsets written by other versions of the tool.
+
+     @cache_dir: str - The folder of the cache.
+
+     @return None.
+    """
+    if not os.path.isdir(cache_dir):
+        return
+    current = tool_version()
+    for entry in os.scandir(cache_dir):
+        if entry.is_dir() and entry.name != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def clear_toolsets(cache_dir: str = CACHE_DIR) -> None:
+    """
+     Removes all the toolsets.
+
+     @cache_dir: str - The folder of the cache.
+
+     @return None.
+    """
+    shutil.rmtree(cache_dir, ignore_errors=True)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# Environment variable with the path of the trace file, the builds are traced only when it is set
+TRACE_ENV = 'ARNOLD_AOVS_TRACE'
+# Categories of the calls to Nuke that are counted
+NUKE_CALLS = ('create', 'knob', 'input', 'select', 'delete', 'paste')
+_active = None
+
+
+@dataclass(frozen=True)
+class TraceEvent:
+    """
+     A stage measured in a trace.
+
+     @name: str - The name of the stage.
+     @category: str - The kind of stage, like check or build.
+     @start: float - Seconds since the trace started.
+     @duration: float - Seconds used by the stage.
+     @thread: int - The thread that ran the stage.
+     @args: dict - Extra information like the read node or the calls to Nuke made in the stage.
+    """
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread: int
+    args: dict = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    """
+     The stages and calls to Nuke recorded while a trace is active.
+
+     @name: str - The name of the trace.
+     @origin: float - The performance counter when the trace started.
+     @events: list - The TraceEvent recorded.
+     @counts: Counter - The calls to Nuke by category.
+    """
+    name: str
+    origin: float = field(default_factory=time.perf_counter)
+    events: list = field(default_factory=list)
+    counts: Counter = field(default_factory=Counter)
+
+
+def start_trace(name: str) -> Trace:
+    """
+     Starts recording the stages and the calls to Nuke.
+
+     @name: str - The name of the trace.
+
+     @return Trace.
+    """
+    global _active
+    _active = Trace(name)
+    return _active
+
+
+def stop_trace() -> Trace|None:
+    """
+     Stops recording.
+
+     @return The Trace recorded or None if there was no trace.
+    """
+    global _active
+    trace, _active = _active, None
+    return trace
+
+
+def is_tracing() -> bool:
+    """
+     Checks if the stages are being recorded.
+
+     @return True if there is an active trace.
+    """
+    return _active is not None
+
+
+@contextmanager
+def span(name: str, category: str = 'stage', **args):
+    """
+     Measures a stage, the calls to Nuke made inside are added to the event. It does nothing without a trace.
+
+     @name: str - The name of the stage.
+     @category: str - The kind of stage.
+     @args: Extra information saved with the event.
+
+     @return Context manager.
+    """
+    trace = _active
+    if trace is None:
+        yield
+        return
+    counts = Counter(trace.counts)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        calls = {call: trace.counts[call] - counts[call] for call in NUKE_CALLS if trace.counts[call] != counts[call]}
+        args.update(calls)
+        trace.events.append(TraceEvent(name, category, start - trace.origin, end - start, threading.get_ident(), args))
+
+
+def count(call: str, amount: int = 1) -> None:
+    """
+     Counts calls to Nuke of a category.
+
+     @call: str - The category from NUKE_CALLS.
+     @amount: int - The number of calls.
+
+     @return None.
+    """
+    trace = _active
+    if trace is not None:
+        trace.counts[call] += amount
+
+
+def chrome_trace(trace: Trace) -> dict:
+    """
+     Converts a trace to the Chrome trace format, it can be opened in chrome://tracing or Perfetto.
+
+     @trace: Trace - The trace recorded.
+
+     @return Dictionary ready to be written as JSON.
+    """
+    pid = os.getpid()
+    events = [{'name': event.name, 'cat': event.category, 'ph': 'X', 'pid': pid, 'tid': event.thread,
+               'ts': round(event.start * 1e6, 3), 'dur': round(event.duration * 1e6, 3), 'args': event.args}
+              for event in trace.events]
+    end = max((event.start + event.duration for event in trace.events), default=0.0)
+    events.append({'name': 'nuke calls', 'ph': 'C', 'pid': pid, 'tid': 0, 'ts': round(end * 1e6, 3),
+                   'args': dict(trace.counts)})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'name': trace.name}}
+
+
+def summary_table(trace: Trace) -> str:
+    """
+     Summarizes a trace with the calls and time of each stage and the calls to Nuke.
+
+     @trace: Trace - The trace recorded.
+
+     @return String with the table.
+    """
+    stages = dict()
+    for event in trace.events:
+        calls, seconds = stages.get(event.name, (0, 0.0))
+        stages[event.name] = (calls + 1, seconds + event.duration)
+    lines = ['{0:<28}{1:>8}{2:>12}{3:>12}'.format('stage', 'calls', 'total ms', 'mean ms')]
+    for name, (calls, seconds) in sorted(stages.items(), key=lambda item: -item[1][1]):
+        lines.append('{0:<28}{1:>8}{2:>12.2f}{3:>12.3f}'.format(name, calls, seconds * 1e3, seconds * 1e3 / calls))
+    lines.append('')
+    lines.append('{0:<28}{1:>8}'.format('nuke calls', 'count'))
+    for call in NUKE_CALLS:
+        lines.append('{0:<28}{1:>8}'.format(call, trace.counts[call]))
+    return '\n'.join(lines)
+
+
+def write_trace(trace: Trace, path: str) -> str:
+    """
+     Writes a trace as a Chrome trace file and its summary table next to it.
+
+     @trace: Trace - The trace recorded.
+     @path: str - The path of the trace file.
+
+     @return String with the summary table.
+    """
+    with open(path, 'w') as trace_file:
+        json.dump(chrome_trace(trace), trace_file)
+    summary = summary_table(trace)
+    with open(os.path.splitext(path)[0] + '.txt', 'w') as summary_file:
+        summary_file.write(summary + '\n')
+    return summary